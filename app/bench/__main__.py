@@ -0,0 +1,216 @@
+"""
+Benchmark offline de los extractores sobre HTML guardado.
+
+  cd /app && python -m bench                 # tiempos + comparación con golden/
+  cd /app && python -m bench -k phone        # sólo los casos que contienen "phone"
+  cd /app && python -m bench --update-golden # regenera golden/ tras un cambio intencionado
+
+Por cada caso: páginas/s, µs por página, memoria (pico y bloques netos)
+por página, y si la salida coincide con bench/golden/<caso>.json.
+Sale con código 1 si algún caso no coincide.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from common.fingerprint import fingerprint
+from common.html import parse_html
+from customers.datainnovation_com.comunicare_es import empresas as comunicare_empresas
+from customers.datainnovation_com.comunicare_es import websites as comunicare_websites
+from customers.datainnovation_com.seraportiendasonline_com import categorias as sera_categorias
+from customers.datainnovation_com.seraportiendasonline_com import empresas as sera_empresas
+from customers.datainnovation_com.seraportiendasonline_com import subcategorias as sera_subcategorias
+from customers.datainnovation_com.seraportiendasonline_com import websites as sera_websites
+from customers.muelles_com.amisando import empresas as amisando_empresas
+from customers.muelles_com.amisando import websites as amisando_websites
+
+HERE = Path(__file__).parent
+FIXTURES = HERE / "fixtures"
+GOLDEN = HERE / "golden"
+
+HOMEPAGES = sorted((FIXTURES / "homepages").glob("*.html"))
+
+# dominio "propio" de cada homepage del corpus (para los pickers de email)
+HOMEPAGE_DOMAINS = {
+    "shopify_tienda": "adrielsmoda.es",
+    "wordpress_agencia": "ecoeureka.com",
+    "woocommerce_tienda": "tiendabebe.es",
+    "prestashop_tienda": "barbaraclaudia.com",
+    "estatica_empresa": "plagasandrade.com",
+    "dominio_aparcado": "bestshopping.es",
+}
+
+# (nombre, función(html, fixture_path) -> resultado serializable, fixtures)
+CASES = [
+    (
+        "amisando_extract_fields_from_ficha",
+        lambda html, p: amisando_websites._extract_fields_from_ficha(html),
+        [FIXTURES / "amisando_ficha.html"],
+    ),
+    (
+        "amisando_extract_empresa_urls",
+        lambda html, p: amisando_empresas._extract_empresa_urls(parse_html(html)),
+        [FIXTURES / "amisando_listing.html"],
+    ),
+    (
+        "amisando_find_next_page",
+        lambda html, p: amisando_empresas._find_next_page(parse_html(html), "https://amisando.es/servicios/a-coruna/"),
+        [FIXTURES / "amisando_listing.html"],
+    ),
+    (
+        "comunicare_extract_companies_from_city",
+        lambda html, p: comunicare_empresas._extract_companies_from_city(
+            html, "https://www.comunicare.es/agencias-publicidad-madrid/"
+        ),
+        [FIXTURES / "comunicare_ciudad.html"],
+    ),
+    (
+        "seraportiendas_extract_category_links",
+        lambda html, p: sera_categorias.extract_category_links(html, sera_categorias.DEFAULT_URL),
+        [FIXTURES / "seraportiendas_categoria.html"],
+    ),
+    (
+        "seraportiendas_extract_subcategories",
+        lambda html, p: sera_subcategorias._extract_subcategories(
+            html, "http://www.seraportiendasonline.com/venta-online-moda-y-complementos"
+        ),
+        [FIXTURES / "seraportiendas_subcategoria.html"],
+    ),
+    (
+        "seraportiendas_extract_items",
+        lambda html, p: sera_empresas._extract_items(html, "http://www.seraportiendasonline.com/ropa"),
+        [FIXTURES / "seraportiendas_listado.html"],
+    ),
+    (
+        "seraportiendas_extract_from_ficha",
+        lambda html, p: list(sera_websites._extract_from_ficha(html)),
+        [FIXTURES / "seraportiendas_ficha.html"],
+    ),
+    (
+        "amisando_pick_best_email",
+        lambda html, p: amisando_websites._pick_best_email(html, HOMEPAGE_DOMAINS.get(p.stem, "")),
+        HOMEPAGES,
+    ),
+    (
+        "comunicare_pick_best_email",
+        lambda html, p: comunicare_websites._pick_best_email(html, HOMEPAGE_DOMAINS.get(p.stem, "")),
+        HOMEPAGES,
+    ),
+    (
+        "comunicare_pick_best_phone",
+        lambda html, p: comunicare_websites._pick_best_phone(html),
+        HOMEPAGES,
+    ),
+    (
+        "seraportiendas_pick_best_phone",
+        lambda html, p: sera_websites._pick_best_phone(html),
+        HOMEPAGES,
+    ),
+    (
+        "seraportiendas_detect_platform",
+        lambda html, p: sera_websites.detect_platform(html),
+        HOMEPAGES,
+    ),
+    (
+        "fingerprint_technologies",
+        lambda html, p: fingerprint(html),
+        HOMEPAGES,
+    ),
+]
+
+
+def _run_once(fn, pages) -> dict:
+    return {p.stem: fn(html, p) for p, html in pages}
+
+
+def _bench(fn, pages, min_time: float) -> tuple[int, float]:
+    n = 0
+    start = time.perf_counter()
+    while True:
+        for p, html in pages:
+            fn(html, p)
+        n += len(pages)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return n, elapsed
+
+
+def _allocations(fn, pages) -> tuple[float, float]:
+    """
+    (KiB de pico, bloques reservados) por página en una pasada.
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    _run_once(fn, pages)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(max(0, s.count_diff) for s in after.compare_to(before, "filename"))
+    return (peak - base) / 1024 / len(pages), blocks / len(pages)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline de extractores")
+    parser.add_argument("-k", dest="filter", default="", help="Sólo casos cuyo nombre contenga este texto")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Segundos mínimos por caso")
+    parser.add_argument("--update-golden", action="store_true", help="Reescribe golden/ con la salida actual")
+    parser.add_argument("--json", dest="json_out", default=None, help="Guarda los resultados en este fichero")
+    args = parser.parse_args()
+
+    GOLDEN.mkdir(exist_ok=True)
+    results = []
+    failed = []
+
+    print(f"{'caso':<42} {'págs':>5} {'págs/s':>10} {'µs/pág':>10} {'KiB/pág':>9} {'bloq/pág':>9}  golden")
+    for name, fn, fixtures in CASES:
+        if args.filter and args.filter not in name:
+            continue
+
+        pages = [(p, p.read_text(encoding="utf-8")) for p in fixtures]
+        output = _run_once(fn, pages)
+
+        golden_path = GOLDEN / f"{name}.json"
+        if args.update_golden:
+            golden_path.write_text(json.dumps(output, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+            status = "✍️"
+        elif not golden_path.exists():
+            status = "⚠️ sin golden"
+        elif json.loads(golden_path.read_text(encoding="utf-8")) == output:
+            status = "✅"
+        else:
+            status = "❌ distinto"
+            failed.append(name)
+
+        n, elapsed = _bench(fn, pages, args.min_time)
+        kib, blocks = _allocations(fn, pages)
+
+        pps = n / elapsed
+        print(f"{name:<42} {len(pages):>5} {pps:>10.1f} {1e6 / pps:>10.1f} {kib:>9.1f} {blocks:>9.1f}  {status}")
+        results.append({
+            "case": name,
+            "pages": len(pages),
+            "pages_per_s": pps,
+            "us_per_page": 1e6 / pps,
+            "kib_peak_per_page": kib,
+            "blocks_per_page": blocks,
+            "golden": status,
+        })
+
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if failed:
+        print(f"\n❌ Salida distinta de golden en: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
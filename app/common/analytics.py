@@ -0,0 +1,331 @@
+"""
+Cobertura y rendimiento de las salidas de cada base, con group-bys vectorizados.
+
+  cd /app && python -m common.analytics                                   # todas las bases con salida
+  cd /app && python -m common.analytics datainnovation_com seraportiendasonline_com --by categoria
+  cd /app && python -m common.analytics muelles_com amisando --json
+
+Cada etapa que lo soporta declara un spec ANALYTICS (como PARALLEL):
+
+  ANALYTICS = {
+      "output": "websites.csv",
+      "website": "website",             # columna con la web (cobertura)
+      "alive": "is_alive",              # opcional
+      "platform": "platform",           # opcional
+      "join": [("empresas.csv", "ficha_url", "ficha_url", ["categoria"])],
+      "groups": ["categoria"],
+  }
+
+Lee el dataset Parquet de --columnar si está al día con el CSV; si no, el CSV
+con el lector de pyarrow. Las columnas se pasan a códigos enteros
+(dictionary_encode) y los group-bys son np.bincount sobre esos códigos.
+"""
+
+import argparse
+import csv
+import importlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from common.columnar import dataset_path, dataset_rows
+from common.metrics import count_rows
+
+DATA = Path("/data")
+TOP_PLATFORMS = 8
+
+
+# =========================
+# CARGA
+# =========================
+def load_table(csv_path: Path):
+    """
+    Tabla pyarrow con todas las columnas como string.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as pads
+
+    ds = dataset_path(csv_path)
+    if ds.exists() and dataset_rows(ds) == count_rows(csv_path):
+        table = pads.dataset(str(ds), format="parquet").to_table()
+    else:
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+        skipped = []
+
+        def skip_row(row):
+            # fila con otro número de columnas: se cuenta y se salta, no tumba el informe
+            skipped.append(row.number)
+            return "skip"
+
+        table = pacsv.read_csv(
+            csv_path,
+            parse_options=pacsv.ParseOptions(newlines_in_values=True, invalid_row_handler=skip_row),
+            convert_options=pacsv.ConvertOptions(
+                column_types={name: pa.string() for name in header},
+                strings_can_be_null=False,
+            ),
+        )
+        if skipped:
+            # con newlines_in_values pyarrow no sabe el número de línea
+            known = [str(n) for n in skipped[:5] if n is not None and n >= 0]
+            where = f" (líneas {', '.join(known)}{'...' if len(skipped) > 5 else ''})" if known else ""
+            print(f"⚠️ {csv_path}: {len(skipped)} filas mal formadas ignoradas{where}")
+
+    return table.cast(pa.schema([pa.field(name, pa.string()) for name in table.column_names]))
+
+
+def _column(table, name: str) -> np.ndarray:
+    """
+    Columna como array numpy de objetos ("" para nulos).
+    """
+    import pyarrow.compute as pc
+
+    return pc.fill_null(table.column(name), "").to_numpy(zero_copy_only=False)
+
+
+def _nonempty(table, name: str) -> np.ndarray:
+    import pyarrow.compute as pc
+
+    col = pc.fill_null(pc.utf8_trim_whitespace(table.column(name)), "")
+    return pc.greater(pc.utf8_length(col), 0).to_numpy(zero_copy_only=False)
+
+
+def _truthy(table, name: str) -> np.ndarray:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    col = pc.fill_null(table.column(name), "")
+    return pc.is_in(col, value_set=pa.array(["1", "true", "True"])).to_numpy(zero_copy_only=False)
+
+
+def _codes(values) -> tuple[np.ndarray, list[str]]:
+    """
+    (códigos int por fila, etiquetas) vía dictionary_encode de pyarrow.
+    """
+    import pyarrow as pa
+
+    arr = values if isinstance(values, pa.Array) else pa.array(values, type=pa.string())
+    enc = arr.dictionary_encode()
+    codes = enc.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+    return codes, enc.dictionary.to_pylist()
+
+
+def _left_join(table, lookup_csv: Path, left_on: str, right_on: str, columns: list[str]) -> dict[str, np.ndarray]:
+    """
+    Columnas de lookup_csv para cada fila de table (primera coincidencia; "" si no hay).
+    """
+    import pyarrow as pa
+
+    if not lookup_csv.exists():
+        return {c: np.full(table.num_rows, "", dtype=object) for c in columns}
+
+    right = load_table(lookup_csv)
+    left_keys = _column(table, left_on)
+    right_keys = _column(right, right_on)
+
+    codes, labels = _codes(pa.array(np.concatenate([right_keys, left_keys]), type=pa.string()))
+    rcodes, lcodes = codes[: len(right_keys)], codes[len(right_keys):]
+
+    # primera fila de la derecha por clave: asignación inversa, gana la primera
+    first = np.full(len(labels), -1, dtype=np.int64)
+    idx = np.arange(len(rcodes), dtype=np.int64)
+    first[rcodes[::-1]] = idx[::-1]
+    match = first[lcodes]
+
+    out = {}
+    for c in columns:
+        src = np.append(_column(right, c), "")
+        out[c] = src[match]  # -1 -> "" (último elemento)
+    return out
+
+
+# =========================
+# AGREGADOS
+# =========================
+def _group_stats(codes: np.ndarray, n_groups: int, masks: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    stats = {"rows": np.bincount(codes, minlength=n_groups)}
+    for name, mask in masks.items():
+        stats[name] = np.bincount(codes, weights=mask, minlength=n_groups).astype(np.int64)
+    return stats
+
+
+def analyze(base_dir: Path, spec: dict, by: list[str] | None = None) -> dict | None:
+    """
+    Informe de la salida spec["output"] en base_dir (None si aún no hay salida).
+    by=None usa las dimensiones del spec; by=[] sólo totales.
+    """
+    customer, base = base_dir.parts[-2:]
+    csv_path = base_dir / spec["output"]
+    if not csv_path.exists() or csv_path.stat().st_size == 0:
+        return None
+
+    table = load_table(csv_path)
+    n = table.num_rows
+
+    website = _nonempty(table, spec.get("website", "website"))
+    email = _nonempty(table, spec.get("email", "email"))
+    telefono = _nonempty(table, spec.get("telefono", "telefono"))
+    masks = {
+        "websites": website,
+        "emails": email,
+        "telefonos": telefono,
+        "contactables": email | telefono,
+    }
+    alive = None
+    if spec.get("alive"):
+        alive = _truthy(table, spec["alive"])
+        masks["alive"] = alive
+
+    joined = {}
+    for lookup, left_on, right_on, cols in spec.get("join", []):
+        joined.update(_left_join(table, base_dir / lookup, left_on, right_on, cols))
+
+    platform_codes = platform_labels = None
+    if spec.get("platform"):
+        plat = _column(table, spec["platform"])
+        plat = np.where(plat == "", "(unknown)", plat)
+        platform_codes, platform_labels = _codes(plat)
+
+    totals = {k: int(v.sum()) for k, v in masks.items()}
+    report = {
+        "customer": customer,
+        "base": base,
+        "output": str(csv_path),
+        "rows": n,
+        "totals": totals,
+        "coverage": round(totals["websites"] / n, 4) if n else 0.0,
+        "yield": round(totals["contactables"] / n, 4) if n else 0.0,
+        "groups": {},
+    }
+
+    # plataformas: sólo de webs vivas si la etapa lo sabe
+    scope = alive if alive is not None else np.ones(n, dtype=bool)
+    if platform_codes is not None:
+        counts = np.bincount(platform_codes[scope], minlength=len(platform_labels))
+        report["platforms"] = {
+            platform_labels[i]: int(counts[i]) for i in np.argsort(-counts) if counts[i]
+        }
+
+    for dim in spec.get("groups", []) if by is None else by:
+        if dim in joined:
+            values = joined[dim]
+        elif dim in table.column_names:
+            values = _column(table, dim)
+        else:
+            print(f"⚠️ {customer}/{base}: no hay columna {dim}")
+            continue
+        values = np.where(values == "", "(sin dato)", values)
+        codes, labels = _codes(values)
+        stats = _group_stats(codes, len(labels), masks)
+
+        plat_matrix = None
+        if platform_codes is not None:
+            flat = codes[scope] * len(platform_labels) + platform_codes[scope]
+            plat_matrix = np.bincount(flat, minlength=len(labels) * len(platform_labels)).reshape(
+                len(labels), len(platform_labels)
+            )
+
+        rows = []
+        for g in np.argsort(-stats["rows"], kind="stable"):
+            entry = {"group": labels[g], **{k: int(v[g]) for k, v in stats.items()}}
+            r = entry["rows"]
+            entry["coverage"] = round(entry["websites"] / r, 4) if r else 0.0
+            entry["yield"] = round(entry["contactables"] / r, 4) if r else 0.0
+            if plat_matrix is not None:
+                top = np.argsort(-plat_matrix[g])[:TOP_PLATFORMS]
+                entry["platforms"] = {platform_labels[p]: int(plat_matrix[g, p]) for p in top if plat_matrix[g, p]}
+            rows.append(entry)
+        report["groups"][dim] = rows
+
+    return report
+
+
+# =========================
+# DESCUBRIMIENTO
+# =========================
+def discover(customer: str | None = None, base: str | None = None) -> list[tuple[str, str, dict]]:
+    """
+    (customer, base, spec) de cada etapa con ANALYTICS; una entrada por output.
+    Los paquetes de customers/ no siempre tienen __init__.py: se recorre el disco.
+    """
+    import customers
+
+    root = Path(list(customers.__path__)[0])
+    found = {}
+    for stage in sorted(root.glob("*/*/*.py")):
+        c, b, entity = stage.parent.parent.name, stage.parent.name, stage.stem
+        if entity.startswith("_") or (customer and c != customer) or (base and b != base):
+            continue
+        module = importlib.import_module(f"customers.{c}.{b}.{entity}")
+        spec = getattr(module, "ANALYTICS", None)
+        if spec:
+            found.setdefault((c, b, spec["output"]), spec)
+    return [(c, b, spec) for (c, b, _), spec in sorted(found.items())]
+
+
+# =========================
+# INFORME
+# =========================
+def _pct(x: float) -> str:
+    return f"{100 * x:5.1f}%"
+
+
+def print_report(report: dict):
+    t = report["totals"]
+    print(f"\n📊 {report['customer']} / {report['base']}  ({report['output']})")
+    print(f"- Filas: {report['rows']}")
+    print(f"- Websites: {t['websites']} ({_pct(report['coverage'])})")
+    if "alive" in t:
+        print(f"- Alive: {t['alive']}")
+    print(f"- Emails: {t['emails']}  |  Teléfonos: {t['telefonos']}")
+    print(f"- Contactables (email o teléfono): {t['contactables']} ({_pct(report['yield'])})")
+
+    if report.get("platforms"):
+        print("\n🧩 Plataformas" + (" (solo alive)" if "alive" in t else "") + ":")
+        for k, v in report["platforms"].items():
+            print(f"  - {k}: {v}")
+
+    for dim, rows in report["groups"].items():
+        print(f"\n📂 Por {dim}:")
+        print(f"  {dim[:30]:<30} {'filas':>8} {'webs':>8} {'cober.':>7} {'emails':>8} {'tlfs':>8} {'rend.':>7}")
+        for r in rows:
+            print(
+                f"  {r['group'][:30]:<30} {r['rows']:>8} {r['websites']:>8} {_pct(r['coverage']):>7}"
+                f" {r['emails']:>8} {r['telefonos']:>8} {_pct(r['yield']):>7}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cobertura y rendimiento por base")
+    parser.add_argument("customer", nargs="?")
+    parser.add_argument("base", nargs="?")
+    parser.add_argument("--by", action="append", help="Dimensión de agrupación (repetible); por defecto las del spec")
+    parser.add_argument("--json", action="store_true", help="Salida JSON")
+    args = parser.parse_args()
+
+    reports = []
+    for customer, base, spec in discover(args.customer, args.base):
+        try:
+            report = analyze(DATA / customer / base, spec, by=args.by)
+        except Exception as e:
+            # una base ilegible no deja sin informe a las demás
+            print(f"❌ {customer}/{base}: {e}")
+            continue
+        if report:
+            reports.append(report)
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+
+    if not reports:
+        print("📊 No hay salidas que analizar.")
+    for report in reports:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+API de consulta de leads sobre las salidas enriquecidas (puerto 8001 del compose;
+el 8000 es el de /metrics de run.py --metrics-port, common.metrics).
+
+  cd /app && uvicorn common.api:app --host 0.0.0.0 --port 8001
+  cd /app && python -m common.api
+
+  GET /leads?domain=ejemplo.es
+  GET /leads?provincia=Sevilla&has_email=1&limit=50&offset=100
+  GET /leads?categoria=Moda&platform=shopify&alive=1
+  GET /stats
+
+Al arrancar se cargan en memoria todas las salidas con spec ANALYTICS (las
+mismas que common.analytics / common.leads), con índices valor -> filas por
+dominio, teléfono, email, fuente, plataforma y las columnas de grupo de cada
+etapa (ciudad, provincia, categoría, subcategoría). Un filtro es un acceso a
+dict; varios se cruzan empezando por la lista más corta.
+
+Recarga en caliente: como mucho una vez por RELOAD_INTERVAL, antes de
+responder se mira el tamaño de cada CSV. Si ha crecido (la etapa ha añadido
+filas) sólo se leen los bytes nuevos; si ha encogido o se ha reescrito
+(compactación, etapa en modo "w") se recarga esa fuente.
+
+App ASGI sin framework: sólo hace falta uvicorn (requirements.txt).
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from urllib.parse import parse_qs
+
+from common.analytics import DATA, discover
+from common.normalize import domain_key, normalize_email, phone_key
+from common.search import join_lookups
+
+RELOAD_INTERVAL = 1.0
+# distinto del de --metrics-port (8000) para poder tener los dos a la vez
+PORT = 8001
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+# filtro de la URL -> normalización del valor (igual al indexar y al consultar)
+INDEXED = {
+    "domain": domain_key,
+    "telefono": phone_key,
+    "email": normalize_email,
+    "source": lambda v: v,
+    "platform": lambda v: (v or "").strip().lower(),
+}
+
+
+def _norm_group(v: str) -> str:
+    return " ".join((v or "").lower().split())
+
+
+def _truthy(v) -> bool:
+    return str(v or "").strip().lower() in ("1", "true", "yes", "si", "sí")
+
+
+# =========================
+# FUENTES
+# =========================
+class _Source:
+    """
+    Una salida (website.csv de una base) y lo ya leído de ella.
+    """
+
+    def __init__(self, customer: str, base: str, spec: dict):
+        self.name = f"{customer}/{base}/{spec['output']}"
+        self.base_dir = DATA / customer / base
+        self.path = self.base_dir / spec["output"]
+        self.spec = spec
+        self.groups = list(spec.get("groups") or [])
+        self.fieldnames = None
+        self.offset = 0
+        self.inode = None
+        self.joins = []
+
+    def reset(self):
+        self.fieldnames = None
+        self.offset = 0
+        self.joins = join_lookups(self.base_dir, self.spec)
+
+    def read_new(self) -> list[dict]:
+        """
+        Filas añadidas desde la última lectura (sólo líneas completas).
+        """
+        st = self.path.stat()
+        self.inode = st.st_ino
+        with self.path.open("rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return []
+        self.offset += end
+        text = data[:end].decode("utf-8")
+
+        reader = csv.reader(io.StringIO(text, newline=""))
+        if self.fieldnames is None:
+            self.fieldnames = next(reader, None) or []
+        return [dict(zip(self.fieldnames, values)) for values in reader if values]
+
+    def changed(self) -> str:
+        """
+        "" si no hay cambios, "append" si ha crecido, "reload" si se ha reescrito.
+        """
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return "reload" if self.offset else ""
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            return "reload"
+        return "append" if st.st_size > self.offset else ""
+
+    def lead(self, row: dict) -> dict:
+        spec = self.spec
+        web = row.get(spec.get("website", "website")) or ""
+        lead = {
+            "source": self.name,
+            "empresa": (row.get(spec.get("empresa", "empresa")) or "").strip(),
+            "website": web,
+            "domain": domain_key(web),
+            "email": normalize_email(row.get(spec.get("email", "email")) or ""),
+            "telefono": (row.get(spec.get("telefono", "telefono")) or "").strip(),
+        }
+        if spec.get("platform"):
+            lead["platform"] = row.get(spec["platform"]) or ""
+        if spec.get("alive"):
+            lead["is_alive"] = _truthy(row.get(spec["alive"]))
+        for left_on, lookup in self.joins:
+            lead.update(lookup.get((row.get(left_on) or "").strip(), {}))
+        for g in self.groups:
+            lead.setdefault(g, row.get(g) or "")
+        return lead
+
+
+# =========================
+# ÍNDICE
+# =========================
+class LeadIndex:
+    def __init__(self, sources: list[_Source]):
+        self.sources = sources
+        self.leads: list[dict | None] = []
+        self.postings: dict[tuple[str, str], list[int]] = {}
+        self.by_source: dict[str, list[int]] = {}
+        self.group_fields: set[str] = set()
+        self._sets: dict[tuple[str, str], set[int]] = {}  # listas como set, para los cruces
+        self._checked_at = 0.0
+        for source in sources:
+            self._load(source)
+
+    def _post(self, key: tuple[str, str], i: int):
+        self.postings.setdefault(key, []).append(i)
+        self._sets.pop(key, None)
+
+    def _add(self, source: _Source, rows: list[dict]):
+        ids = self.by_source.setdefault(source.name, [])
+        for row in rows:
+            lead = source.lead(row)
+            i = len(self.leads)
+            self.leads.append(lead)
+            ids.append(i)
+            for field, norm in INDEXED.items():
+                value = norm(lead.get(field, ""))
+                if value:
+                    self._post((field, value), i)
+            for g in source.groups:
+                self.group_fields.add(g)
+                value = _norm_group(lead.get(g))
+                if value:
+                    self._post((g, value), i)
+            # alive / has_email también como listas: todo filtro es un cruce de listas
+            if "is_alive" in lead:
+                self._post(("alive", str(int(lead["is_alive"]))), i)
+            self._post(("has_email", str(int(bool(lead["email"])))), i)
+
+    def _load(self, source: _Source):
+        source.reset()
+        if source.path.exists():
+            self._add(source, source.read_new())
+
+    def _drop(self, source: _Source):
+        dead = set(self.by_source.pop(source.name, []))
+        if not dead:
+            return
+        for i in dead:
+            self.leads[i] = None
+        self._sets.clear()
+        for key, ids in list(self.postings.items()):
+            kept = [i for i in ids if i not in dead]
+            if kept:
+                self.postings[key] = kept
+            else:
+                del self.postings[key]
+
+    def refresh(self, force: bool = False) -> dict:
+        """
+        Incorpora lo que las etapas hayan escrito desde la última vez.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < RELOAD_INTERVAL:
+            return {}
+        self._checked_at = now
+        done = {}
+        for source in self.sources:
+            change = source.changed()
+            if change == "append":
+                rows = source.read_new()
+                self._add(source, rows)
+                done[source.name] = len(rows)
+            elif change == "reload":
+                self._drop(source)
+                self._load(source)
+                done[source.name] = "reload"
+        return done
+
+    def _as_set(self, key: tuple[str, str]) -> set[int]:
+        cached = self._sets.get(key)
+        if cached is None:
+            cached = self._sets[key] = set(self.postings.get(key, ()))
+        return cached
+
+    def search(self, filters: dict[str, str], alive: bool | None = None, has_email: bool | None = None,
+               limit: int = DEFAULT_LIMIT, offset: int = 0) -> tuple[int, list[dict]]:
+        keys = [(field, INDEXED.get(field, _norm_group)(value)) for field, value in filters.items()]
+        if alive is not None:
+            keys.append(("alive", str(int(alive))))
+        if has_email is not None:
+            keys.append(("has_email", str(int(has_email))))
+
+        if not keys:
+            total = sum(len(ids) for ids in self.by_source.values())
+            page = itertools.islice(itertools.chain(*self.by_source.values()), offset, offset + limit)
+            return total, [self.leads[i] for i in page]
+
+        keys.sort(key=lambda k: len(self.postings.get(k, ())))
+        ids = self.postings.get(keys[0], [])
+        if len(keys) > 1:
+            # se recorre la lista más corta y se prueba contra las demás
+            others = [self._as_set(k) for k in keys[1:]]
+            ids = [i for i in ids if all(i in s for s in others)]
+        return len(ids), [self.leads[i] for i in ids[offset:offset + limit]]
+
+    def stats(self) -> dict:
+        return {
+            "leads": sum(len(ids) for ids in self.by_source.values()),
+            "sources": {name: len(ids) for name, ids in self.by_source.items()},
+            "filters": sorted(set(INDEXED) | self.group_fields),
+        }
+
+
+def build_index(customer: str | None = None, base: str | None = None) -> LeadIndex:
+    sources = [_Source(c, b, spec) for c, b, spec in discover(customer, base)]
+    return LeadIndex(sources)
+
+
+# =========================
+# ASGI
+# =========================
+def _optional_bool(params: dict, name: str) -> bool | None:
+    if name not in params:
+        return None
+    return _truthy(params[name])
+
+
+def _handle(index: LeadIndex, path: str, params: dict) -> tuple[int, dict]:
+    if path == "/health":
+        return 200, {"ok": True}
+    if path == "/stats":
+        index.refresh()
+        return 200, index.stats()
+    if path != "/leads":
+        return 404, {"error": "not found"}
+
+    try:
+        limit = min(int(params.pop("limit", DEFAULT_LIMIT)), MAX_LIMIT)
+        offset = max(int(params.pop("offset", 0)), 0)
+    except ValueError:
+        return 400, {"error": "limit/offset deben ser enteros"}
+    alive = _optional_bool(params, "alive")
+    has_email = _optional_bool(params, "has_email")
+    params.pop("alive", None)
+    params.pop("has_email", None)
+
+    unknown = set(params) - set(INDEXED) - index.group_fields
+    if unknown:
+        return 400, {"error": f"filtros desconocidos: {', '.join(sorted(unknown))}"}
+
+    index.refresh()
+    started = time.perf_counter()
+    total, items = index.search(params, alive=alive, has_email=has_email, limit=limit, offset=offset)
+    return 200, {
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "took_ms": round((time.perf_counter() - started) * 1000, 3),
+        "items": items,
+    }
+
+
+class LeadApp:
+    def __init__(self, customer: str | None = None, base: str | None = None):
+        self.customer = customer
+        self.base = base
+        self.index = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    self._ensure_index()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        self._ensure_index()
+        if scope["method"] != "GET":
+            status, body = 405, {"error": "sólo GET"}
+        else:
+            query = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+            params = {k: v[-1] for k, v in query.items()}
+            status, body = _handle(self.index, scope["path"], params)
+
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                        (b"content-length", str(len(payload)).encode())],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    def _ensure_index(self):
+        if self.index is None:
+            started = time.perf_counter()
+            self.index = build_index(self.customer, self.base)
+            stats = self.index.stats()
+            print(f"✅ {stats['leads']} leads de {len(stats['sources'])} fuentes indexados "
+                  f"en {time.perf_counter() - started:.1f}s")
+
+
+app = LeadApp(os.getenv("LEADS_API_CUSTOMER") or None, os.getenv("LEADS_API_BASE") or None)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API de consulta de leads")
+    parser.add_argument("customer", nargs="?")
+    parser.add_argument("base", nargs="?")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    uvicorn.run(LeadApp(args.customer, args.base), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Archivo WARC de las páginas descargadas y re-extracción offline sobre él.
+
+Archivar todo lo que descarga una etapa (cada proceso escribe su propio
+<dir>/<pid>-<fecha>.warc.gz, un miembro gzip por registro, y su índice .cdxj):
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --archive
+  python3 /app/run.py muelles_com amisando empresas --archive /data/warc/amisando
+
+Re-ejecutar la etapa sobre el archivo, sin red ni pausas, en paralelo:
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --reextract --workers 8
+
+Sin directorio, el archivo va a /data/<customer>/<base>/.warc/. En --reextract
+cada GET se responde con la última copia archivada de esa URL (si no la hay,
+ConnectionError, como una web caída). La etapa escribe desde cero en
+<out_dir>/.reextract/<etapa>/ y, si termina bien, sus CSV sustituyen a los
+de siempre; si se corta, la siguiente --reextract continúa donde se quedó.
+
+  cd /app && python -m common.archive /data/datainnovation_com/seraportiendasonline_com/.warc
+  cd /app && python -m common.archive /data/.../.warc --url https://tienda.es/   # capturas de una URL
+"""
+
+import argparse
+import atexit
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+FINAL_URI_HEADER = "WARC-X-Final-URI"
+# el body se guarda ya descomprimido (como en common.replay)
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+
+def default_dir(out_dir: Path) -> Path:
+    return Path(out_dir) / ".warc"
+
+
+def _warc_date(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _cdx_ts(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d%H%M%S")
+
+
+def _record(headers: dict, block: bytes) -> bytes:
+    head = "WARC/1.1\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    head += f"Content-Length: {len(block)}\r\n\r\n"
+    return head.encode("utf-8") + block + b"\r\n\r\n"
+
+
+# =========================
+# ESCRITURA
+# =========================
+class ArchiveWriter:
+    def __init__(self, archive_dir: str):
+        path = Path(archive_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        name = f"{os.getpid()}-{time.strftime('%Y%m%d%H%M%S')}"
+        self.name = f"{name}.warc.gz"
+        self._f = (path / self.name).open("ab")
+        self._index = (path / f"{name}.cdxj").open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._append(
+            {"WARC-Type": "warcinfo", "WARC-Date": _warc_date(time.time()),
+             "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>", "WARC-Filename": self.name,
+             "Content-Type": "application/warc-fields"},
+            b"software: scrapers common.archive\r\nformat: WARC File Format 1.1\r\n",
+        )
+        atexit.register(self.close)
+
+    def _append(self, headers: dict, block: bytes) -> tuple[int, int]:
+        # un miembro gzip por registro: se puede leer cualquiera con seek + gunzip
+        data = gzip.compress(_record(headers, block), compresslevel=6)
+        offset = self._f.tell()
+        self._f.write(data)
+        self._f.flush()
+        return offset, len(data)
+
+    def record(self, method: str, url: str, r):
+        if method.upper() != "GET":
+            return
+        ts = time.time()
+        http = f"HTTP/1.1 {r.status_code} {r.reason or ''}\r\n"
+        for k, v in r.headers.items():
+            if k.lower() not in _DROP_HEADERS:
+                http += f"{k}: {v}\r\n"
+        body = r.content or b""
+        http += f"Content-Length: {len(body)}\r\n\r\n"
+        block = http.encode("latin-1", "replace") + body
+
+        headers = {
+            "WARC-Type": "response",
+            "WARC-Record-ID": f"<urn:uuid:{uuid.uuid4()}>",
+            "WARC-Date": _warc_date(ts),
+            "WARC-Target-URI": url,
+            "Content-Type": "application/http;msgtype=response",
+        }
+        if r.url and r.url != url:
+            headers[FINAL_URI_HEADER] = r.url
+        with self._lock:
+            offset, length = self._append(headers, block)
+            entry = {"file": self.name, "offset": offset, "length": length, "status": r.status_code}
+            self._index.write(f"{url} {_cdx_ts(ts)} {json.dumps(entry)}\n")
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+                self._index.close()
+
+
+_writers: dict[str, ArchiveWriter] = {}
+
+
+def get_writer(archive_dir: str) -> ArchiveWriter:
+    w = _writers.get(archive_dir)
+    if w is None:
+        w = _writers[archive_dir] = ArchiveWriter(archive_dir)
+    return w
+
+
+# =========================
+# LECTURA
+# =========================
+def load_index(archive_dir: str) -> dict[str, list[tuple[str, dict]]]:
+    """
+    url -> [(timestamp, entrada)] de más antigua a más reciente.
+    """
+    index: dict[str, list[tuple[str, dict]]] = {}
+    for p in sorted(Path(archive_dir).glob("*.cdxj")):
+        with p.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    url, ts, raw = line.rstrip("\n").split(" ", 2)
+                    entry = json.loads(raw)
+                except ValueError:
+                    # cola truncada si el proceso murió a mitad de escritura
+                    continue
+                index.setdefault(url, []).append((ts, entry))
+    for captures in index.values():
+        captures.sort(key=lambda c: c[0])
+    return index
+
+
+def read_record(archive_dir: Path, entry: dict) -> tuple[dict, bytes]:
+    """
+    (cabeceras WARC, bloque) del registro de una entrada del índice.
+    """
+    with (archive_dir / entry["file"]).open("rb") as f:
+        f.seek(entry["offset"])
+        raw = gzip.decompress(f.read(entry["length"]))
+    head, _, rest = raw.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("utf-8").split("\r\n")[1:]:
+        k, _, v = line.partition(":")
+        headers[k.strip()] = v.strip()
+    return headers, rest[:int(headers.get("Content-Length") or 0)]
+
+
+def _parse_http(url: str, warc_headers: dict, block: bytes) -> requests.Response:
+    head, _, body = block.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    _, status, *reason = lines[0].split(" ", 2)
+    headers = CaseInsensitiveDict()
+    for line in lines[1:]:
+        k, _, v = line.partition(":")
+        headers[k.strip()] = v.strip()
+
+    r = requests.Response()
+    r.status_code = int(status)
+    r.reason = reason[0] if reason else ""
+    r.headers = headers
+    r._content = body
+    r._content_consumed = True
+    r.url = warc_headers.get(FINAL_URI_HEADER) or url
+    r.encoding = get_encoding_from_headers(headers)
+    return r
+
+
+class ArchiveReader:
+    def __init__(self, archive_dir: str):
+        self.dir = Path(archive_dir)
+        self.index = load_index(archive_dir)
+        if not self.index:
+            print(f"⚠️ Archivo vacío o inexistente: {self.dir}")
+
+    def response(self, method: str, url: str) -> requests.Response:
+        captures = self.index.get(url) if method.upper() == "GET" else None
+        if not captures:
+            raise requests.exceptions.ConnectionError(f"archivo: no hay copia de {url}")
+        warc_headers, block = read_record(self.dir, captures[-1][1])
+        return _parse_http(url, warc_headers, block)
+
+
+_readers: dict[str, ArchiveReader] = {}
+
+
+def get_reader(archive_dir: str) -> ArchiveReader:
+    rd = _readers.get(archive_dir)
+    if rd is None:
+        rd = _readers[archive_dir] = ArchiveReader(archive_dir)
+    return rd
+
+
+# =========================
+# --reextract
+# =========================
+def reextract_dir(out_dir: Path, entity: str) -> Path:
+    path = Path(out_dir) / ".reextract" / entity
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def publish_reextract(stage_dir: Path, out_dir: Path) -> list[str]:
+    """
+    Sustituye las salidas de out_dir por las re-extraídas (CSV y su resumen).
+    """
+    from common.output import invalidate_derived
+
+    published = []
+    for p in sorted(stage_dir.iterdir()):
+        if not p.is_file() or ".part" in p.name:
+            continue
+        dest = Path(out_dir) / p.name
+        if p.suffix == ".csv":
+            invalidate_derived(dest)
+            published.append(p.name)
+        os.replace(p, dest)
+    shutil.rmtree(stage_dir)
+    return published
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de un archivo WARC de páginas")
+    parser.add_argument("archive", help="Directorio del archivo (--archive)")
+    parser.add_argument("--url", default=None, help="Lista las capturas de esta URL")
+    args = parser.parse_args()
+
+    index = load_index(args.archive)
+    if args.url:
+        for ts, entry in index.get(args.url, []):
+            print(f"{ts}  {entry['status']}  {entry['file']}@{entry['offset']}")
+        return
+
+    files = sorted(Path(args.archive).glob("*.warc.gz"))
+    captures = sum(len(c) for c in index.values())
+    size = sum(p.stat().st_size for p in files)
+    print(f"📦 {len(index)} URLs, {captures} capturas en {len(files)} ficheros ({size / 1e6:.1f} MB)")
+    stamps = [ts for c in index.values() for ts, _ in c]
+    if stamps:
+        print(f"  - desde {min(stamps)} hasta {max(stamps)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Presupuesto de una ejecución: hora límite, peticiones, bytes y peticiones por host.
+
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --deadline 45m
+  python3 /app/run.py muelles_com amisando websites --deadline 06:30 --max-requests 20000 --max-bytes 2G
+  python3 /app/run.py datainnovation_com comunicare_es empresas --max-per-host 500
+
+Lo aplica la capa de fetch (common.http): antes de cada petición se comprueba
+el presupuesto y, si no queda, se lanza BudgetExhausted. A propósito NO es una
+RequestException: los "except RequestException" de las etapas (web caída ->
+fila vacía) no la tragan, y los "except Exception" la dejan pasar con un
+"except BudgetExhausted: raise" delante. Así la etapa sale por sus finally:
+la salida se cierra, el cursor (common.cursor) y el journal (common.journal)
+quedan en la última fila/sección terminada, y la siguiente ejecución sigue ahí.
+
+Para no pasarse de la hora límite, el timeout de cada petición se recorta a
+lo que queda y session.pause() no espera más allá.
+
+Con --workers, peticiones y bytes se reparten a partes iguales entre los
+procesos; la hora límite es la misma para todos. El máximo por host no se
+reparte: cada host lo lleva un solo worker (common.workers.owns_row).
+
+run.py termina entonces con código EXIT_CODE (75, EX_TEMPFAIL: "vuelve a
+intentarlo luego"), para que el cron distinga un corte por presupuesto de un error.
+"""
+
+import re
+import time
+from datetime import datetime, timedelta
+
+from common import metrics
+
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([smhd]?)$", re.I)
+_CLOCK_RE = re.compile(r"^(\d{1,2}):(\d{2})$")
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?$", re.I)
+
+EXIT_CODE = 75
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "": 60}
+_SIZES = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+class BudgetExhausted(Exception):
+    """
+    Se acabó el presupuesto de la ejecución (no es un fallo de red).
+    """
+
+
+def parse_deadline(raw: str, now: float | None = None) -> float:
+    """
+    "45m", "2h", "900s", "90" (minutos) o "06:30" (la próxima vez que sea esa hora)
+    -> timestamp límite.
+    """
+    now = time.time() if now is None else now
+    raw = (raw or "").strip()
+    m = _CLOCK_RE.match(raw)
+    if m:
+        start = datetime.fromtimestamp(now)
+        at = start.replace(hour=int(m.group(1)), minute=int(m.group(2)), second=0, microsecond=0)
+        if at <= start:
+            at += timedelta(days=1)
+        return at.timestamp()
+    m = _DURATION_RE.match(raw)
+    if not m:
+        raise ValueError(f"Hora límite no válida: {raw!r} (p.ej. 45m, 2h, 06:30)")
+    return now + float(m.group(1)) * _UNITS[m.group(2).lower()]
+
+
+def parse_size(raw: str) -> int:
+    """
+    "500M", "2G", "1048576" -> bytes
+    """
+    m = _SIZE_RE.match((raw or "").strip())
+    if not m:
+        raise ValueError(f"Tamaño no válido: {raw!r} (p.ej. 500M, 2G)")
+    return int(float(m.group(1)) * _SIZES[m.group(2).lower()])
+
+
+def _fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+class RunBudget:
+    def __init__(self, deadline: float | None = None, max_requests: int | None = None,
+                 max_bytes: int | None = None, max_per_host: int | None = None):
+        self.deadline = deadline
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_per_host = max_per_host
+        self.requests = 0
+        self.bytes = 0
+        self.per_host: dict[str, int] = {}
+        self.exhausted: str | None = None
+
+    def remaining_time(self) -> float | None:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def _stop(self, reason: str):
+        self.exhausted = reason
+        raise BudgetExhausted(reason)
+
+    def check(self, host: str):
+        """
+        Antes de una petición: BudgetExhausted si ya no cabe.
+        """
+        if self.exhausted:
+            raise BudgetExhausted(self.exhausted)
+        left = self.remaining_time()
+        if left is not None and left <= 0:
+            self._stop("hora límite alcanzada")
+        if self.max_requests is not None and self.requests >= self.max_requests:
+            self._stop(f"{self.requests} peticiones (máximo {self.max_requests})")
+        if self.max_bytes is not None and self.bytes >= self.max_bytes:
+            self._stop(f"{_fmt_bytes(self.bytes)} descargados (máximo {_fmt_bytes(self.max_bytes)})")
+        if self.max_per_host is not None and self.per_host.get(host, 0) >= self.max_per_host:
+            self._stop(f"{self.per_host[host]} peticiones a {host} (máximo {self.max_per_host} por host)")
+        self.requests += 1
+        self.per_host[host] = self.per_host.get(host, 0) + 1
+
+    def spent(self, nbytes: int):
+        self.bytes += nbytes
+
+    def clamp_timeout(self, timeout):
+        """
+        Recorta el timeout de una petición a lo que queda hasta la hora límite.
+        """
+        left = self.remaining_time()
+        if left is None:
+            return timeout
+        left = max(0.1, left)
+        if timeout is None:
+            return left
+        if isinstance(timeout, tuple):
+            return tuple(left if t is None else min(t, left) for t in timeout)
+        return min(timeout, left)
+
+    def pause(self, seconds: float) -> float:
+        """
+        Cuánto esperar de verdad; BudgetExhausted si la pausa cruza la hora límite.
+        """
+        left = self.remaining_time()
+        if left is not None and left <= seconds:
+            self._stop("hora límite alcanzada")
+        return seconds
+
+    def usage(self) -> str:
+        parts = [f"{self.requests} peticiones", _fmt_bytes(self.bytes)]
+        if self.max_requests is not None:
+            parts[0] += f" de {self.max_requests}"
+        if self.max_bytes is not None:
+            parts[1] += f" de {_fmt_bytes(self.max_bytes)}"
+        left = self.remaining_time()
+        if left is not None:
+            parts.append(f"{max(0.0, left):.0f}s hasta la hora límite")
+        return ", ".join(parts)
+
+
+_budget: RunBudget | None = None
+
+
+def get_budget(kwargs: dict) -> RunBudget | None:
+    """
+    El presupuesto del proceso (compartido por todas sus sesiones), o None sin límites.
+    """
+    global _budget
+    limits = [kwargs.get(k) for k in ("deadline", "max_requests", "max_bytes", "max_per_host")]
+    if all(v is None for v in limits):
+        return None
+    if _budget is None:
+        deadline, max_requests, max_bytes, max_per_host = limits
+        workers = kwargs.get("workers") or 1
+
+        def share(n):
+            return None if n is None else max(1, n // workers)
+
+        # los hosts ya están repartidos entre workers: el tope por host va entero
+        _budget = RunBudget(deadline, share(max_requests), share(max_bytes), max_per_host)
+    return _budget
+
+
+def report_exhausted(e: BudgetExhausted, kwargs: dict):
+    """
+    Lo que se ha gastado y lo que queda por hacer cuando se corta la etapa.
+    """
+    print(f"\n⏳ Presupuesto agotado: {e}")
+    if _budget is not None:
+        print(f"  - gastado: {_budget.usage()}")
+    metrics.report_lead_times(kwargs)
+    pending = metrics.QUEUE_DEPTH.values.get((kwargs.get("entity") or "",))
+    if pending is not None:
+        print(f"  - quedan ~{int(pending)} filas del input para la próxima ejecución")
+    print("  - lo terminado está guardado: la próxima ejecución sigue desde ahí")
@@ -0,0 +1,194 @@
+"""
+Salida columnar (Parquet) junto al CSV de cada etapa: run.py ... --columnar
+
+  websites.csv  ->  websites.parquet/part-<ts>-<pid>.parquet
+
+- Columnas tipadas (is_alive bool, page/empresas_count int) en vez de strings.
+- Campos muy repetidos (categoria, provincia_url, platform...) como diccionario.
+- Compresión zstd.
+- Se escribe por row groups; cada ejecución añade un part nuevo. Al abrir se
+  compara con el CSV y se rellenan las filas que falten (p.ej. tras un crash
+  antes de cerrar el part), así el dataset siempre refleja el CSV.
+
+Requiere pyarrow (requirements.txt).
+"""
+
+import csv
+import os
+import shutil
+import time
+from pathlib import Path
+
+ROW_GROUP_ROWS = 10_000
+
+BOOL_COLUMNS = {"is_alive"}
+INT_COLUMNS = {"page", "empresas_count"}
+DICT_COLUMNS = {
+    "categoria",
+    "categoria_url",
+    "subcategoria",
+    "subcategoria_url",
+    "provincia",
+    "provincia_url",
+    "ciudad",
+    "ciudad_url",
+    "platform",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("--columnar requiere pyarrow (pip install -r requirements.txt)") from e
+
+
+def dataset_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".parquet")
+
+
+def schema_for(fieldnames: list[str]):
+    import pyarrow as pa
+
+    fields = []
+    for name in fieldnames:
+        if name in BOOL_COLUMNS:
+            t = pa.bool_()
+        elif name in INT_COLUMNS:
+            t = pa.int32()
+        elif name in DICT_COLUMNS:
+            t = pa.dictionary(pa.int32(), pa.string())
+        else:
+            t = pa.string()
+        fields.append(pa.field(name, t))
+    return pa.schema(fields)
+
+
+def _to_bool(v) -> bool | None:
+    if v in (None, ""):
+        return None
+    return str(v).strip() in ("1", "true", "True")
+
+
+def _to_int(v) -> int | None:
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _convert(name: str, values: list):
+    if name in BOOL_COLUMNS:
+        return [_to_bool(v) for v in values]
+    if name in INT_COLUMNS:
+        return [_to_int(v) for v in values]
+    return [None if v is None else str(v) for v in values]
+
+
+def dataset_rows(ds: Path) -> int:
+    import pyarrow.parquet as pq
+
+    if not ds.exists():
+        return 0
+    return sum(pq.ParquetFile(p).metadata.num_rows for p in sorted(ds.glob("part-*.parquet")))
+
+
+class ColumnarSink:
+    def __init__(self, csv_path: Path, fieldnames: list[str], mode: str = "a"):
+        _require_pyarrow()
+
+        self.csv_path = csv_path
+        self.fieldnames = list(fieldnames)
+        self.schema = schema_for(self.fieldnames)
+        self.mode = mode
+        self.ds = dataset_path(csv_path)
+        self.ds.mkdir(parents=True, exist_ok=True)
+
+        name = f"part-{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}.parquet"
+        self.final_path = self.ds / name
+        self.tmp_path = self.ds / (name + ".tmp")
+        self._writer = None
+        self._buf = []
+
+        if mode == "a":
+            self._backfill()
+
+    def _backfill(self):
+        """
+        Filas del CSV que aún no están en el dataset (runs sin --columnar, crash...).
+        """
+        if not self.csv_path.exists() or self.csv_path.stat().st_size == 0:
+            return
+        have = dataset_rows(self.ds)
+        added = 0
+        with self.csv_path.open(newline="", encoding="utf-8") as f:
+            for i, row in enumerate(csv.DictReader(f)):
+                if i >= have:
+                    self.write(row)
+                    added += 1
+        if added:
+            print(f"🧱 Columnar: {added} filas del CSV que faltaban en {self.ds.name}")
+
+    def _flush_row_group(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._buf:
+            return
+        cols = {name: _convert(name, [r.get(name) for r in self._buf]) for name in self.fieldnames}
+        table = pa.Table.from_pydict(cols, schema=self.schema)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(
+                self.tmp_path,
+                self.schema,
+                compression="zstd",
+                use_dictionary=True,
+            )
+        self._writer.write_table(table)
+        self._buf = []
+
+    def write(self, row: dict):
+        self._buf.append(row)
+        if len(self._buf) >= ROW_GROUP_ROWS:
+            self._flush_row_group()
+
+    def flush(self):
+        # los row groups se escriben al llenarse (ROW_GROUP_ROWS), no por flush del CSV
+        pass
+
+    def close(self):
+        self._flush_row_group()
+        if self._writer is None:
+            if self.mode == "w":
+                # salida vacía: el dataset también
+                for p in self.ds.glob("part-*.parquet"):
+                    p.unlink()
+            return
+        self._writer.close()
+        if self.mode == "w":
+            for p in self.ds.glob("part-*.parquet"):
+                p.unlink()
+        self.tmp_path.replace(self.final_path)
+
+
+def convert(csv_path: Path) -> Path:
+    """
+    Regenera el dataset completo a partir de un CSV existente.
+    """
+    ds = dataset_path(csv_path)
+    if ds.exists():
+        shutil.rmtree(ds)
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        fieldnames = csv.DictReader(f).fieldnames or []
+    sink = ColumnarSink(csv_path, fieldnames, mode="a")
+    sink.close()
+    return ds
+
+
+if __name__ == "__main__":
+    import sys
+
+    for arg in sys.argv[1:]:
+        out = convert(Path(arg))
+        print(f"✅ {arg} -> {out} ({dataset_rows(out)} filas)")
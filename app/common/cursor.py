@@ -0,0 +1,198 @@
+"""
+Cursor por offset de bytes sobre el input de una etapa (empresas.csv de las websites).
+
+Reanudar ya no es releer y parsear todo el input para saltar, fila a fila,
+lo que está en el set de procesados: el cursor guarda el byte (y la fila)
+tras la última fila terminada y la siguiente ejecución salta directamente ahí
+sobre el fichero mapeado en memoria.
+
+  cursor = InputCursor(empresas_csv, out_path, kwargs)
+  with cursor:
+      for row in cursor:          # dicts, como csv.DictReader
+          ...
+
+Una fila cuenta como terminada cuando el bucle pide la siguiente (se ha
+escrito o se ha saltado); si la etapa se corta a mitad de una, esa se repite.
+El punto de control va a <out_dir>/.cursor/<salida>[.wNofM].json cada
+CHECKPOINT_ROWS filas y al salir, y sólo se usa si sigue cuadrando:
+  - el input no se ha reescrito (mismo hash de los TAIL bytes anteriores al
+    offset; si sólo ha crecido, se procesan las filas nuevas)
+  - la salida no ha encogido (si se borra, se empieza de cero)
+Con --recrawl se recorre desde el principio (hay filas vencidas detrás del cursor).
+
+Con resume=False el cursor sólo lee (common.priority salta por el input en
+otro orden): ni retoma ni guarda punto de control.
+"""
+
+import csv
+import hashlib
+import json
+import mmap
+import os
+from pathlib import Path
+
+CHECKPOINT_ROWS = 200
+TAIL = 4096
+
+
+def cursor_path(out_path: Path, kwargs: dict) -> Path:
+    name = Path(out_path).stem
+    workers = kwargs.get("workers") or 1
+    if workers > 1:
+        name += f".w{kwargs.get('worker', 0)}of{workers}"
+    return Path(out_path).parent / ".cursor" / f"{name}.json"
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class InputCursor:
+    def __init__(self, input_csv: Path, out_path: Path, kwargs: dict, resume: bool = True):
+        self.input = Path(input_csv)
+        self.resume = resume
+        self.out_path = Path(out_path)
+        self.path = cursor_path(self.out_path, kwargs)
+
+        self._f = self.input.open("rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+        self.fieldnames: list[str] = []
+        self.offset = 0
+        self.row = 0
+        for values, end in self._records(0):
+            self.fieldnames, self.offset = values, end
+            break
+        self._data_start = self.offset
+
+        state = None if kwargs.get("recrawl") or not resume else self._load()
+        if state:
+            self.offset, self.row = state["offset"], state["row"]
+            print(f"⏩ Cursor: se retoma {self.input.name} en la fila {self.row} (byte {self.offset})")
+        self._pending = 0
+
+    # -------------------------
+    # punto de control
+    # -------------------------
+    def _tail_hash(self, offset: int) -> str:
+        return hashlib.sha1(self._mm[max(0, offset - TAIL):offset] if self._mm else b"").hexdigest()
+
+    def _load(self) -> dict | None:
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        ok = (
+            state.get("input") == self.input.name
+            and state.get("fieldnames") == self.fieldnames
+            and self._data_start <= state.get("offset", -1) <= self.size
+            and state.get("tail") == self._tail_hash(state["offset"])
+            and _size(self.out_path) >= state.get("output_size", 0)
+        )
+        if not ok:
+            print(f"↪️ Cursor de {self.input.name} no válido (input reescrito o salida nueva): se recorre entero")
+            return None
+        return state
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "input": self.input.name,
+            "fieldnames": self.fieldnames,
+            "offset": self.offset,
+            "row": self.row,
+            "tail": self._tail_hash(self.offset),
+            "output_size": _size(self.out_path),
+        }
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._pending = 0
+
+    # -------------------------
+    # lectura
+    # -------------------------
+    def _records(self, pos: int):
+        """
+        (valores, byte siguiente) de cada registro CSV desde pos. Un registro
+        puede ocupar varias líneas si un campo entrecomillado lleva saltos.
+        """
+        mm = self._mm
+        if mm is None:
+            return
+        while pos < self.size:
+            start = end = pos
+            quotes = 0
+            while True:
+                nl = mm.find(b"\n", end)
+                end = self.size if nl == -1 else nl + 1
+                quotes += mm[pos:end].count(b'"')
+                pos = end
+                if quotes % 2 == 0 or end >= self.size:
+                    break
+            text = mm[start:end].decode("utf-8")
+            if quotes:
+                values = next(csv.reader([text]), [])
+            else:
+                # sin comillas no hay nada que interpretar: basta con partir
+                text = text.rstrip("\r\n")
+                values = text.split(",") if text else []
+            yield values, end
+
+    def _row(self, values: list[str]) -> dict:
+        n = len(self.fieldnames)
+        row = dict(zip(self.fieldnames, values))
+        if len(values) > n:
+            row[None] = values[n:]
+        for k in self.fieldnames[len(values):]:
+            row[k] = None
+        return row
+
+    def entries(self):
+        """
+        (offset, fila) de todo el input, sin mover el cursor.
+        """
+        start = self._data_start
+        for values, end in self._records(start):
+            if values:
+                yield start, self._row(values)
+            start = end
+
+    def row_at(self, offset: int) -> dict:
+        """
+        La fila que empieza en offset (uno devuelto por entries()).
+        """
+        for values, _ in self._records(offset):
+            return self._row(values)
+        return {}
+
+    def __iter__(self):
+        for values, end in self._records(self.offset):
+            if values:
+                yield self._row(values)
+            # la etapa ha pedido la siguiente: esta fila está terminada
+            self.offset = end
+            self.row += 1
+            self._pending += 1
+            if self._pending >= CHECKPOINT_ROWS:
+                self.save()
+
+    def close(self):
+        if self._f.closed:
+            return
+        if self.resume:
+            self.save()
+        if self._mm is not None:
+            self._mm.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,165 @@
+"""
+Delta de leads entre ejecuciones: sólo lo nuevo, lo cambiado y lo borrado.
+
+  run.py ... websites --delta
+  cd /app && python -m common.delta datainnovation_com seraportiendasonline_com websites
+
+Por cada salida se guarda un estado compacto con un hash por campo seguido
+(web, email, teléfono) de cada registro:
+
+  <out_dir>/.snapshots/websites.state.tsv.gz     clave \\t hash_web \\t hash_email \\t hash_telefono
+
+Cada delta se compara con el estado anterior con un hash join (dict clave ->
+hashes, una pasada por el CSV actual) y se escribe en:
+
+  <out_dir>/delta/websites/<timestamp>/inserts.csv   filas nuevas
+                                       updates.csv   filas con algún campo seguido distinto (+ columna changed)
+                                       deletes.csv   claves que ya no están
+
+El estado tiene tamaño fijo por registro y sólo se guardan los cambios, así
+que el almacenamiento crece con la rotación y no con el total.
+
+Clave de registro: PARALLEL["key"] de la etapa; campos seguidos: los de ANALYTICS.
+Si una clave aparece varias veces en el CSV (recrawls), vale la última fila.
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import importlib
+import time
+from pathlib import Path
+
+DATA = Path("/data")
+
+
+def field_hash(value) -> str:
+    v = str(value or "").strip().lower()
+    if not v:
+        return "-"
+    return hashlib.blake2b(v.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def tracked_fields(spec: dict) -> list[str]:
+    return [spec.get("website", "website"), spec.get("email", "email"), spec.get("telefono", "telefono")]
+
+
+def state_path(csv_path: Path) -> Path:
+    return csv_path.parent / ".snapshots" / f"{csv_path.stem}.state.tsv.gz"
+
+
+def load_state(path: Path) -> dict[str, tuple[str, ...]]:
+    state = {}
+    if not path.exists():
+        return state
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            key, *hashes = line.rstrip("\n").split("\t")
+            state[key] = tuple(hashes)
+    return state
+
+
+def save_state(path: Path, state: dict[str, tuple[str, ...]]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        for key, hashes in state.items():
+            f.write(key + "\t" + "\t".join(hashes) + "\n")
+    tmp.replace(path)
+
+
+def _current(csv_path: Path, key_fn, fields: list[str]) -> tuple[list[str], dict[str, tuple[dict, tuple]]]:
+    rows = {}
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames or []
+        for row in reader:
+            key = key_fn(row)
+            if key:
+                rows[key] = (row, tuple(field_hash(row.get(c)) for c in fields))
+    return fieldnames, rows
+
+
+def _write(path: Path, fieldnames: list[str], rows: list[dict]):
+    with path.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        w.writerows(rows)
+
+
+def _new_delta_dir(root: Path) -> Path:
+    root.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path, n = root / stamp, 1
+    while path.exists():
+        path, n = root / f"{stamp}-{n}", n + 1
+    path.mkdir()
+    return path
+
+
+def export_delta(csv_path: Path, key_fn, fields: list[str]) -> dict | None:
+    """
+    Compara csv_path con el estado anterior, escribe el delta y actualiza el estado.
+    Devuelve los contadores (None si no hay salida).
+    """
+    if not csv_path.exists() or csv_path.stat().st_size == 0:
+        return None
+
+    st_path = state_path(csv_path)
+    previous = load_state(st_path)
+    fieldnames, current = _current(csv_path, key_fn, fields)
+
+    inserts, updates = [], []
+    for key, (row, hashes) in current.items():
+        old = previous.pop(key, None)
+        if old is None:
+            inserts.append(row)
+        elif old != hashes:
+            changed = [c for c, a, b in zip(fields, old, hashes) if a != b]
+            updates.append({**row, "changed": ";".join(changed)})
+    # lo que queda en previous ya no está en el CSV
+    deletes = [{"key": key} for key in previous]
+
+    counts = {"inserts": len(inserts), "updates": len(updates), "deletes": len(deletes)}
+    if any(counts.values()):
+        delta_dir = _new_delta_dir(csv_path.parent / "delta" / csv_path.stem)
+        _write(delta_dir / "inserts.csv", fieldnames, inserts)
+        _write(delta_dir / "updates.csv", fieldnames + ["changed"], updates)
+        _write(delta_dir / "deletes.csv", ["key"], deletes)
+        counts["dir"] = str(delta_dir)
+
+    save_state(st_path, {key: hashes for key, (_, hashes) in current.items()})
+    return counts
+
+
+def export_module_delta(module, out_dir: Path) -> dict | None:
+    spec = getattr(module, "PARALLEL", None)
+    analytics = getattr(module, "ANALYTICS", None)
+    if not spec or not analytics:
+        print(f"❌ {module.__name__} no soporta --delta (necesita PARALLEL y ANALYTICS)")
+        return None
+
+    counts = export_delta(Path(out_dir) / spec["output"], spec["key"], tracked_fields(analytics))
+    if counts is None:
+        print("📦 Delta: no hay salida aún")
+    elif "dir" in counts:
+        print(f"📦 Delta: +{counts['inserts']} ~{counts['updates']} -{counts['deletes']} en {counts['dir']}")
+    else:
+        print("📦 Delta: sin cambios")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta de una salida respecto al estado anterior")
+    parser.add_argument("customer")
+    parser.add_argument("base")
+    parser.add_argument("entity")
+    args = parser.parse_args()
+
+    module = importlib.import_module(f"customers.{args.customer}.{args.base}.{args.entity}")
+    export_module_delta(module, DATA / args.customer / args.base)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Caché global de enriquecimiento por dominio, compartida entre customers y bases.
+
+Una misma web puede aparecer en varias bases (una agencia en comunicare que
+también tiene tienda en seraportiendas). Con --domain-cache (o DOMAIN_CACHE=1
+en el .env) las etapas websites consultan aquí antes de visitar la web y
+guardan lo que encuentran al terminar:
+
+  /data/_domains/domains.sqlite    dominio registrable -> email, teléfono,
+                                   plataforma, is_alive, tecnologías,
+                                   checked_at, source
+
+  cache = DomainCache(kwargs)
+  hit = cache.get(web)             # None si no hay nada vigente (o no se puede leer)
+  ...
+  cache.put(web, email=email, telefono=telefono)
+
+Sólo se guardan hallazgos: un email o teléfono vacío no se comparte, porque
+cada etapa busca en páginas distintas y "no encontrado" en una no vale para
+otra. is_alive y platform (portada) sí, con 0 incluido. Una etapa sólo usa
+una entrada si trae todo lo que escribe (p.ej. technologies en seraportiendas):
+si no, visita la web para no dejar la columna vacía.
+
+Privacidad por customer (POLICIES, o DOMAIN_CACHE_PRIVATE=cust1,cust2):
+  - share:  sus resultados entran en la caché global
+  - use:    puede leer lo que han aportado otros
+  - fields: qué campos comparte
+Las entradas caducan a los TTL_DAYS; las de webs caídas (is_alive=0) a los
+DEAD_TTL_DAYS, que una web caída suele volver pronto.
+
+  cd /app && python -m common.domains            # resumen por procedencia
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from common.metrics import cache_hit
+from common.normalize import registrable_domain
+
+STORE = Path("/data/_domains/domains.sqlite")
+TTL_DAYS = 30
+DEAD_TTL_DAYS = 2
+
+FIELDS = ("email", "telefono", "platform", "is_alive", "technologies")
+
+DEFAULT_POLICY = {"share": True, "use": True, "fields": FIELDS}
+# ej: "muelles_com": {"share": False}  (lee de otros pero no aporta lo suyo)
+POLICIES: dict[str, dict] = {}
+
+
+def policy(customer: str) -> dict:
+    p = {**DEFAULT_POLICY, **POLICIES.get(customer, {})}
+    private = {c.strip() for c in os.getenv("DOMAIN_CACHE_PRIVATE", "").split(",") if c.strip()}
+    if customer in private:
+        p["share"] = False
+    return p
+
+
+def enabled(kwargs: dict) -> bool:
+    if kwargs.get("reextract"):
+        # se re-extrae de las páginas archivadas: nada de atajos por dominio
+        return False
+    return bool(kwargs.get("domain_cache")) or os.getenv("DOMAIN_CACHE", "").lower() in ("1", "true", "yes")
+
+
+def connect(path: Path = STORE) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS domains ("
+        " domain TEXT PRIMARY KEY,"
+        " email TEXT,"
+        " telefono TEXT,"
+        " platform TEXT,"
+        " is_alive INTEGER,"
+        " checked_at REAL NOT NULL,"
+        " source TEXT NOT NULL,"
+        " technologies TEXT)"
+    )
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(domains)")}
+    if "technologies" not in columns:
+        # caché de antes de guardar tecnologías
+        conn.execute("ALTER TABLE domains ADD COLUMN technologies TEXT")
+    return conn
+
+
+class DomainCache:
+    def __init__(self, kwargs: dict, path: Path = STORE):
+        self.source = f"{kwargs.get('customer') or ''}/{kwargs.get('base') or ''}"
+        self.policy = policy(kwargs.get("customer") or "")
+        self.conn = None
+        if enabled(kwargs) and (self.policy["share"] or self.policy["use"]):
+            self.conn = connect(path)
+
+    def _lookup(self, domain: str) -> dict | None:
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT email, telefono, platform, is_alive, technologies FROM domains WHERE domain = ? AND checked_at >= ?"
+            " AND (is_alive IS NULL OR is_alive != 0 OR checked_at >= ?)",
+            (domain, now - TTL_DAYS * 86400, now - DEAD_TTL_DAYS * 86400),
+        ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def get(self, url: str) -> dict | None:
+        """
+        Campos vigentes del dominio de url (None = desconocido), o None si no hay entrada.
+        """
+        if self.conn is None or not self.policy["use"]:
+            return None
+        domain = registrable_domain(url)
+        if not domain:
+            return None
+        entry = self._lookup(domain)
+        cache_hit("domain", entry is not None)
+        return entry
+
+    def put(self, url: str, **found):
+        if self.conn is None or not self.policy["share"]:
+            return
+        domain = registrable_domain(url)
+        if not domain:
+            return
+        values = {
+            f: v for f, v in found.items()
+            if f in self.policy["fields"] and (f == "is_alive" or v)
+        }
+        if not values:
+            return
+        # lo que no trae esta etapa se conserva de la entrada anterior
+        old = self._lookup(domain)
+        merged = {**(old or {}), **values}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO domains (domain, email, telefono, platform, is_alive, technologies, checked_at, source)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (domain, *(merged.get(f) for f in FIELDS), time.time(), self.source),
+        )
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumen de la caché global de dominios")
+    parser.add_argument("--store", default=str(STORE))
+    args = parser.parse_args()
+
+    path = Path(args.store)
+    if not path.exists():
+        print(f"❌ No existe {path}")
+        return
+    conn = connect(path)
+    fresh = time.time() - TTL_DAYS * 86400
+    total, vigentes = conn.execute(
+        "SELECT COUNT(*), SUM(checked_at >= ?) FROM domains", (fresh,)
+    ).fetchone()
+    print(f"📊 {total} dominios ({vigentes or 0} vigentes, TTL {TTL_DAYS} días) en {path}")
+    for source, n, emails, alive in conn.execute(
+        "SELECT source, COUNT(*), SUM(email IS NOT NULL AND email != ''), SUM(is_alive = 1)"
+        " FROM domains GROUP BY source ORDER BY COUNT(*) DESC"
+    ):
+        print(f"  - {source}: {n} dominios, {emails} con email, {alive} vivos")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
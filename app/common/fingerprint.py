@@ -0,0 +1,191 @@
+"""
+Detección de tecnologías de una web en una sola pasada sobre la portada ya descargada.
+
+  found = fingerprint(html, headers=r.headers)    # {"woocommerce": 100, "wordpress": 100, "jquery": 50}
+  format_technologies(found)                      # "woocommerce:100;wordpress:100;jquery:50"
+
+  cd /app && python -m common.fingerprint https://tienda.es
+  cd /app && python -m common.fingerprint bench/fixtures/homepages/*.html
+
+Las firmas están en fingerprints.json (tecnología -> categoría y evidencias):
+  - html:    literales en el HTML (marcado, meta generator, URLs de scripts/CSS
+             e inline JS, todo en minúsculas) con su confianza
+  - scripts: igual que html; separadas sólo por legibilidad
+  - headers: cabecera -> {subcadena del valor -> confianza} ("" = basta con que exista)
+  - cookies: prefijo del nombre de cookie (Set-Cookie) -> confianza
+  - implies: tecnologías que se dan por presentes con la misma confianza
+
+Todos los literales de todas las firmas se compilan en un único regex con forma
+de trie (prefijos comunes fusionados: "wp-(?:content/|includes/|json)"), que se
+pasa una vez por el HTML: el motor de re salta en C hasta el siguiente carácter
+que puede abrir un literal, así que añadir firmas apenas cambia el coste.
+Cada coincidencia es el literal más largo en esa posición; los literales que
+son prefijo suyo se recuperan recorriendo el trie. La búsqueda sigue en la
+posición siguiente al inicio de cada coincidencia (no al final), así que también
+salen los literales que empiezan dentro de otro ("/plugins/woocommerce/" dentro
+de "/wp-content/plugins/...", "redsys" dentro de "sis.redsys.es").
+
+La confianza de una tecnología es la suma de sus evidencias distintas, hasta 100.
+"""
+
+import argparse
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+SIGNATURES = Path(__file__).with_name("fingerprints.json")
+
+_END = ""  # marca de fin de literal en el trie
+_COOKIE_RE = re.compile(r"(?:^|,)\s*([^=;,\s]+)=")
+
+
+def _build_trie(literals) -> dict:
+    trie = {}
+    for lit in literals:
+        node = trie
+        for ch in lit:
+            node = node.setdefault(ch, {})
+        node[_END] = lit
+    return trie
+
+
+def _trie_pattern(node: dict) -> str:
+    """
+    Regex sin grupos de captura equivalente a la alternancia de los literales del trie.
+    """
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items()) if ch != _END]
+    if not branches:
+        return ""
+    optional = _END in node
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    group = "(?:" + "|".join(branches) + ")"
+    return group + "?" if optional else group
+
+
+class Fingerprinter:
+    def __init__(self, signatures: dict):
+        self.signatures = signatures
+        self.evidence: dict[str, list[tuple[str, int]]] = {}  # literal -> [(tecnología, confianza)]
+        self.header_rules: dict[str, list[tuple[str, str, int]]] = {}  # cabecera -> [(tecnología, subcadena, confianza)]
+        self.cookie_rules: list[tuple[str, str, int]] = []  # [(tecnología, prefijo, confianza)]
+        for tech, sig in signatures.items():
+            for field in ("html", "scripts"):
+                for lit, conf in (sig.get(field) or {}).items():
+                    self.evidence.setdefault(lit.lower(), []).append((tech, conf))
+            for header, patterns in (sig.get("headers") or {}).items():
+                for needle, conf in patterns.items():
+                    self.header_rules.setdefault(header.lower(), []).append((tech, needle.lower(), conf))
+            for prefix, conf in (sig.get("cookies") or {}).items():
+                self.cookie_rules.append((tech, prefix.lower(), conf))
+
+        self.trie = _build_trie(self.evidence)
+        top = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(self.trie.items())]
+        # alternancia de primer nivel sin envolver: re calcula el conjunto de
+        # caracteres iniciales y salta directamente a ellos
+        self.regex = re.compile("|".join(top)) if top else None
+
+    def _prefixes(self, match: str):
+        node = self.trie
+        for ch in match:
+            node = node[ch]
+            if _END in node:
+                yield node[_END]
+
+    def _scan_html(self, html: str) -> set[str]:
+        if not html or self.regex is None:
+            return set()
+        text = html.lower()
+        search = self.regex.search
+        seen = set()
+        m = search(text)
+        while m:
+            seen.add(m.group())
+            m = search(text, m.start() + 1)
+        found = set()
+        for match in seen:
+            found.update(self._prefixes(match))
+        return found
+
+    def analyze(self, html: str, headers=None, cookies=None) -> dict[str, int]:
+        """
+        {tecnología: confianza 1..100}, de más a menos confianza.
+        headers: mapping de la respuesta (se leen también las cookies de Set-Cookie)
+        cookies: nombres de cookie adicionales
+        """
+        scores: dict[str, int] = {}
+
+        def add(tech: str, conf: int):
+            scores[tech] = min(100, scores.get(tech, 0) + conf)
+
+        for lit in self._scan_html(html):
+            for tech, conf in self.evidence[lit]:
+                add(tech, conf)
+
+        lowered = {str(k).lower(): str(v).lower() for k, v in (headers or {}).items()}
+        names = {c.lower() for c in cookies or ()}
+        names.update(n.lower() for n in _COOKIE_RE.findall(lowered.get("set-cookie", "")))
+
+        for header, value in lowered.items():
+            for tech, needle, conf in self.header_rules.get(header, ()):
+                if needle in value:
+                    add(tech, conf)
+        for tech, prefix, conf in self.cookie_rules:
+            if any(n.startswith(prefix) for n in names):
+                add(tech, conf)
+
+        for tech, conf in list(scores.items()):
+            for implied in self.signatures[tech].get("implies") or ():
+                scores[implied] = max(scores.get(implied, 0), conf)
+
+        return dict(sorted(scores.items(), key=lambda kv: (-kv[1], kv[0])))
+
+    def categories(self, found: dict[str, int]) -> dict[str, list[str]]:
+        out: dict[str, list[str]] = {}
+        for tech in found:
+            out.setdefault(self.signatures[tech].get("category") or "", []).append(tech)
+        return out
+
+
+@lru_cache(maxsize=1)
+def default_engine() -> Fingerprinter:
+    return Fingerprinter(json.loads(SIGNATURES.read_text(encoding="utf-8")))
+
+
+def fingerprint(html: str, headers=None, cookies=None) -> dict[str, int]:
+    return default_engine().analyze(html, headers, cookies)
+
+
+def format_technologies(found: dict[str, int]) -> str:
+    """
+    {"shopify": 100, "hotjar": 50} -> "shopify:100;hotjar:50" (columna CSV)
+    """
+    return ";".join(f"{tech}:{conf}" for tech, conf in found.items())
+
+
+def main():
+    from common.http import new_session
+
+    parser = argparse.ArgumentParser(description="Tecnologías detectadas en una web o en HTML guardado")
+    parser.add_argument("targets", nargs="+", help="URLs o ficheros .html")
+    args = parser.parse_args()
+
+    engine = default_engine()
+    session = None
+    for target in args.targets:
+        if target.startswith(("http://", "https://")):
+            session = session or new_session({"User-Agent": "Mozilla/5.0"})
+            r = session.get(target, timeout=15)
+            found = engine.analyze(r.text, r.headers)
+        else:
+            found = engine.analyze(Path(target).read_text(encoding="utf-8", errors="replace"))
+        print(f"🔎 {target}")
+        for category, techs in engine.categories(found).items():
+            print(f"  - {category}: " + ", ".join(f"{t} ({found[t]})" for t in techs))
+        if not found:
+            print("  (nada reconocido)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Recrawl incremental por frescura: run.py ... websites --recrawl [--recrawl-budget 2000]
+
+Sin --recrawl una fila ya presente en la salida está hecha para siempre
+(_load_already_processed). Con --recrawl:
+
+  1. Cada fila escrita deja en <out_dir>/.freshness/<salida>.sqlite su
+     verified_at y un hash por campo seguido (web, email, teléfono), y cuenta
+     cuántas veces ha cambiado cada campo entre verificaciones (se escribe
+     en lotes de BATCH_ROWS filas y al cerrar la salida). Esto se hace en
+     todas las ejecuciones, también sin --recrawl: así el primer --recrawl
+     sabe cuándo se verificó de verdad cada fila.
+  2. Un registro vence cuando pasa el TTL de alguno de sus campos: FIELD_TTL_DAYS
+     si el campo tiene valor, MISSING_TTL_DAYS si está vacío (quizá ahora sí esté).
+     Los campos que cambian a menudo tienen un TTL efectivo más corto.
+  3. Se recrawlean sólo los vencidos, de más a menos atrasados, hasta el
+     presupuesto de la ejecución: la etapa los quita de su set de procesados.
+  4. Al terminar se compacta la salida: queda la última fila de cada clave,
+     en su posición original.
+
+Clave y campos: PARALLEL["key"] y ANALYTICS de la etapa (como --delta).
+Filas anteriores a esta funcionalidad se dan por verificadas en el mtime del CSV.
+"""
+
+import csv
+import importlib
+import sqlite3
+import time
+from functools import lru_cache
+from pathlib import Path
+
+from common.delta import field_hash, tracked_fields
+
+DAY = 86400.0
+
+FIELD_TTL_DAYS = {"website": 90, "email": 30, "telefono": 60}
+MISSING_TTL_DAYS = 14
+DEFAULT_TTL_DAYS = 60
+# ttl_efectivo = ttl / (1 + CHANGE_WEIGHT * cambios_por_verificación)
+CHANGE_WEIGHT = 2.0
+
+DEFAULT_BUDGET = 1000
+# filas que el sink acumula antes de escribirlas en el store (en una transacción corta)
+BATCH_ROWS = 200
+
+
+def store_path(csv_path: Path) -> Path:
+    return csv_path.parent / ".freshness" / f"{csv_path.stem}.sqlite"
+
+
+def connect(csv_path: Path) -> sqlite3.Connection:
+    path = store_path(csv_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS leads ("
+        " key TEXT PRIMARY KEY,"
+        " verified_at REAL NOT NULL,"
+        " checks INTEGER NOT NULL,"
+        " hashes TEXT NOT NULL,"
+        " changes TEXT NOT NULL)"
+    )
+    return conn
+
+
+def stage_spec(kwargs: dict):
+    """
+    (PARALLEL, ANALYTICS) de la etapa en curso, o None si no los declara.
+    """
+    if not kwargs.get("entity"):
+        return None
+    return _stage_spec(kwargs["customer"], kwargs["base"], kwargs["entity"])
+
+
+@lru_cache(maxsize=None)
+def _stage_spec(customer: str, base: str, entity: str):
+    # cada StageOutput lo pide al abrirse: se resuelve una vez por etapa
+    module = importlib.import_module(f"customers.{customer}.{base}.{entity}")
+    parallel = getattr(module, "PARALLEL", None)
+    analytics = getattr(module, "ANALYTICS", None)
+    if not parallel or not analytics:
+        return None
+    return parallel, analytics
+
+
+# =========================
+# REGISTRO (sink de StageOutput)
+# =========================
+class FreshnessSink:
+    def __init__(self, csv_path: Path, spec: tuple[dict, dict]):
+        parallel, analytics = spec
+        self.key_fn = parallel["key"]
+        self.fields = tracked_fields(analytics)
+        # con --workers se escribe en website.partN.csv pero el store es el de la salida
+        self.conn = connect(csv_path.parent / parallel["output"])
+
+        self.pending: list[tuple[str, float, list[str]]] = []
+
+    def write(self, row: dict):
+        key = self.key_fn(row)
+        if not key:
+            return
+        self.pending.append((key, time.time(), [field_hash(row.get(c)) for c in self.fields]))
+
+    def _store(self):
+        """
+        Escribe lo acumulado en una sola transacción, corta: con --workers
+        todos los procesos comparten el store y no se bloquean entre sí.
+        """
+        if not self.pending:
+            return
+        with self.conn:
+            for key, verified_at, hashes in self.pending:
+                prev = self.conn.execute("SELECT checks, hashes, changes FROM leads WHERE key = ?", (key,)).fetchone()
+                if prev is None:
+                    checks, changes = 1, [0] * len(hashes)
+                else:
+                    old = prev[1].split(",")
+                    changes = [int(c) + (a != b) for c, a, b in zip(prev[2].split(","), old, hashes)]
+                    checks = prev[0] + 1
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO leads (key, verified_at, checks, hashes, changes) VALUES (?, ?, ?, ?, ?)",
+                    (key, verified_at, checks, ",".join(hashes), ",".join(map(str, changes))),
+                )
+        self.pending = []
+
+    def flush(self):
+        if len(self.pending) >= BATCH_ROWS:
+            self._store()
+
+    def close(self):
+        self._store()
+        self.conn.close()
+
+
+# =========================
+# PLANIFICACIÓN
+# =========================
+def _bootstrap(conn: sqlite3.Connection, csv_path: Path, key_fn, fields: list[str]):
+    """
+    Claves del CSV que no están en el store: verificadas en el mtime del CSV.
+    """
+    known = {k for (k,) in conn.execute("SELECT key FROM leads")}
+    mtime = csv_path.stat().st_mtime
+    new = {}
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            key = key_fn(row)
+            if key and key not in known:
+                new[key] = ",".join(field_hash(row.get(c)) for c in fields)
+    if new:
+        zeros = ",".join("0" for _ in fields)
+        conn.executemany(
+            "INSERT OR IGNORE INTO leads (key, verified_at, checks, hashes, changes) VALUES (?, ?, 1, ?, ?)",
+            [(k, mtime, h, zeros) for k, h in new.items()],
+        )
+        conn.commit()
+
+
+def _ttl_days(field: str, filled: bool, changes: int, checks: int) -> float:
+    ttl = FIELD_TTL_DAYS.get(field, DEFAULT_TTL_DAYS) if filled else MISSING_TTL_DAYS
+    rate = changes / max(checks - 1, 1)
+    return ttl / (1.0 + CHANGE_WEIGHT * rate)
+
+
+def staleness(row: tuple, field_names: list[str], now: float) -> float:
+    """
+    Edad / TTL efectivo más corto entre los campos: >= 1 es que ha vencido.
+    """
+    _, verified_at, checks, hashes, changes = row
+    ttl = min(
+        _ttl_days(f, h != "-", int(c), checks)
+        for f, h, c in zip(field_names, hashes.split(","), changes.split(","))
+    )
+    return (now - verified_at) / (ttl * DAY)
+
+
+def due_keys(csv_path: Path, spec: tuple[dict, dict], budget: int, now: float | None = None) -> list[str]:
+    parallel, analytics = spec
+    fields = tracked_fields(analytics)
+    # nombres lógicos para los TTL (la columna de web se llama distinto en cada etapa)
+    field_names = ["website", "email", "telefono"]
+    now = time.time() if now is None else now
+
+    conn = connect(csv_path)
+    try:
+        if csv_path.exists():
+            _bootstrap(conn, csv_path, parallel["key"], fields)
+        scored = []
+        for row in conn.execute("SELECT key, verified_at, checks, hashes, changes FROM leads"):
+            s = staleness(row, field_names, now)
+            if s >= 1.0:
+                scored.append((s, row[0]))
+    finally:
+        conn.close()
+
+    scored.sort(reverse=True)
+    return [k for _, k in scored[:budget]]
+
+
+def due_for_recrawl(out_path: Path, kwargs: dict) -> set[str]:
+    """
+    Para las etapas: claves a quitar del set de procesados en esta ejecución.
+    """
+    if not kwargs.get("recrawl"):
+        return set()
+    spec = stage_spec(kwargs)
+    if spec is None:
+        return set()
+    due = due_keys(out_path, spec, kwargs.get("recrawl_budget") or DEFAULT_BUDGET)
+    print(f"🔁 Recrawl: {len(due)} registros vencidos a re-verificar")
+    return set(due)
+
+
+# =========================
+# COMPACTACIÓN
+# =========================
+def compact_output(csv_path: Path, key_fn) -> int:
+    """
+    Deja la última fila de cada clave en la posición de la primera.
+    Devuelve cuántas filas antiguas se han descartado.
+    """
+    from common.output import invalidate_derived
+
+    if not csv_path.exists():
+        return 0
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames or []
+        rows = list(reader)
+
+    latest = {}
+    order = []
+    for row in rows:
+        key = key_fn(row) or f"\0{len(order)}"
+        if key not in latest:
+            order.append(key)
+        latest[key] = row
+
+    dropped = len(rows) - len(order)
+    if not dropped:
+        return 0
+
+    tmp = csv_path.with_name(csv_path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w.writeheader()
+        w.writerows(latest[k] for k in order)
+    tmp.replace(csv_path)
+    invalidate_derived(csv_path)
+    return dropped
+
+
+def compact_module_output(module, out_dir: Path):
+    spec = getattr(module, "PARALLEL", None)
+    if not spec:
+        return
+    dropped = compact_output(Path(out_dir) / spec["output"], spec["key"])
+    if dropped:
+        print(f"🔁 Recrawl: {dropped} filas antiguas sustituidas por su versión nueva")
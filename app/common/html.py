@@ -0,0 +1,11 @@
+from bs4 import BeautifulSoup
+
+from common.metrics import timer
+
+
+def parse_html(html: str) -> BeautifulSoup:
+    """
+    BeautifulSoup con html.parser, cronometrado como fase "parse".
+    """
+    with timer("parse"):
+        return BeautifulSoup(html or "", "html.parser")
@@ -0,0 +1,131 @@
+"""
+Capa de fetch compartida por todas las etapas.
+
+Las etapas crean su sesión con new_session(HEADERS, kwargs) en vez de
+requests.Session(): mismo API, pero cada petición pasa por aquí.
+
+kwargs que entiende (los pasa run.py):
+  - record: directorio donde grabar cada petición/respuesta (common.replay)
+  - replay: URL de un servidor de replay al que redirigir todas las peticiones
+  - archive: directorio WARC donde archivar cada página descargada (common.archive)
+  - reextract: directorio WARC del que servir las páginas, sin red (common.archive)
+  - deadline, max_requests, max_bytes, max_per_host: presupuesto de la
+    ejecución (common.budget); al agotarse, BudgetExhausted
+  - egress: pool de proxies / IPs de origen por el que salir (common.egress)
+
+Las pausas de cortesía entre peticiones se hacen con session.pause(segundos):
+sin red de por medio (--reextract) no esperan, y nunca más allá de la hora límite.
+"""
+
+import time
+from urllib.parse import urlparse
+
+import requests
+
+from common import metrics
+from common.archive import get_reader, get_writer
+from common.budget import RunBudget, get_budget
+from common.egress import EgressAdapter, EgressPool, get_pool
+from common.replay import (
+    REPLAY_ERROR_HEADER,
+    REPLAY_FINAL_URL_HEADER,
+    REPLAY_METHOD_HEADER,
+    REPLAY_URL_HEADER,
+    get_recorder,
+)
+
+
+def _host(url: str) -> str:
+    return (urlparse(url).hostname or "").lower()
+
+
+def _full_url(url: str, params) -> str:
+    # clave de grabación/archivo: la URL con su query (session.get(url, params=...))
+    return requests.Request("GET", url, params=params).prepare().url if params else url
+
+
+class FetchSession(requests.Session):
+    def __init__(self, record: str | None = None, replay: str | None = None,
+                 archive: str | None = None, reextract: str | None = None,
+                 budget: RunBudget | None = None, egress: EgressPool | None = None):
+        super().__init__()
+        self.recorder = get_recorder(record) if record else None
+        self.replay = replay.rstrip("/") if replay else None
+        self.archive = get_writer(archive) if archive and not reextract else None
+        self.offline = get_reader(reextract) if reextract else None
+        self.budget = budget
+        if egress:
+            adapter = EgressAdapter(egress)
+            self.mount("http://", adapter)
+            self.mount("https://", adapter)
+
+    def pause(self, seconds: float):
+        if self.budget:
+            seconds = self.budget.pause(seconds)
+        if self.offline is None:
+            time.sleep(seconds)
+
+    def _send_replay(self, method, url, *args, **kwargs):
+        # la query va en la cabecera con el resto de la URL, no en /replay
+        kwargs.pop("params", None)
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers[REPLAY_URL_HEADER] = url
+        headers[REPLAY_METHOD_HEADER] = method.upper()
+        kwargs["allow_redirects"] = False
+
+        r = super().request(method, self.replay + "/replay", *args, headers=headers, **kwargs)
+
+        err = r.headers.get(REPLAY_ERROR_HEADER)
+        if err:
+            exc = getattr(requests.exceptions, err, requests.exceptions.ConnectionError)
+            raise exc(f"replay: {err} en {url}")
+
+        r.url = r.headers.get(REPLAY_FINAL_URL_HEADER, url)
+        return r
+
+    def request(self, method, url, *args, **kwargs):
+        host = _host(url)
+        full_url = _full_url(url, kwargs.get("params"))
+        if self.budget:
+            self.budget.check(host)
+            kwargs["timeout"] = self.budget.clamp_timeout(kwargs.get("timeout"))
+        metrics.HTTP_REQUESTS.labels(host=host).inc()
+
+        try:
+            with metrics.timer("fetch"):
+                if self.offline:
+                    r = self.offline.response(method, full_url)
+                elif self.replay:
+                    r = self._send_replay(method, full_url, *args, **kwargs)
+                else:
+                    r = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            metrics.HTTP_RESPONSES.labels(host=host, code="error").inc()
+            if self.recorder:
+                self.recorder.record_error(method, full_url, e)
+            raise
+
+        metrics.HTTP_RESPONSES.labels(host=host, code=r.status_code).inc()
+        if kwargs.get("stream") and not self.recorder:
+            # el body lo va leyendo quien llama (common.sitemap): aquí no se toca
+            size = int(r.headers.get("Content-Length") or 0)
+        else:
+            size = len(r.content or b"")
+        metrics.HTTP_BYTES.labels(host=host).inc(size)
+        if self.budget:
+            self.budget.spent(size)
+        if self.recorder:
+            self.recorder.record(method, full_url, r)
+        if self.archive and not kwargs.get("stream"):
+            self.archive.record(method, full_url, r)
+        return r
+
+
+def new_session(headers: dict | None = None, kwargs: dict | None = None) -> FetchSession:
+    kwargs = kwargs or {}
+    session = FetchSession(record=kwargs.get("record"), replay=kwargs.get("replay"),
+                           archive=kwargs.get("archive"), reextract=kwargs.get("reextract"),
+                           budget=get_budget(kwargs), egress=get_pool(kwargs))
+    if headers:
+        session.headers.update(headers)
+    return session
@@ -0,0 +1,148 @@
+"""
+Salida a prueba de cortes para las etapas de listado (provincias, ciudades,
+categorías, subcategorías, empresas), que antes juntaban todo en memoria y
+escribían el CSV al final.
+
+  with SectionJournal(out_path, fieldnames, kwargs) as out:
+      for provincia_url in ...:
+          if out.done(provincia_url):
+              continue                    # terminada en una ejecución anterior
+          ...
+          out.writerow({...})             # a disco según se extrae
+          out.complete(provincia_url)     # marca de sección terminada
+      out.commit()                        # rename atómico sobre out_path
+
+Mientras tanto las filas van a <out_dir>/.journal/<salida>.csv (con sus
+salidas derivadas, vía StageOutput) y cada sección terminada deja una línea
+{"section", "offset"} en <salida>.sections. out_path no se toca hasta
+commit(): quien la lea ve siempre la versión anterior completa.
+
+Tras un corte, la siguiente ejecución recorta el journal a la última sección
+terminada (lo de la sección a medias se repite) y se salta las terminadas.
+Un journal de hace más de MAX_AGE_HOURS se descarta: el listado habrá cambiado.
+"""
+
+import csv
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+from common.output import StageOutput, invalidate_derived
+from common.summary import summary_path
+
+MAX_AGE_HOURS = 24
+
+
+class SectionJournal:
+    def __init__(self, out_path: Path, fieldnames: list[str], kwargs: dict | None = None):
+        self.out_path = Path(out_path)
+        self.fieldnames = list(fieldnames)
+        jdir = self.out_path.parent / ".journal"
+        jdir.mkdir(parents=True, exist_ok=True)
+        self.path = jdir / self.out_path.name
+        self.markers = jdir / f"{self.out_path.stem}.sections"
+        self.completed: dict[str, int] = {}
+        self.committed = False
+
+        self._restore()
+        self.out = StageOutput(self.path, self.fieldnames, kwargs)
+        self._markers = self.markers.open("a", encoding="utf-8")
+
+    def _discard(self):
+        invalidate_derived(self.path)
+        self.path.unlink(missing_ok=True)
+        self.markers.unlink(missing_ok=True)
+
+    def _restore(self):
+        if not self.path.exists() or not self.markers.exists():
+            self._discard()
+            return
+        if time.time() - self.path.stat().st_mtime > MAX_AGE_HOURS * 3600:
+            print(f"↪️ Journal de {self.out_path.name} demasiado antiguo: se empieza de cero")
+            self._discard()
+            return
+        with self.path.open(newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+        if header != self.fieldnames:
+            self._discard()
+            return
+
+        with self.markers.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    m = json.loads(line)
+                except ValueError:
+                    break  # marca a medio escribir: la sección no terminó
+                self.completed[m["section"]] = m["offset"]
+        if not self.completed:
+            self._discard()
+            return
+
+        # fuera lo escrito por la sección que se quedó a medias
+        end = max(self.completed.values())
+        if self.path.stat().st_size > end:
+            with self.path.open("r+b") as f:
+                f.truncate(end)
+            invalidate_derived(self.path)
+        with self.markers.open("w", encoding="utf-8") as f:
+            for section, offset in self.completed.items():
+                f.write(json.dumps({"section": section, "offset": offset}, ensure_ascii=False) + "\n")
+        print(f"↩️ Journal: {len(self.completed)} secciones ya terminadas en {self.path}")
+
+    def done(self, section: str) -> bool:
+        return section in self.completed
+
+    def writerow(self, row: dict):
+        self.out.writerow(row)
+
+    def writerows(self, rows):
+        self.out.writerows(rows)
+
+    def complete(self, section: str):
+        """
+        Sección terminada: todo lo escrito hasta aquí sobrevive a un corte.
+        """
+        offset = self.path.stat().st_size
+        self.completed[section] = offset
+        self._markers.write(json.dumps({"section": section, "offset": offset}, ensure_ascii=False) + "\n")
+        self._markers.flush()
+        os.fsync(self._markers.fileno())
+
+    def rows(self):
+        """
+        Filas ya en el journal (p.ej. para rehacer los sets de duplicados al reanudar).
+        """
+        with self.path.open(newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+    def commit(self) -> Path:
+        """
+        Sustituye out_path por el journal (y sus derivadas) de una vez.
+        """
+        from common.columnar import dataset_path
+
+        self.out.close()
+        self._markers.close()
+        invalidate_derived(self.out_path)
+        if summary_path(self.path).exists():
+            os.replace(summary_path(self.path), summary_path(self.out_path))
+        if dataset_path(self.path).exists():
+            shutil.move(dataset_path(self.path), dataset_path(self.out_path))
+        os.replace(self.path, self.out_path)
+        self.markers.unlink(missing_ok=True)
+        self.committed = True
+        return self.out_path
+
+    def close(self):
+        if not self.committed:
+            self.out.close()
+            self._markers.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
@@ -0,0 +1,213 @@
+"""
+Fusión de leads entre fuentes y ejecuciones.
+
+  cd /app && python -m common.leads                       # todas las salidas con ANALYTICS
+  cd /app && python -m common.leads --out /data/_leads/leads.csv --columnar
+
+Cada fila de cada salida (website.csv de amisando y comunicare, websites.csv
+de seraportiendas...) se indexa por dominio normalizado, teléfono normalizado
+y email. Los índices de bloqueo son dicts clave -> primera fila vista; dos filas
+que comparten cualquier clave se unen (union-find), así que el coste es lineal
+en filas y no hay comparaciones por pares.
+
+Con --fuzzy-names además se unen grupos cuyo nombre de empresa es casi igual
+("Adriels" / "Adriels Moda S.L.", ver common.names), vía MinHash/LSH.
+
+Salida: un lead canónico por grupo, con la procedencia (fuente y nº de fila) de
+cada fila que lo forma.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+from collections import Counter
+from pathlib import Path
+
+from common.analytics import DATA, discover
+from common.names import NameIndex
+from common.normalize import domain_key, normalize_email, normalize_phone, phone_key
+from common.output import StageOutput
+
+DEFAULT_OUT = DATA / "_leads" / "leads.csv"
+
+LEAD_FIELDS = [
+    "lead_id",
+    "domain",
+    "email",
+    "telefono",
+    "empresa",
+    "n_rows",
+    "n_sources",
+    "sources",
+    "provenance",
+]
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent = []
+
+    def add(self) -> int:
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, i: int) -> int:
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # el menor índice como raíz: grupos estables entre ejecuciones
+            if rb < ra:
+                ra, rb = rb, ra
+            self.parent[rb] = ra
+
+
+def _iter_source_rows(customer: str, base: str, spec: dict):
+    csv_path = DATA / customer / base / spec["output"]
+    if not csv_path.exists():
+        return
+    source = f"{customer}/{base}/{spec['output']}"
+    web_col = spec.get("website", "website")
+    email_col = spec.get("email", "email")
+    tel_col = spec.get("telefono", "telefono")
+    name_col = spec.get("empresa", "empresa")
+
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f), start=1):
+            yield {
+                "source": source,
+                "row": i,
+                "web": row.get(web_col) or "",
+                "email": normalize_email(row.get(email_col) or ""),
+                "telefono": normalize_phone(row.get(tel_col) or ""),
+                "empresa": (row.get(name_col) or "").strip(),
+            }
+
+
+def build_groups(records_iter) -> tuple[list[dict], list[list[int]]]:
+    """
+    (registros, grupos de índices de registro) vía índices de bloqueo.
+    """
+    uf = _UnionFind()
+    records = []
+    index = {}  # ("d"|"t"|"e", clave) -> primer registro con esa clave
+
+    for rec in records_iter:
+        i = uf.add()
+        records.append(rec)
+        rec["domain"] = domain_key(rec["web"])
+        keys = rec["keys"] = [
+            k for k in (
+                ("d", rec["domain"]),
+                ("t", phone_key(rec["telefono"])),
+                ("e", rec["email"]),
+            ) if k[1]
+        ]
+        for k in keys:
+            j = index.setdefault(k, i)
+            if j != i:
+                uf.union(i, j)
+
+    groups = {}
+    for i in range(len(records)):
+        groups.setdefault(uf.find(i), []).append(i)
+    return records, list(groups.values())
+
+
+def _most_common(values: list[str]) -> str:
+    if len(values) == 1:
+        return values[0]
+    values = [v for v in values if v]
+    return Counter(values).most_common(1)[0][0] if values else ""
+
+
+def canonical_lead(records: list[dict], members: list[int]) -> dict:
+    rows = [records[i] for i in members]
+    keys = sorted({k for r in rows for k in r["keys"]})
+    if keys:
+        ident = "|".join(keys[0])
+    else:
+        # sin ninguna clave: el lead es la propia fila
+        ident = f"{rows[0]['source']}#{rows[0]['row']}"
+
+    sources = sorted({r["source"] for r in rows})
+    return {
+        "lead_id": hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16],
+        "domain": _most_common([r["domain"] for r in rows]),
+        "email": _most_common([r["email"] for r in rows]),
+        "telefono": _most_common([r["telefono"] for r in rows]),
+        "empresa": _most_common([r["empresa"] for r in rows]),
+        "n_rows": len(rows),
+        "n_sources": len(sources),
+        "sources": ";".join(sources),
+        "provenance": json.dumps([[r["source"], r["row"]] for r in rows], ensure_ascii=False),
+    }
+
+
+def _join_fuzzy_names(records: list[dict], groups: list[list[int]], threshold: float) -> list[list[int]]:
+    """
+    Une los grupos cuyo nombre de empresa (el más repetido) es casi igual.
+    """
+    idx = NameIndex(threshold=threshold)
+    uf = _UnionFind()
+    for g, members in enumerate(groups):
+        uf.add()
+        name = _most_common([records[i]["empresa"] for i in members])
+        for other, _ in idx.query(name):
+            uf.union(g, other)
+        idx.add(g, name)
+
+    joined = {}
+    for g, members in enumerate(groups):
+        joined.setdefault(uf.find(g), []).extend(members)
+    return list(joined.values())
+
+
+def merge(sources: list[tuple[str, str, dict]], fuzzy_names: float | None = None) -> list[dict]:
+    def all_rows():
+        for customer, base, spec in sources:
+            yield from _iter_source_rows(customer, base, spec)
+
+    records, groups = build_groups(all_rows())
+    if fuzzy_names:
+        groups = _join_fuzzy_names(records, groups, fuzzy_names)
+    leads = [canonical_lead(records, g) for g in groups]
+    leads.sort(key=lambda lead: (-lead["n_rows"], lead["lead_id"]))
+    return leads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusiona los leads de todas las fuentes")
+    parser.add_argument("customer", nargs="?")
+    parser.add_argument("base", nargs="?")
+    parser.add_argument("--out", default=str(DEFAULT_OUT), help="CSV de leads fusionados")
+    parser.add_argument("--columnar", action="store_true", help="Escribe también el dataset Parquet")
+    parser.add_argument("--fuzzy-names", type=float, nargs="?", const=0.8, default=None,
+                        help="Une también leads con nombre casi igual (umbral, por defecto 0.8)")
+    args = parser.parse_args()
+
+    sources = discover(args.customer, args.base)
+    print(f"▶ Fusionando {len(sources)} fuentes: " + ", ".join(f"{c}/{b}/{s['output']}" for c, b, s in sources))
+
+    leads = merge(sources, fuzzy_names=args.fuzzy_names)
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with StageOutput(out_path, LEAD_FIELDS, {"columnar": args.columnar}, mode="w") as out:
+        out.writerows(leads)
+
+    rows = sum(lead["n_rows"] for lead in leads)
+    multi = sum(1 for lead in leads if lead["n_sources"] > 1)
+    print(f"✅ {rows} filas -> {len(leads)} leads ({multi} en varias fuentes) en {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Registro de métricas en proceso con salida en formato texto de Prometheus.
+
+  run.py ... --metrics-port 8000   ->   http://localhost:8008/metrics (docker-compose)
+
+(La API de leads, common.api, escucha en el 8001: se pueden tener las dos a la vez.)
+
+En modo --workers cada proceso vuelca su registro a <out_dir>/.metrics/wN.json
+y el proceso padre sirve la suma de todos.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# report_lead_times: a cuánto del arranque llegan el 1.º, 10.º, 100.º... lead útil
+LEAD_MILESTONES = (1, 10, 100, 1000, 10000)
+
+_lock = threading.Lock()
+
+
+class _Child:
+    def __init__(self, metric, key: tuple):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0):
+        with _lock:
+            v = self._metric.values
+            v[self._key] = v.get(self._key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with _lock:
+            self._metric.values[self._key] = float(value)
+
+    def observe(self, value: float):
+        m = self._metric
+        with _lock:
+            h = m.values.get(self._key)
+            if h is None:
+                h = m.values[self._key] = [0] * len(m.buckets) + [0.0, 0]
+            for i, le in enumerate(m.buckets):
+                if value <= le:
+                    h[i] += 1
+            h[-2] += value
+            h[-1] += 1
+
+
+class Metric:
+    def __init__(self, name: str, help: str, kind: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if kind == "histogram" else ()
+        self.values = {}
+        REGISTRY[name] = self
+
+    def labels(self, **labels) -> _Child:
+        return _Child(self, tuple(str(labels.get(k, "")) for k in self.labelnames))
+
+    # atajos para métricas sin labels
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+REGISTRY: dict[str, Metric] = {}
+
+
+# =========================
+# MÉTRICAS DEL CRAWL
+# =========================
+HTTP_REQUESTS = Metric(
+    "leadgen_http_requests_total", "Peticiones HTTP enviadas", "counter", ["host"]
+)
+HTTP_RESPONSES = Metric(
+    "leadgen_http_responses_total", "Respuestas HTTP por código (error = excepción)", "counter", ["host", "code"]
+)
+HTTP_BYTES = Metric(
+    "leadgen_http_response_bytes_total", "Bytes descargados", "counter", ["host"]
+)
+PHASE_SECONDS = Metric(
+    "leadgen_phase_seconds", "Latencia por fase (fetch, parse, extract, write)", "histogram", ["phase"]
+)
+QUEUE_DEPTH = Metric(
+    "leadgen_queue_depth", "Filas de input pendientes", "gauge", ["queue"]
+)
+CACHE_LOOKUPS = Metric(
+    "leadgen_cache_lookups_total", "Consultas a caches (resume, dominios...)", "counter", ["cache", "result"]
+)
+EGRESS_REQUESTS = Metric(
+    "leadgen_egress_requests_total", "Peticiones por salida del pool de egress y resultado", "counter", ["egress", "result"]
+)
+LEADS = Metric(
+    "leadgen_leads_total", "Leads escritos", "counter", ["stage"]
+)
+LEADS_WITH = Metric(
+    "leadgen_leads_with_field_total", "Leads escritos con el campo relleno", "counter", ["stage", "field"]
+)
+
+
+# =========================
+# TIMERS
+# =========================
+_local = threading.local()
+
+
+class timer:
+    """
+    Cronometra una fase. Los timers anidados se descuentan del padre,
+    así "extract" no incluye el tiempo de "parse" que hace por dentro.
+
+      with timer("parse"):
+          soup = BeautifulSoup(html, "html.parser")
+    """
+
+    def __init__(self, phase: str):
+        self.phase = phase
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self._start = time.perf_counter()
+        self._children = 0.0
+        stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        stack = _local.stack
+        stack.pop()
+        if stack:
+            stack[-1]._children += elapsed
+        PHASE_SECONDS.labels(phase=self.phase).observe(elapsed - self._children)
+        return False
+
+    def __call__(self, fn):
+        phase = self.phase
+
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return fn(*args, **kwargs)
+
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__wrapped__ = fn
+        return wrapper
+
+
+_STARTED = time.monotonic()
+_useful_leads: dict[str, list] = {}  # etapa -> [leads útiles, segundos hasta cada hito]
+
+
+def record_lead(kwargs, **fields):
+    """
+    Rendimiento de extracción: cuántos leads llevan email, teléfono, web...
+    Mismos nombres de campo en todas las etapas (email, telefono, website)
+    para que leadgen_leads_with_field_total se pueda comparar entre ellas.
+    """
+    stage = kwargs.get("entity") or ""
+    LEADS.labels(stage=stage).inc()
+    for field, value in fields.items():
+        if value:
+            LEADS_WITH.labels(stage=stage, field=field).inc()
+
+    # útil = con algún contacto (email o teléfono)
+    if fields.get("email") or fields.get("telefono"):
+        with _lock:
+            times = _useful_leads.setdefault(stage, [0, []])
+            times[0] += 1
+            if times[0] in LEAD_MILESTONES:
+                times[1].append(time.monotonic() - _STARTED)
+
+
+def report_lead_times(kwargs):
+    """
+    Al final de la etapa: leads útiles y cuándo se alcanzó cada hito
+    (lo que importa si la ventana de ejecución se corta antes de acabar).
+    """
+    useful, times = _useful_leads.get(kwargs.get("entity") or "", [0, []])
+    hits = " · ".join(f"{n}.º a los {t:.1f}s" for n, t in zip(LEAD_MILESTONES, times))
+    print(f"⏱️ {useful} leads útiles (email o teléfono)" + (f": {hits}" if hits else ""))
+
+
+def cache_hit(cache: str, hit: bool) -> bool:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+    return hit
+
+
+def track_queue(kwargs, input_csv: Path, done: int = 0) -> _Child:
+    """
+    Gauge de filas pendientes; en modo --workers cada worker se lleva ~1/N.
+    done: filas ya recorridas en ejecuciones anteriores (common.cursor)
+    """
+    queue = QUEUE_DEPTH.labels(queue=kwargs.get("entity") or "")
+    queue.set(max(0, count_rows(input_csv) - done) // (kwargs.get("workers") or 1))
+    return queue
+
+
+def count_rows(csv_path: Path) -> int:
+    """
+    Aproximación rápida (sin parsear) al número de filas de un CSV.
+    """
+    if not csv_path.exists():
+        return 0
+    n = 0
+    with csv_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            n += chunk.count(b"\n")
+    return max(0, n - 1)
+
+
+# =========================
+# EXPOSICIÓN
+# =========================
+def snapshot() -> dict:
+    with _lock:
+        return {
+            name: {
+                "help": m.help,
+                "kind": m.kind,
+                "labelnames": list(m.labelnames),
+                "buckets": list(m.buckets),
+                "values": [[list(k), v] for k, v in m.values.items()],
+            }
+            for name, m in REGISTRY.items()
+        }
+
+
+def _merge(snapshots: list[dict]) -> dict:
+    out = {}
+    for snap in snapshots:
+        for name, m in snap.items():
+            dst = out.setdefault(name, {**m, "values": {}})
+            for k, v in m["values"]:
+                k = tuple(k)
+                prev = dst["values"].get(k)
+                if prev is None:
+                    dst["values"][k] = list(v) if isinstance(v, list) else v
+                elif isinstance(v, list):
+                    dst["values"][k] = [a + b for a, b in zip(prev, v)]
+                else:
+                    dst["values"][k] = prev + v
+    return out
+
+
+def _fmt_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(snapshot_dir: Path | None = None) -> str:
+    snaps = [snapshot()]
+    if snapshot_dir and snapshot_dir.exists():
+        for p in sorted(snapshot_dir.glob("*.json")):
+            try:
+                snaps.append(json.loads(p.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+
+    lines = []
+    for name, m in sorted(_merge(snaps).items()):
+        lines.append(f"# HELP {name} {m['help']}")
+        lines.append(f"# TYPE {name} {m['kind']}")
+        names = m["labelnames"]
+        for k, v in sorted(m["values"].items()):
+            if m["kind"] != "histogram":
+                lines.append(f"{name}{_fmt_labels(names, k)} {v}")
+                continue
+            for le, c in zip(m["buckets"], v):
+                le_label = 'le="%s"' % le
+                lines.append(f"{name}_bucket{_fmt_labels(names, k, le_label)} {c}")
+            inf_label = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_fmt_labels(names, k, inf_label)} {v[-1]}")
+            lines.append(f"{name}_sum{_fmt_labels(names, k)} {v[-2]}")
+            lines.append(f"{name}_count{_fmt_labels(names, k)} {v[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def serve(port: int, snapshot_dir: Path | None = None) -> ThreadingHTTPServer:
+    """
+    Arranca /metrics en un hilo daemon.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render(snapshot_dir).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Métricas en http://0.0.0.0:{port}/metrics")
+    return server
+
+
+def start_snapshots(path: Path, interval: float = 2.0):
+    """
+    Para workers: vuelca el registro a disco periódicamente (escritura atómica).
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    def dump():
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot()), encoding="utf-8")
+        tmp.replace(path)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            dump()
+
+    threading.Thread(target=loop, daemon=True).start()
+    return dump
@@ -0,0 +1,266 @@
+"""
+Nombres de empresa: normalización y búsqueda de casi-duplicados.
+
+  normalize_empresa("Adriels Moda S.L.")  -> "adriels moda s.l."   (clave exacta, DISTINCT)
+  company_key("Adriels Moda S.L.")        -> "adriels moda"        (sin forma jurídica ni signos)
+
+NameIndex encuentra nombres parecidos sin comparar todos contra todos:
+  - MinHash de los trigramas de company_key + LSH por bandas: sólo se comparan
+    nombres que caen en algún cubo común.
+  - Bloque por primera palabra (si no es genérica) para el caso
+    "Adriels" / "Adriels Moda": un nombre que es prefijo por palabras de otro.
+    El prefijo sólo cuenta si tiene alguna palabra no genérica ("La Farmacia"
+    no junta "La Farmacia de Álvaro" con "La farmacia en tu casa").
+Los candidatos se verifican con la similitud exacta (Jaccard de trigramas).
+
+En la etapa websites de seraportiendas, --fuzzy-dedup salta las empresas
+casi iguales a una ya procesada (además del DISTINCT exacto por normalize_empresa).
+
+  cd /app && python -m common.names /data/datainnovation_com/seraportiendasonline_com/empresas.csv --column empresa
+"""
+
+import argparse
+import csv
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+# formas jurídicas al final del nombre (ya sin puntos: "s.l." -> "sl")
+LEGAL_SUFFIXES = {
+    "sl", "slu", "sll", "slne", "sa", "sau", "sal", "sc", "scp", "scl", "cb", "coop",
+    "sociedad limitada", "sociedad anonima", "sociedad cooperativa", "limitada",
+}
+_LEGAL_MULTI = sorted((s.split() for s in LEGAL_SUFFIXES), key=len, reverse=True)
+
+# palabras que no identifican a nadie: no se usan como bloque ni bastan como prefijo
+GENERIC_TOKENS = {
+    "la", "el", "los", "las", "de", "del", "y", "en", "tu", "su", "mi", "con", "the",
+    "tienda", "tiendas", "moda", "shop", "store", "online", "grupo", "hogar",
+    "centro", "taller", "comercial", "distribuciones", "servicios", "empresa",
+    "farmacia", "clinica", "restaurante", "bar", "cafeteria", "peluqueria", "estetica",
+    "inmobiliaria", "academia", "asesoria", "gestoria", "autoescuela", "floristeria",
+    "panaderia", "ferreteria", "optica", "hotel", "libreria", "joyeria", "zapateria",
+}
+
+_DOTTED_RE = re.compile(r"\b(\w)\.(?=\w\b|\w\.)")
+_NON_ALNUM_RE = re.compile(r"[^0-9a-zñ]+")
+
+NGRAM = 3
+MIN_PREFIX_CHARS = 4
+PREFIX_SCORE = 0.9
+MIN_BAND_HITS = 2
+MAX_BLOCK = 200  # cubos/bloques más grandes no discriminan: se dejan de llenar
+_PRIME = np.uint64(4294967311)  # primo > 2**32
+
+
+def normalize_empresa(name: str) -> str:
+    s = (name or "").strip().lower()
+    if not s:
+        return ""
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = s.replace("™", "").replace("®", "")
+    s = re.sub(r"\s+", " ", s)
+    s = s.strip(' "\'')
+    return s
+
+
+def company_key(name: str) -> str:
+    s = normalize_empresa(name)
+    # "s.l.u." -> "slu", "s. a." -> "sa"
+    s = _DOTTED_RE.sub(r"\1", s.replace(". ", "."))
+    tokens = _NON_ALNUM_RE.sub(" ", s).split()
+    stripped = True
+    while stripped and len(tokens) > 1:
+        stripped = False
+        for suffix in _LEGAL_MULTI:
+            n = len(suffix)
+            if len(tokens) > n and tokens[-n:] == suffix:
+                tokens = tokens[:-n]
+                stripped = True
+                break
+    return " ".join(tokens)
+
+
+def _shingles(key: str) -> set[str]:
+    padded = f" {key} "
+    if len(padded) <= NGRAM:
+        return {padded}
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+def _is_token_prefix(short: list[str], long: list[str]) -> bool:
+    return (
+        0 < len(short) < len(long)
+        and long[: len(short)] == short
+        and len(" ".join(short)) >= MIN_PREFIX_CHARS
+        # el prefijo común tiene que decir algo más que "la farmacia"
+        and any(t not in GENERIC_TOKENS for t in short)
+    )
+
+
+class NameIndex:
+    """
+      idx = NameIndex(threshold=0.8)
+      idx.add("e1", "Adriels")
+      idx.query("Adriels Moda S.L.")   # -> [("e1", 0.9)]
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**32, size=num_perm, dtype=np.uint64)
+
+        self._names = {}    # id -> _prepare(nombre)
+        self._buckets = {}  # (banda, firma) -> [ids]
+        self._blocks = {}   # primera palabra -> [ids]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _signature(self, shingles: set[str]) -> np.ndarray:
+        x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        h = ((self._a[:, None] * x[None, :]) % _PRIME + self._b[:, None]) % _PRIME
+        return h.min(axis=1)
+
+    def _bands(self, sig: np.ndarray) -> list[tuple[int, bytes]]:
+        return list(enumerate(r.tobytes() for r in sig.reshape(self.bands, self.rows)))
+
+    @staticmethod
+    def _block(tokens: list[str]) -> str:
+        if not tokens or tokens[0] in GENERIC_TOKENS or len(tokens[0]) < MIN_PREFIX_CHARS:
+            return ""
+        return tokens[0]
+
+    def _prepare(self, name: str):
+        """
+        (company_key, trigramas, palabras, bandas LSH) o None si el nombre queda vacío.
+        """
+        key = company_key(name)
+        if not key:
+            return None
+        shingles = _shingles(key)
+        return key, shingles, key.split(), self._bands(self._signature(shingles))
+
+    def add(self, item_id, name: str):
+        prepared = self._prepare(name)
+        if prepared is not None:
+            self._add(item_id, prepared)
+
+    def _add(self, item_id, prepared):
+        self._names[item_id] = prepared
+        _, _, tokens, bands = prepared
+        for band in bands:
+            ids = self._buckets.setdefault(band, [])
+            if len(ids) < MAX_BLOCK:
+                ids.append(item_id)
+        block = self._block(tokens)
+        if block:
+            ids = self._blocks.setdefault(block, [])
+            if len(ids) < MAX_BLOCK:
+                ids.append(item_id)
+
+    def score(self, a, b) -> float:
+        ka, sa, ta, _ = a
+        kb, sb, tb, _ = b
+        if ka == kb:
+            return 1.0
+        s = _jaccard(sa, sb)
+        if _is_token_prefix(ta, tb) or _is_token_prefix(tb, ta):
+            s = max(s, PREFIX_SCORE)
+        return s
+
+    def query(self, name: str) -> list[tuple[object, float]]:
+        """
+        (id, similitud) de los nombres indexados con similitud >= threshold, de mayor a menor.
+        """
+        prepared = self._prepare(name)
+        if prepared is None:
+            return []
+        return self._query(prepared)
+
+    def _query(self, prepared) -> list[tuple[object, float]]:
+        _, _, tokens, bands = prepared
+        hits = Counter()
+        for band in bands:
+            hits.update(self._buckets.get(band, ()))
+        # coincidir en una sola banda es ruido; con Jaccard 0.8 se coincide en >= 2 el 99.7%
+        candidates = {c for c, n in hits.items() if n >= MIN_BAND_HITS}
+        block = self._block(tokens)
+        if block:
+            candidates.update(self._blocks.get(block, ()))
+
+        out = []
+        for c in candidates:
+            s = self.score(prepared, self._names[c])
+            if s >= self.threshold:
+                out.append((c, s))
+        out.sort(key=lambda t: -t[1])
+        return out
+
+
+def near_duplicate_groups(names: list[str], threshold: float = 0.8) -> list[list[int]]:
+    """
+    Grupos (índices en names) de nombres casi iguales, de más de un elemento.
+    """
+    idx = NameIndex(threshold=threshold)
+    parent = list(range(len(names)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, name in enumerate(names):
+        prepared = idx._prepare(name)
+        if prepared is None:
+            continue
+        for j, _ in idx._query(prepared):
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+        idx._add(i, prepared)
+
+    groups = {}
+    for i in range(len(names)):
+        groups.setdefault(find(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Casi-duplicados de nombres de empresa en un CSV")
+    parser.add_argument("csv")
+    parser.add_argument("--column", default="empresa")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    with Path(args.csv).open(newline="", encoding="utf-8") as f:
+        names = list(dict.fromkeys(
+            n for n in ((row.get(args.column) or "").strip() for row in csv.DictReader(f)) if n
+        ))
+
+    groups = near_duplicate_groups(names, threshold=args.threshold)
+    print(f"📊 {len(names)} nombres distintos, {len(groups)} grupos de casi-duplicados")
+    for g in sorted(groups, key=len, reverse=True):
+        print("  - " + " | ".join(names[i] for i in g))
+
+
+if __name__ == "__main__":
+    main()
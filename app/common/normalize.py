@@ -0,0 +1,108 @@
+"""
+Normalización de claves de lead compartida entre fuentes (common.leads).
+
+Mismas reglas que los helpers de cada etapa (_domain_from_url, _normalize_phone...).
+"""
+
+import re
+
+# Dominios que comparten muchas empresas: no sirven como clave de lead
+SHARED_DOMAINS = {
+    "facebook.com",
+    "instagram.com",
+    "twitter.com",
+    "x.com",
+    "linkedin.com",
+    "youtube.com",
+    "tiktok.com",
+    "google.com",
+    "goo.gl",
+    "linktr.ee",
+    "wa.me",
+    "blogspot.com",
+    "wordpress.com",
+    "wixsite.com",
+    "myshopify.com",
+}
+
+# sufijos de segundo nivel: en empresa.com.es el dominio registrable tiene 3 etiquetas
+SECOND_LEVEL_SUFFIXES = {
+    "com.es", "org.es", "nom.es", "gob.es", "edu.es",
+    "co.uk", "org.uk", "com.pt", "com.ar", "com.mx", "com.br", "com.co",
+}
+
+_HOST_END_RE = re.compile(r"[/?#]")
+
+
+def normalize_domain(url: str) -> str:
+    """
+    https://www.Ejemplo.es/contacto -> ejemplo.es ("" si no hay host)
+    """
+    # a mano en vez de urlparse: se llama una vez por fila de cada fuente
+    s = (url or "").strip().lower()
+    i = s.find("://")
+    if i >= 0:
+        s = s[i + 3:]
+    host = _HOST_END_RE.split(s, 1)[0].rsplit("@", 1)[-1].split(":", 1)[0].rstrip(".")
+    return host[4:] if host.startswith("www.") else host
+
+
+def normalize_phone(raw: str) -> str:
+    raw = (raw or "").strip()
+    # quita separadores comunes, conserva +
+    raw = re.sub(r"[^\d\+]", "", raw)
+    if raw.startswith("0034"):
+        raw = "+34" + raw[4:]
+    if raw.startswith("34") and not raw.startswith("+34") and len(raw) >= 11:
+        raw = "+34" + raw[2:]
+    return raw
+
+
+def normalize_email(raw: str) -> str:
+    e = (raw or "").strip().lower()
+    if e.startswith("mailto:"):
+        e = e[7:]
+    e = e.split("?")[0]
+    if e.count("@") != 1 or "/" in e:
+        return ""
+    local, domain = e.split("@")
+    if not local or "." not in domain:
+        return ""
+    return e
+
+
+def domain_key(url: str) -> str:
+    d = normalize_domain(url)
+    if not d or "." not in d:
+        return ""
+    labels = d.split(".")
+    for i in range(len(labels) - 1):
+        if ".".join(labels[i:]) in SHARED_DOMAINS:
+            return ""
+    return d
+
+
+def registrable_domain(url: str) -> str:
+    """
+    https://tienda.ejemplo.com.es/x -> ejemplo.com.es ("" si es un dominio compartido o una IP)
+    """
+    d = domain_key(url)
+    labels = d.split(".")
+    if not d or all(label.isdigit() for label in labels):
+        return ""
+    n = 3 if ".".join(labels[-2:]) in SECOND_LEVEL_SUFFIXES else 2
+    return ".".join(labels[-n:])
+
+
+def phone_key(raw: str) -> str:
+    """
+    Clave de teléfono: los 9 dígitos nacionales si es español (con o sin +34);
+    si no, el número normalizado. "" si es demasiado corto.
+    """
+    p = normalize_phone(raw)
+    if p.startswith("+34"):
+        p = p[3:]
+    digits = p.lstrip("+")
+    if len(digits) < 9:
+        return ""
+    return p
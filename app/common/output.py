@@ -0,0 +1,147 @@
+"""
+Salida de una etapa: el CSV de siempre + salidas derivadas opcionales.
+
+  out = StageOutput(out_path, fieldnames=[...], kwargs=kwargs)
+  out.writerow({...})     # escribe, hace flush y alimenta las salidas derivadas
+  out.close()
+
+Salidas derivadas:
+  - siempre: resumen incremental <salida>.summary.json (common.summary)
+  - siempre en etapas con PARALLEL y ANALYTICS: frescura por registro (common.freshness)
+    y, si existe el índice de búsqueda, su documento en él (common.search)
+  - columnar: dataset Parquet junto al CSV (common.columnar)
+
+Con --workers cada worker lleva el resumen de su CSV parcial y registra la
+frescura de lo que crawlea; el resto de derivadas se generan al fusionar en
+el CSV normal.
+"""
+
+import csv
+import os
+import shutil
+from pathlib import Path
+
+from common.freshness import FreshnessSink, stage_spec
+from common.metrics import timer
+from common.summary import SummarySink, summary_path
+
+
+def _is_stage_output(path: Path, output: str) -> bool:
+    """
+    website.csv o su parte de worker website.partN.csv
+    """
+    out = Path(output)
+    return path.name == out.name or (path.suffix == out.suffix and path.stem.startswith(out.stem + ".part"))
+
+
+def _open_sinks(path: Path, fieldnames: list[str], kwargs: dict, mode: str) -> list:
+    sinks = [SummarySink(path, fieldnames, mode=mode)]
+
+    # frescura: sólo quien crawlea la fila (no la fusión de --workers)
+    spec = stage_spec(kwargs) if not kwargs.get("merged") else None
+    if spec and _is_stage_output(path, spec[0]["output"]):
+        sinks.append(FreshnessSink(path, spec))
+
+        from common.search import SearchSink, index_enabled
+
+        if index_enabled():
+            sinks.append(SearchSink(path, spec, kwargs))
+
+    if kwargs.get("workers"):
+        return sinks
+
+    if kwargs.get("columnar"):
+        from common.columnar import ColumnarSink
+
+        sinks.append(ColumnarSink(path, fieldnames, mode=mode))
+    return sinks
+
+
+def _existing_header(path: Path) -> list[str]:
+    with path.open(newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def _migrate_header(path: Path, fieldnames: list[str]):
+    """
+    Reescribe el CSV con una cabecera nueva (tmp + rename). Sus derivadas se
+    regeneran en la próxima apertura.
+    """
+    tmp = path.with_name(path.name + ".migrate")
+    with path.open(newline="", encoding="utf-8") as src, tmp.open("w", newline="", encoding="utf-8") as dst:
+        writer = csv.DictWriter(dst, fieldnames=fieldnames, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(csv.DictReader(src))
+    os.replace(tmp, path)
+    invalidate_derived(path)
+
+
+class StageOutput:
+    def __init__(self, path: Path, fieldnames: list[str], kwargs: dict | None = None, mode: str = "a"):
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        write_header = mode == "w" or not self.path.exists() or self.path.stat().st_size == 0
+
+        if not write_header:
+            # CSV de antes de añadir/quitar columnas: si faltan columnas se migra
+            # la cabecera (vacías en las filas que ya estaban); las que sobran se conservan
+            header = _existing_header(self.path)
+            if header and header != self.fieldnames:
+                added = [c for c in self.fieldnames if c not in header]
+                if added:
+                    kept = [c for c in header if c not in self.fieldnames]
+                    _migrate_header(self.path, self.fieldnames + kept)
+                    print(f"🔧 {self.path.name}: añadidas las columnas {', '.join(added)} (vacías en las filas existentes)")
+                    self.fieldnames += kept
+                else:
+                    self.fieldnames = header
+
+        self._f = self.path.open(mode, newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._f, fieldnames=self.fieldnames, extrasaction="ignore")
+        if write_header:
+            self._writer.writeheader()
+
+        self.sinks = _open_sinks(self.path, self.fieldnames, kwargs or {}, mode)
+
+    def writerow(self, row: dict):
+        with timer("write"):
+            self._writer.writerow(row)
+            self._f.flush()
+            for s in self.sinks:
+                s.write(row)
+                s.flush()
+
+    def writerows(self, rows):
+        with timer("write"):
+            for row in rows:
+                self._writer.writerow(row)
+                for s in self.sinks:
+                    s.write(row)
+            self._f.flush()
+            for s in self.sinks:
+                s.flush()
+
+    def close(self):
+        self._f.close()
+        for s in self.sinks:
+            s.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def invalidate_derived(path: Path):
+    """
+    Tras reescribir un CSV por fuera de StageOutput (compactación...): las
+    derivadas incrementales ya no cuadran y se regeneran en la próxima apertura.
+    """
+    from common.columnar import dataset_path
+
+    summary_path(path).unlink(missing_ok=True)
+    ds = dataset_path(path)
+    if ds.exists():
+        shutil.rmtree(ds)
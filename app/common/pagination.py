@@ -0,0 +1,78 @@
+"""
+Paginación incremental de listados: run.py ... empresas --incremental [K]
+
+Los listados (provincias de amisando, subcategorías de seraportiendas) salen
+de más nuevo a más antiguo. En un recrawl, en cuanto K páginas seguidas no
+traen ninguna URL que no tengamos ya, el resto también será conocido: se corta
+ahí la sección en vez de recorrer hasta max_pages.
+
+Las bajas sólo se ven recorriendo el listado entero, así que cada
+FULL_WALK_DAYS se hace igualmente una pasada completa (y sin --incremental
+siempre es completa). La fecha de la última queda en:
+
+  <out_dir>/.pagination/<salida>.json
+"""
+
+import json
+import time
+from pathlib import Path
+
+DEFAULT_PATIENCE = 2
+FULL_WALK_DAYS = 7
+
+
+def _marker_path(out_path: Path) -> Path:
+    return out_path.parent / ".pagination" / f"{out_path.stem}.json"
+
+
+def last_full_walk(out_path: Path) -> float | None:
+    try:
+        return json.loads(_marker_path(out_path).read_text(encoding="utf-8"))["full_walk_at"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def mark_full_walk(out_path: Path):
+    path = _marker_path(out_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"full_walk_at": time.time()}), encoding="utf-8")
+    tmp.replace(path)
+
+
+def incremental_patience(out_path: Path, kwargs: dict) -> int | None:
+    """
+    K de esta ejecución, o None si toca pasada completa.
+    """
+    patience = kwargs.get("incremental_pages")
+    if not patience:
+        return None
+    last = last_full_walk(out_path)
+    if last is None or time.time() - last > FULL_WALK_DAYS * 86400:
+        print(f"🔁 Incremental: la última pasada completa tiene más de {FULL_WALK_DAYS} días, se recorre todo")
+        return None
+    print(f"🔁 Incremental: se corta cada sección tras {patience} páginas sin novedades")
+    return patience
+
+
+class EarlyStop:
+    """
+      stop = EarlyStop(known, patience)      # patience=None: nunca corta
+      nuevas = stop.page(urls_de_la_pagina)  # las que no estaban en known
+      if stop.done: break
+    """
+
+    def __init__(self, known: set[str], patience: int | None):
+        self.known = known
+        self.patience = patience
+        self.quiet_pages = 0
+
+    def page(self, urls: list[str]) -> list[str]:
+        new = [u for u in urls if u not in self.known]
+        self.known.update(new)
+        self.quiet_pages = 0 if new else self.quiet_pages + 1
+        return new
+
+    @property
+    def done(self) -> bool:
+        return self.patience is not None and self.quiet_pages >= self.patience
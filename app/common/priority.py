@@ -0,0 +1,272 @@
+"""
+Orden de trabajo por valor esperado para las etapas websites (--prioritize).
+
+Sin --prioritize el input se recorre en el orden del fichero: si la ventana de
+ejecución se corta, las mejores empresas pueden quedarse sin tocar. Con él,
+las filas pendientes salen de una cola de prioridad, de más a menos valor:
+
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --prioritize
+  python3 /app/run.py muelles_com amisando websites --prioritize "count=0,yield=3,tld=1"
+
+  cd /app && python -m common.priority datainnovation_com seraportiendasonline_com websites --top 20
+
+Señales (0..1) de cada fila, con lo que se sabe antes de pedirla:
+  - count:  tamaño de su grupo (empresas_count de la subcategoría si la etapa
+            declara de dónde leerlo; si no, filas del input en el grupo)
+  - tld:    valor del TLD de su web, si se conoce (TLD_VALUE)
+  - yield:  proporción histórica de leads útiles (email o teléfono) en la
+            salida entre las webs de su mismo TLD y las fichas de su mismo
+            grupo, suavizada hacia la media global
+Una señal sin dato vale UNKNOWN. valor = Σ peso × señal, con los pesos de
+DEFAULT_WEIGHTS o los de --prioritize ("señal=peso,..."; negativo = penaliza).
+
+La cola es un heap sobre offsets del input (common.cursor): construirlo es
+lineal y cada fila que sale cuesta log n, así que si el presupuesto corta la
+ejecución pronto no se paga ordenar lo que nunca se va a procesar.
+Las filas ya procesadas no entran; el cursor de orden de fichero no se mueve
+(al volver a ejecutar sin --prioritize, el set de procesados salta lo hecho).
+
+Clave y columnas de la salida: PARALLEL y ANALYTICS de la etapa (como --recrawl);
+grupo y tamaño del grupo: PRIORITY de la etapa.
+"""
+
+import argparse
+import csv
+import heapq
+import importlib
+import math
+from pathlib import Path
+
+from common.cursor import InputCursor
+from common.normalize import domain_key
+
+DEFAULT_WEIGHTS = {"count": 1.0, "tld": 0.5, "yield": 2.0}
+
+TLD_VALUE = {
+    "es": 1.0, "cat": 1.0, "eus": 1.0, "gal": 1.0,
+    "com": 0.7, "eu": 0.6, "net": 0.5, "org": 0.5,
+    "info": 0.2, "biz": 0.2,
+}
+OTHER_TLD = 0.3
+UNKNOWN = 0.5
+# pseudo-observaciones con la media global al suavizar el rendimiento de un grupo/TLD
+PRIOR_ROWS = 20
+
+
+def parse_weights(raw: str | None) -> dict[str, float]:
+    """
+    "count=2,yield=3" -> DEFAULT_WEIGHTS con esos pesos cambiados.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in (raw or "").split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in weights:
+            raise ValueError(f"Señal de prioridad desconocida: {name} (válidas: {', '.join(weights)})")
+        try:
+            weights[name] = float(value)
+        except ValueError:
+            raise ValueError(f"Peso no numérico para {name}: {value!r}") from None
+    return weights
+
+
+def stage_module(kwargs: dict):
+    return importlib.import_module(f"customers.{kwargs['customer']}.{kwargs['base']}.{kwargs['entity']}")
+
+
+def _tld(website: str) -> str:
+    d = domain_key(website)
+    return d.rsplit(".", 1)[-1] if d else ""
+
+
+def _rate(useful: int, total: int, prior: float) -> float:
+    return (useful + PRIOR_ROWS * prior) / (total + PRIOR_ROWS)
+
+
+def _load_counts(input_csv: Path, spec: tuple | None) -> dict[str, float]:
+    """
+    grupo -> tamaño declarado (p.ej. empresas_count de subcategorias.csv).
+    """
+    if not spec:
+        return {}
+    name, group_col, count_col = spec
+    path = input_csv.with_name(name)
+    counts = {}
+    if not path.exists():
+        return counts
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                counts[(row.get(group_col) or "").strip()] = float(row.get(count_col) or "")
+            except ValueError:
+                continue
+    return counts
+
+
+class PriorityInput:
+    """
+    Mismo uso que InputCursor (with + for), pero en orden de valor esperado.
+    """
+
+    def __init__(self, input_csv: Path, out_path: Path, kwargs: dict, done=()):
+        module = stage_module(kwargs)
+        parallel = module.PARALLEL
+        analytics = getattr(module, "ANALYTICS", None) or {}
+        spec = getattr(module, "PRIORITY", None) or {}
+
+        self.weights = parse_weights(kwargs.get("prioritize"))
+        self.key = parallel["key"]
+        self.group_col = spec.get("group") or ""
+        self.website_col = analytics.get("website", "website")
+        self.email_col = analytics.get("email", "email")
+        self.phone_col = analytics.get("telefono", "telefono")
+
+        self._input = InputCursor(input_csv, out_path, kwargs, resume=False)
+        self.fieldnames = self._input.fieldnames
+
+        # 1) salida anterior: qué claves dieron lead útil
+        previous = self._load_output(Path(out_path))
+        useful_total = sum(u for u, _ in previous.values())
+        self.prior = useful_total / len(previous) if previous else UNKNOWN
+
+        # 2) input: rendimiento por grupo y candidatas (lo no procesado)
+        by_group: dict[str, list[int]] = {}
+        by_tld: dict[str, list[int]] = {}
+        sizes: dict[str, int] = {}
+        candidates = []
+        done = set(done)
+        self.rows = 0
+        for offset, row in self._input.entries():
+            self.rows += 1
+            k = self.key(row)
+            if not k:
+                continue
+            group = (row.get(self.group_col) or "").strip() if self.group_col else ""
+            sizes[group] = sizes.get(group, 0) + 1
+            prev = previous.get(k)
+            if prev:
+                useful, tld = prev
+                g = by_group.setdefault(group, [0, 0])
+                g[0] += useful
+                g[1] += 1
+                if tld:
+                    t = by_tld.setdefault(tld, [0, 0])
+                    t[0] += useful
+                    t[1] += 1
+            if k in done:
+                continue
+            tld = _tld(row.get(self.website_col) or "") or (prev[1] if prev else "")
+            candidates.append((offset, group, tld))
+
+        counts = _load_counts(Path(input_csv), spec.get("count")) or sizes
+        top = math.log1p(max(counts.values(), default=0))
+        self.group_yield = {g: _rate(u, n, self.prior) for g, (u, n) in by_group.items()}
+        self.tld_yield = {t: _rate(u, n, self.prior) for t, (u, n) in by_tld.items()}
+
+        # 3) heap de (-valor, offset): a igual valor, en el orden del input
+        self._heap = []
+        for offset, group, tld in candidates:
+            signals = self.signals(group, tld, counts, top)
+            score = sum(self.weights[s] * v for s, v in signals.items())
+            self._heap.append((-score, offset))
+        heapq.heapify(self._heap)
+        self.row = self.rows - len(self._heap)
+        self.served = 0
+
+        w = ", ".join(f"{s}={v:g}" for s, v in self.weights.items())
+        print(f"🎯 Prioridad ({w}): {len(self._heap)} filas pendientes en cola")
+
+    def _load_output(self, out_path: Path) -> dict[str, tuple[int, str]]:
+        """
+        clave -> (útil, TLD de la web) de cada fila ya escrita.
+        """
+        previous = {}
+        if not out_path.exists():
+            return previous
+        with out_path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                k = self.key(row)
+                if not k:
+                    continue
+                phone = bool((row.get(self.phone_col) or "").strip())
+                useful = int(phone or bool((row.get(self.email_col) or "").strip()))
+                previous[k] = (useful, _tld(row.get(self.website_col) or ""))
+        return previous
+
+    def signals(self, group: str, tld: str, counts: dict, top: float) -> dict[str, float]:
+        count = counts.get(group)
+        yields = [y for y in (self.group_yield.get(group), self.tld_yield.get(tld)) if y is not None]
+        return {
+            "count": math.log1p(count) / top if count is not None and top else UNKNOWN,
+            "tld": TLD_VALUE.get(tld, OTHER_TLD) if tld else UNKNOWN,
+            "yield": sum(yields) / len(yields) if yields else self.prior,
+        }
+
+    def __iter__(self):
+        while self._heap:
+            _, offset = heapq.heappop(self._heap)
+            self.served += 1
+            yield self._input.row_at(offset)
+
+    def ranked(self, n: int):
+        """
+        Las n primeras (valor, fila) sin sacarlas de la cola.
+        """
+        for neg, offset in heapq.nsmallest(n, self._heap):
+            yield -neg, self._input.row_at(offset)
+
+    def close(self):
+        if self.served:
+            print(f"🎯 Prioridad: {self.served} filas servidas, {len(self._heap)} quedan en cola")
+        self._heap = []
+        self._input.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def open_input(input_csv: Path, out_path: Path, kwargs: dict, done=()):
+    """
+    Input de una etapa websites: por valor con --prioritize, si no en orden
+    de fichero retomando por offset (common.cursor).
+    done: claves (PARALLEL["key"]) ya procesadas, que no entran en la cola
+    """
+    if kwargs.get("prioritize") is not None:
+        return PriorityInput(input_csv, out_path, kwargs, done)
+    return InputCursor(input_csv, out_path, kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ranking de las filas pendientes de una etapa websites")
+    parser.add_argument("customer")
+    parser.add_argument("base")
+    parser.add_argument("entity")
+    parser.add_argument("--weights", default="", help='Pesos, p.ej. "count=2,yield=3"')
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    kwargs = {"customer": args.customer, "base": args.base, "entity": args.entity, "prioritize": args.weights}
+    module = stage_module(kwargs)
+    out_dir = Path("/data") / args.customer / args.base
+    out_path = out_dir / module.PARALLEL["output"]
+
+    done = set()
+    if out_path.exists():
+        with out_path.open(newline="", encoding="utf-8") as f:
+            done = {k for row in csv.DictReader(f) if (k := module.PARALLEL["key"](row))}
+
+    with PriorityInput(out_dir / module.PARALLEL["input"], out_path, kwargs, done) as queue:
+        print(f"  rendimiento histórico global: {queue.prior:.0%}")
+        for score, row in queue.ranked(args.top):
+            group = row.get(queue.group_col) or "" if queue.group_col else ""
+            print(f"  {score:6.3f}  {module.PARALLEL['key'](row)}  {group}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Modo --profile de run.py.
+
+Envuelve module.run() con:
+  - cProfile (top funciones por tiempo propio y acumulado)
+  - un sampler de pilas del hilo principal -> .collapsed (entrada de flamegraph.pl / speedscope)
+  - tracemalloc (pico de memoria y líneas que más reservan)
+  - el desglose de fases fetch / parse / extract / write de common.metrics
+
+Informe en <out_dir>/profile/<entity>[-wN]-<timestamp>.{txt,collapsed}
+"""
+
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from common import metrics
+
+SAMPLE_INTERVAL = 0.005
+TOP_N = 25
+
+
+class _StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._halt = threading.Event()
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+def _phase_breakdown() -> list[str]:
+    values = metrics.PHASE_SECONDS.values
+    total = sum(v[-2] for v in values.values()) or 1.0
+    lines = [f"{'fase':<10} {'llamadas':>9} {'total s':>10} {'media ms':>10} {'%':>6}"]
+    for (phase,), v in sorted(values.items(), key=lambda kv: -kv[1][-2]):
+        s, n = v[-2], v[-1]
+        lines.append(f"{phase:<10} {n:>9} {s:>10.3f} {1000 * s / max(n, 1):>10.2f} {100 * s / total:>5.1f}%")
+    return lines
+
+
+def _top_functions(prof: cProfile.Profile, sort: str) -> str:
+    buf = io.StringIO()
+    pstats.Stats(prof, stream=buf).strip_dirs().sort_stats(sort).print_stats(TOP_N)
+    return buf.getvalue()
+
+
+def profile_run(fn, label: str, **kwargs):
+    """
+    Ejecuta fn(**kwargs) perfilado y escribe el informe junto al output
+    (kwargs["out_dir"]). Devuelve lo que devuelva fn.
+    """
+    report_dir = Path(kwargs["out_dir"]) / "profile"
+    report_dir.mkdir(parents=True, exist_ok=True)
+    stem = report_dir / f"{label}-{time.strftime('%Y%m%d-%H%M%S')}"
+
+    tracemalloc.start()
+    sampler = _StackSampler(threading.get_ident())
+    prof = cProfile.Profile()
+
+    start = time.perf_counter()
+    sampler.start()
+    prof.enable()
+    try:
+        return fn(**kwargs)
+    finally:
+        prof.disable()
+        sampler.stop()
+        wall = time.perf_counter() - start
+
+        current, peak = tracemalloc.get_traced_memory()
+        top_allocs = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        tracemalloc.stop()
+
+        with stem.with_suffix(".collapsed").open("w", encoding="utf-8") as f:
+            for stack, n in sampler.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+
+        lines = [
+            f"# Perfil {label}",
+            f"Tiempo total: {wall:.2f}s  |  muestras: {sum(sampler.stacks.values())} cada {SAMPLE_INTERVAL * 1000:.0f}ms",
+            f"Memoria: pico {peak / 1e6:.1f} MB, al final {current / 1e6:.1f} MB",
+            "",
+            "## Fases",
+            *_phase_breakdown(),
+            "",
+            "## Top reservas de memoria (línea)",
+            *[f"{s.size / 1024:>10.1f} KiB  {s.count:>8} bloques  {s.traceback}" for s in top_allocs],
+            "",
+            "## Top funciones (tiempo propio)",
+            _top_functions(prof, "tottime"),
+            "## Top funciones (acumulado)",
+            _top_functions(prof, "cumulative"),
+        ]
+        stem.with_suffix(".txt").write_text("\n".join(lines), encoding="utf-8")
+
+        print("\n⏱️ PERFIL")
+        print(f"- Tiempo total: {wall:.2f}s, pico de memoria: {peak / 1e6:.1f} MB")
+        for line in _phase_breakdown():
+            print(f"  {line}")
+        print(f"- Informe: {stem.with_suffix('.txt')}")
+        print(f"- Flamegraph (collapsed): {stem.with_suffix('.collapsed')}")
@@ -0,0 +1,190 @@
+"""
+Grabación y reproducción de tráfico HTTP para benchmarks end-to-end sin red.
+
+Grabar una ejecución real (cada proceso escribe su propio <dir>/<pid>.jsonl.gz):
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --record /data/replay/sera
+
+Servir el archivo en local, con latencia y errores inyectados:
+  cd /app && python -m common.replay /data/replay/sera --port 8765 --latency 0.05 --jitter 0.02 --error-rate 0.01
+
+Apuntar cualquier etapa al servidor:
+  python3 /app/run.py datainnovation_com seraportiendasonline_com websites --replay http://127.0.0.1:8765
+"""
+
+import argparse
+import atexit
+import base64
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# cabeceras que no tienen sentido al reservir el body ya descomprimido
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length", "connection"}
+
+REPLAY_URL_HEADER = "X-Replay-Url"
+REPLAY_METHOD_HEADER = "X-Replay-Method"
+REPLAY_FINAL_URL_HEADER = "X-Replay-Final-Url"
+REPLAY_ERROR_HEADER = "X-Replay-Error"
+REPLAY_MISS_HEADER = "X-Replay-Miss"
+
+
+# =========================
+# GRABACIÓN
+# =========================
+class Recorder:
+    def __init__(self, archive_dir: str):
+        path = Path(archive_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        self._f = gzip.open(path / f"{os.getpid()}.jsonl.gz", "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _write(self, entry: dict):
+        with self._lock:
+            self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._f.flush()
+
+    def record(self, method: str, url: str, r):
+        self._write({
+            "method": method.upper(),
+            "url": url,
+            "final_url": r.url,
+            "status": r.status_code,
+            "headers": {k: v for k, v in r.headers.items() if k.lower() not in _DROP_HEADERS},
+            "body": base64.b64encode(r.content or b"").decode("ascii"),
+            "elapsed": r.elapsed.total_seconds(),
+            "ts": time.time(),
+        })
+
+    def record_error(self, method: str, url: str, exc: Exception):
+        self._write({
+            "method": method.upper(),
+            "url": url,
+            "error": type(exc).__name__,
+            "ts": time.time(),
+        })
+
+    def close(self):
+        with self._lock:
+            if not self._f.closed:
+                self._f.close()
+
+
+_recorders: dict[str, Recorder] = {}
+
+
+def get_recorder(archive_dir: str) -> Recorder:
+    rec = _recorders.get(archive_dir)
+    if rec is None:
+        rec = _recorders[archive_dir] = Recorder(archive_dir)
+    return rec
+
+
+def load_archive(archive_dir: str) -> dict[tuple[str, str], dict]:
+    """
+    (method, url) -> última respuesta grabada. url lleva la query completa
+    (la de params= incluida), así que las páginas de un listado no se pisan.
+    """
+    index = {}
+    for p in sorted(Path(archive_dir).glob("*.jsonl.gz")):
+        with gzip.open(p, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    # cola truncada si el proceso murió a mitad de escritura
+                    continue
+                key = (e["method"], e["url"])
+                prev = index.get(key)
+                if prev is None or e.get("ts", 0) >= prev.get("ts", 0):
+                    index[key] = e
+    return index
+
+
+# =========================
+# SERVIDOR DE REPLAY
+# =========================
+def make_server(archive_dir: str, port: int, latency: float = 0.0, jitter: float = 0.0,
+                error_rate: float = 0.0, reset_rate: float = 0.0) -> ThreadingHTTPServer:
+    index = load_archive(archive_dir)
+    print(f"📼 {len(index)} respuestas cargadas de {archive_dir}")
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _serve(self):
+            url = self.headers.get(REPLAY_URL_HEADER, "")
+            method = self.headers.get(REPLAY_METHOD_HEADER, self.command).upper()
+
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+
+            delay = latency + random.uniform(-jitter, jitter) if (latency or jitter) else 0.0
+            if delay > 0:
+                time.sleep(delay)
+
+            if reset_rate and random.random() < reset_rate:
+                self.close_connection = True
+                self.connection.close()
+                return
+
+            if error_rate and random.random() < error_rate:
+                self._reply(503, {"Content-Type": "text/plain"}, b"replay: injected error")
+                return
+
+            entry = index.get((method, url))
+            if entry is None:
+                self._reply(404, {"Content-Type": "text/plain", REPLAY_MISS_HEADER: "1"}, b"replay: not recorded")
+                return
+
+            if "error" in entry:
+                self._reply(599, {REPLAY_ERROR_HEADER: entry["error"]}, b"")
+                return
+
+            headers = dict(entry["headers"])
+            headers[REPLAY_FINAL_URL_HEADER] = entry.get("final_url") or url
+            self._reply(entry["status"], headers, base64.b64decode(entry["body"]))
+
+        def _reply(self, status: int, headers: dict, body: bytes):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(body)
+
+        do_GET = do_POST = do_HEAD = do_PUT = do_DELETE = _serve
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de replay HTTP")
+    parser.add_argument("archive", help="Directorio grabado con --record")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Segundos de latencia por respuesta")
+    parser.add_argument("--jitter", type=float, default=0.0, help="± segundos aleatorios sobre la latencia")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidad de responder 503")
+    parser.add_argument("--reset-rate", type=float, default=0.0, help="Probabilidad de cortar la conexión")
+    args = parser.parse_args()
+
+    server = make_server(args.archive, args.port, args.latency, args.jitter, args.error_rate, args.reset_rate)
+    print(f"▶ Replay en http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
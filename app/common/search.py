@@ -0,0 +1,303 @@
+"""
+Búsqueda de texto libre sobre los leads, con filtros por faceta.
+
+  cd /app && python -m common.search build                       # (re)indexa todas las salidas
+  cd /app && python -m common.search query "control plagas sevilla" --platform wordpress --has-email
+  cd /app && python -m common.search query moda --categoria moda --facets platform,provincia
+
+Índice invertido en disco (SQLite FTS5) en /data/_search/leads.sqlite:
+  - texto: empresa, direccion, ciudad, provincia_url, provincia, categoria y
+    subcategoria, plegados con las reglas de normalize_empresa (minúsculas,
+    sin tildes) para que "Cádiz" y "cadiz" sean lo mismo
+  - facetas: source, ciudad, provincia, categoria, subcategoria, platform,
+    is_alive, has_email (columnas con índice, también plegadas)
+
+Una vez creado con build, se mantiene solo: las etapas con PARALLEL y ANALYTICS
+lo actualizan fila a fila desde StageOutput (SearchSink). Cada lead es
+(fuente, PARALLEL["key"]): un recrawl sustituye el documento anterior.
+"""
+
+import argparse
+import csv
+import importlib
+import json
+import re
+import sqlite3
+from pathlib import Path
+
+from common.names import normalize_empresa
+
+INDEX = Path("/data/_search/leads.sqlite")
+
+TEXT_FIELDS = ["empresa", "direccion", "ciudad", "provincia_url", "provincia", "categoria", "subcategoria"]
+FACETS = ["source", "ciudad", "provincia", "categoria", "subcategoria", "platform", "is_alive", "has_email"]
+SHOW_FIELDS = ["empresa", "direccion", "website", "email", "telefono", "platform", "is_alive"]
+
+_TOKEN_RE = re.compile(r"[0-9a-zñ]+")
+
+
+def fold(text: str) -> str:
+    """
+    "Control de Plagas Cádiz, S.L." -> "control de plagas cadiz s l"
+    """
+    return " ".join(_TOKEN_RE.findall(normalize_empresa(text)))
+
+
+def index_enabled(path: Path = INDEX) -> bool:
+    return path.exists()
+
+
+def connect(path: Path = INDEX) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS docs ("
+        " id INTEGER PRIMARY KEY,"
+        " source TEXT NOT NULL,"
+        " key TEXT NOT NULL,"
+        " data TEXT NOT NULL,"
+        + "".join(f" {f} TEXT," for f in FACETS[1:6])
+        + " is_alive INTEGER,"
+        " has_email INTEGER,"
+        " UNIQUE (source, key))"
+    )
+    for f in FACETS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS docs_{f} ON docs ({f})")
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS fts USING fts5(text, tokenize='unicode61')")
+    return conn
+
+
+def join_lookups(base_dir: Path, spec: dict) -> list[tuple[str, dict]]:
+    """
+    [(columna de la salida, valor -> columnas añadidas)] de los join de ANALYTICS.
+    """
+    joins = []
+    for file_name, left_on, right_on, columns in spec.get("join", []):
+        lookup = {}
+        path = Path(base_dir) / file_name
+        if path.exists():
+            with path.open(newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    lookup.setdefault((row.get(right_on) or "").strip(), {c: row.get(c) or "" for c in columns})
+        joins.append((left_on, lookup))
+    return joins
+
+
+# =========================
+# ESCRITURA
+# =========================
+class _Writer:
+    def __init__(self, conn: sqlite3.Connection, source: str, spec: tuple[dict, dict], joins):
+        parallel, analytics = spec
+        self.conn = conn
+        self.source = source
+        self.key_fn = parallel["key"]
+        self.analytics = analytics
+        self.joins = joins
+
+    def _doc(self, row: dict) -> dict:
+        a = self.analytics
+        doc = {
+            "empresa": row.get(a.get("empresa", "empresa")) or "",
+            "direccion": row.get(a.get("direccion", "direccion")) or "",
+            "website": row.get(a.get("website", "website")) or "",
+            "email": row.get(a.get("email", "email")) or "",
+            "telefono": row.get(a.get("telefono", "telefono")) or "",
+            "platform": (row.get(a["platform"]) or "") if a.get("platform") else "",
+            "is_alive": row.get(a["alive"]) if a.get("alive") else None,
+        }
+        for left_on, lookup in self.joins:
+            doc.update(lookup.get((row.get(left_on) or "").strip(), {}))
+        for f in ("ciudad", "provincia_url", *a.get("groups", [])):
+            doc.setdefault(f, row.get(f) or "")
+        return doc
+
+    def upsert(self, row: dict):
+        key = self.key_fn(row)
+        if not key:
+            return
+        doc = self._doc(row)
+        alive = doc["is_alive"]
+        facets = [fold(doc.get(f, "")) for f in FACETS[1:6]]
+        cur = self.conn.execute("SELECT id FROM docs WHERE source = ? AND key = ?", (self.source, key))
+        old = cur.fetchone()
+        if old:
+            self.conn.execute("DELETE FROM fts WHERE rowid = ?", old)
+            self.conn.execute("DELETE FROM docs WHERE id = ?", old)
+        cur = self.conn.execute(
+            "INSERT INTO docs (source, key, data, ciudad, provincia, categoria, subcategoria, platform, is_alive, has_email)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.source, key, json.dumps(doc, ensure_ascii=False), *facets,
+                None if alive is None else int(str(alive).strip() in ("1", "True", "true")),
+                int(bool(doc["email"].strip())),
+            ),
+        )
+        text = " ".join(fold(doc.get(f, "")) for f in TEXT_FIELDS)
+        self.conn.execute("INSERT INTO fts (rowid, text) VALUES (?, ?)", (cur.lastrowid, text))
+
+
+class SearchSink:
+    """
+    Sink de StageOutput: cada fila escrita actualiza su documento en el índice.
+    """
+
+    def __init__(self, csv_path: Path, spec: tuple[dict, dict], kwargs: dict):
+        parallel, analytics = spec
+        source = f"{kwargs['customer']}/{kwargs['base']}/{parallel['output']}"
+        self.conn = connect()
+        self.writer = _Writer(self.conn, source, spec, join_lookups(csv_path.parent, analytics))
+
+    def write(self, row: dict):
+        self.writer.upsert(row)
+
+    def flush(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def _parallel_spec(customer: str, base: str, output: str) -> dict | None:
+    import customers
+
+    root = Path(list(customers.__path__)[0]) / customer / base
+    for stage in sorted(root.glob("*.py")):
+        module = importlib.import_module(f"customers.{customer}.{base}.{stage.stem}")
+        parallel = getattr(module, "PARALLEL", None)
+        if parallel and parallel["output"] == output:
+            return parallel
+    return None
+
+
+def build(sources: list[tuple[str, str, dict]], data_dir: Path, path: Path = INDEX) -> dict:
+    """
+    Reindexa desde cero cada salida (las demás fuentes del índice no se tocan).
+    """
+    conn = connect(path)
+    counts = {}
+    for customer, base, analytics in sources:
+        parallel = _parallel_spec(customer, base, analytics["output"])
+        csv_path = data_dir / customer / base / analytics["output"]
+        if not parallel or not csv_path.exists():
+            continue
+        source = f"{customer}/{base}/{analytics['output']}"
+        conn.execute("DELETE FROM fts WHERE rowid IN (SELECT id FROM docs WHERE source = ?)", (source,))
+        conn.execute("DELETE FROM docs WHERE source = ?", (source,))
+        writer = _Writer(conn, source, (parallel, analytics), join_lookups(csv_path.parent, analytics))
+        n = 0
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                writer.upsert(row)
+                n += 1
+        conn.commit()
+        counts[source] = n
+    conn.execute("INSERT INTO fts (fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+    return counts
+
+
+# =========================
+# CONSULTA
+# =========================
+def _match_expr(query: str) -> str:
+    # todas las palabras; la última también como prefijo ("plag" -> plagas)
+    tokens = fold(query).split()
+    if not tokens:
+        return ""
+    return " ".join(f'"{t}"' for t in tokens[:-1]) + f' "{tokens[-1]}"*'
+
+
+def search(query: str = "", filters: dict | None = None, facets: list[str] | None = None,
+           limit: int = 20, offset: int = 0, path: Path = INDEX) -> dict:
+    """
+    {"total", "items", "facets"} de los documentos que contienen todas las
+    palabras de query y cumplen los filtros (faceta -> valor).
+    """
+    conn = connect(path)
+    where, params = [], []
+    match = _match_expr(query)
+    if match:
+        where.append("d.id IN (SELECT rowid FROM fts WHERE fts MATCH ?)")
+        params.append(match)
+    for f, value in (filters or {}).items():
+        if f not in FACETS:
+            raise ValueError(f"faceta desconocida: {f}")
+        where.append(f"d.{f} = ?")
+        params.append(int(value) if f in ("is_alive", "has_email") else (value if f == "source" else fold(value)))
+    clause = ("WHERE " + " AND ".join(where)) if where else ""
+
+    try:
+        total = conn.execute(f"SELECT COUNT(*) FROM docs d {clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT d.source, d.data FROM docs d {clause} ORDER BY d.id LIMIT ? OFFSET ?",
+            [*params, limit, offset],
+        ).fetchall()
+        facet_counts = {}
+        for f in facets or []:
+            if f not in FACETS:
+                raise ValueError(f"faceta desconocida: {f}")
+            facet_counts[f] = conn.execute(
+                f"SELECT d.{f}, COUNT(*) FROM docs d {clause} GROUP BY d.{f} ORDER BY COUNT(*) DESC LIMIT 20",
+                params,
+            ).fetchall()
+    finally:
+        conn.close()
+
+    items = [{"source": source, **json.loads(data)} for source, data in rows]
+    return {"total": total, "items": items, "facets": facet_counts}
+
+
+def main():
+    import time
+
+    from common.analytics import DATA, discover
+
+    parser = argparse.ArgumentParser(description="Índice de búsqueda de leads")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="(Re)indexa las salidas")
+    p_build.add_argument("customer", nargs="?")
+    p_build.add_argument("base", nargs="?")
+
+    p_query = sub.add_parser("query", help="Busca")
+    p_query.add_argument("text", nargs="?", default="")
+    for f in FACETS:
+        if f in ("is_alive", "has_email"):
+            p_query.add_argument(f"--{f.replace('_', '-')}", action="store_const", const=1, default=None)
+        else:
+            p_query.add_argument(f"--{f}", default=None)
+    p_query.add_argument("--facets", default="", help="Facetas a contar, separadas por comas")
+    p_query.add_argument("--limit", type=int, default=20)
+    p_query.add_argument("--offset", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        started = time.perf_counter()
+        counts = build(discover(args.customer, args.base), DATA)
+        for source, n in counts.items():
+            print(f"  - {source}: {n} filas")
+        print(f"✅ Índice actualizado en {time.perf_counter() - started:.1f}s: {INDEX}")
+        return
+
+    if not index_enabled():
+        print(f"❌ No existe el índice {INDEX}: python -m common.search build")
+        return
+    filters = {f: getattr(args, f) for f in FACETS if getattr(args, f) is not None}
+    facets = [f.strip() for f in args.facets.split(",") if f.strip()]
+    started = time.perf_counter()
+    result = search(args.text, filters, facets, limit=args.limit, offset=args.offset)
+    took = (time.perf_counter() - started) * 1000
+    print(f"📊 {result['total']} resultados en {took:.1f} ms")
+    for item in result["items"]:
+        print("  - " + " | ".join(str(item.get(f) or "") for f in SHOW_FIELDS) + f"  [{item['source']}]")
+    for f, counts in result["facets"].items():
+        print(f"  {f}: " + ", ".join(f"{v or '∅'}={n}" for v, n in counts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Descubrimiento por sitemap para los listados de WordPress (amisando, comunicare).
+
+En vez de paginar el listado HTML de cada sección, se leen los sitemaps XML
+que publica el propio WordPress (Yoast: sitemap_index.xml, core: wp-sitemap.xml),
+que ya traen todas las URLs de posts con su lastmod:
+
+  for url, lastmod in iter_sitemap_urls(session, "https://amisando.es",
+                                        follow=r"post-sitemap", pattern=r"^https://amisando\\.es/[^/]+/$"):
+      ...
+
+Los sitemaps (y los .xml.gz) se procesan en streaming con un parser XML
+incremental: cada <url> se suelta de la raíz en cuanto se ha leído, así que la
+memoria no depende del tamaño del sitemap.
+
+Un sitemap hijo que falla (404, timeout, XML roto) se salta y se apunta en
+failed: quien necesite el listado completo debe comprobarlo antes de fiarse.
+
+  cd /app && python -m common.sitemap https://amisando.es --follow post-sitemap
+"""
+
+import argparse
+import re
+import zlib
+from urllib.parse import urljoin
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+from requests.exceptions import RequestException
+
+from common.budget import BudgetExhausted
+from common.http import new_session
+
+CHUNK = 64 * 1024
+# dónde suele estar el índice si robots.txt no lo dice
+DEFAULT_LOCATIONS = ["/sitemap_index.xml", "/wp-sitemap.xml", "/sitemap.xml"]
+MAX_SITEMAPS = 500  # seguridad anti-loops entre índices
+
+
+def _local(tag: str) -> str:
+    # "{http://www.sitemaps.org/schemas/sitemap/0.9}loc" -> "loc"
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iter_chunks(r, url: str):
+    """
+    Body en trozos, descomprimiendo si es un .gz servido tal cual
+    (el Content-Encoding: gzip ya lo quita requests).
+    """
+    gunzip = None
+    for chunk in r.iter_content(CHUNK):
+        if gunzip is None:
+            gzipped = chunk[:2] == b"\x1f\x8b" or url.endswith(".gz")
+            gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else False
+        yield gunzip.decompress(chunk) if gunzip else chunk
+    if gunzip:
+        yield gunzip.flush()
+
+
+def parse_sitemap(session, url: str):
+    """
+    Lee un sitemap en streaming. Genera ("sitemap" | "url", loc, lastmod):
+    "sitemap" para las entradas de un índice y "url" para las de un urlset.
+    """
+    r = session.get(url, timeout=30, stream=True)
+    try:
+        r.raise_for_status()
+        parser = XMLPullParser(events=("start", "end"))
+        root = None
+        fields = {}
+        for data in _iter_chunks(r, url):
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    continue
+                tag = _local(elem.tag)
+                if tag in ("loc", "lastmod"):
+                    fields[tag] = (elem.text or "").strip()
+                elif tag in ("url", "sitemap"):
+                    if fields.get("loc"):
+                        yield tag, fields["loc"], fields.get("lastmod", "")
+                    fields = {}
+                    # fuera de la raíz todo lo leído: si no, el árbol crece con el sitemap
+                    root.clear()
+        parser.close()
+    finally:
+        r.close()
+
+
+def find_sitemaps(session, site: str) -> list[str]:
+    """
+    Sitemaps declarados en robots.txt; si no hay, el primero de DEFAULT_LOCATIONS que exista.
+    """
+    root = site.rstrip("/") + "/"
+    try:
+        r = session.get(urljoin(root, "/robots.txt"), timeout=30)
+        if r.ok:
+            found = [
+                line.split(":", 1)[1].strip()
+                for line in r.text.splitlines()
+                if line.lower().startswith("sitemap:")
+            ]
+            if found:
+                return found
+    except BudgetExhausted:
+        raise
+    except Exception:
+        pass
+
+    for path in DEFAULT_LOCATIONS:
+        url = urljoin(root, path)
+        try:
+            r = session.head(url, timeout=30, allow_redirects=True)
+            if r.ok:
+                return [url]
+        except BudgetExhausted:
+            raise
+        except Exception:
+            continue
+    return []
+
+
+def iter_sitemap_urls(session, site_or_sitemap: str, follow: str | None = None, pattern: str | None = None,
+                      since: str | None = None, failed: list | None = None):
+    """
+    (url, lastmod) de todas las URLs alcanzables desde el sitio o sitemap dado.
+
+      - follow:  regex; sólo se abren los sitemaps hijos de un índice que la cumplan
+      - pattern: regex; sólo se devuelven las URLs que la cumplan
+      - since:   sólo URLs con lastmod >= since (ISO 8601, se compara como texto);
+                 las que no traen lastmod se devuelven siempre
+      - failed:  lista donde apuntar los sitemaps que no se han podido leer enteros
+    """
+    follow_re = re.compile(follow) if follow else None
+    pattern_re = re.compile(pattern) if pattern else None
+
+    if re.search(r"\.xml(\.gz)?$", site_or_sitemap):
+        pending = [site_or_sitemap]
+    else:
+        pending = find_sitemaps(session, site_or_sitemap)
+
+    opened = set()
+    while pending and len(opened) < MAX_SITEMAPS:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in opened:
+            continue
+        opened.add(sitemap_url)
+        try:
+            for kind, loc, lastmod in parse_sitemap(session, sitemap_url):
+                if kind == "sitemap":
+                    if follow_re is None or follow_re.search(loc):
+                        pending.append(loc)
+                    continue
+                if pattern_re and not pattern_re.search(loc):
+                    continue
+                if since and lastmod and lastmod < since:
+                    continue
+                yield loc, lastmod
+        except BudgetExhausted:
+            raise
+        except (ParseError, RequestException) as e:
+            print(f"⚠️ Sitemap no válido ({e}): {sitemap_url}")
+            if failed is not None:
+                failed.append(sitemap_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URLs de los sitemaps de un sitio")
+    parser.add_argument("site", help="URL del sitio o de un sitemap concreto")
+    parser.add_argument("--follow", default=None, help="Regex de los sitemaps hijos a abrir")
+    parser.add_argument("--pattern", default=None, help="Regex de las URLs a devolver")
+    parser.add_argument("--since", default=None, help="Sólo lastmod >= esta fecha (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    session = new_session({"User-Agent": "Mozilla/5.0"})
+    n = 0
+    for url, lastmod in iter_sitemap_urls(session, args.site, args.follow, args.pattern, args.since):
+        print(f"{lastmod}\t{url}")
+        n += 1
+    print(f"📊 {n} URLs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Resumen incremental de cada salida, mantenido mientras se escribe:
+
+  websites.csv  ->  websites.summary.json
+
+  {"rows": 1234, "columns": ["website", "email", ...],
+   "filled": {"website": 900, "email": 310, ...}, "filled_alive": {"email": 280, ...},
+   "alive": 700, "platforms": {"shopify": 120, ...}, "platforms_alive": {...},
+   "csv_bytes": 456789, "updated": 1700000000.0}
+
+- Contadores actualizados fila a fila; leer el resumen es O(1).
+- Escritura atómica (tmp + rename), como mucho cada DUMP_INTERVAL segundos
+  y siempre al cerrar: se puede leer desde fuera con el crawl en marcha.
+- csv_bytes es el tamaño del CSV que reflejan los contadores. Al reanudar
+  sólo se cuentan las filas a partir de ese offset (p.ej. tras un crash
+  entre el flush del CSV y el volcado del resumen).
+- Con --workers cada worker lleva el de su parte (website.part0.summary.json);
+  read_summary() los suma al del CSV principal.
+"""
+
+import csv
+import io
+import json
+import time
+from collections import Counter
+from pathlib import Path
+
+DUMP_INTERVAL = 1.0
+
+ALIVE_COLUMN = "is_alive"
+PLATFORM_COLUMN = "platform"
+# contadores que el resumen da sólo sobre las filas alive
+ALIVE_SCOPED = [("telefono", "Teléfonos"), ("email", "Emails")]
+
+
+def summary_path(csv_path: Path) -> Path:
+    return csv_path.with_suffix(".summary.json")
+
+
+def _empty() -> dict:
+    return {
+        "rows": 0,
+        "columns": [],
+        "filled": {},
+        "filled_alive": {},
+        "alive": 0,
+        "platforms": {},
+        "platforms_alive": {},
+        "csv_bytes": 0,
+        "updated": None,
+    }
+
+
+def load_summary(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class SummarySink:
+    def __init__(self, csv_path: Path, fieldnames: list[str], mode: str = "a"):
+        self.csv_path = csv_path
+        self.fieldnames = list(fieldnames)
+        self.path = summary_path(csv_path)
+        self._last_dump = 0.0
+
+        data = load_summary(self.path) if mode == "a" else None
+        size = self.csv_path.stat().st_size if self.csv_path.exists() else 0
+        if data is None or data.get("csv_bytes", 0) > size:
+            # sin resumen, o el CSV se reescribió: contar desde el principio
+            data = _empty()
+
+        self.rows = data["rows"]
+        self.filled = Counter(data["filled"])
+        self.filled_alive = Counter(data.get("filled_alive") or {})
+        self.alive = data["alive"]
+        self.platforms = Counter(data["platforms"])
+        self.platforms_alive = Counter(data["platforms_alive"])
+        self.csv_bytes = data["csv_bytes"]
+
+        if mode == "a" and self.csv_bytes < size:
+            self._catch_up(size)
+            self.dump()
+
+    def _catch_up(self, size: int):
+        with self.csv_path.open("rb") as raw:
+            raw.seek(self.csv_bytes)
+            f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            if self.csv_bytes == 0:
+                reader = csv.DictReader(f)
+            else:
+                reader = csv.DictReader(f, fieldnames=self.fieldnames)
+            for row in reader:
+                self.write(row)
+        self.csv_bytes = size
+
+    def write(self, row: dict):
+        self.rows += 1
+        alive = ALIVE_COLUMN in row and str(row[ALIVE_COLUMN]).strip() in ("1", "true", "True")
+        for k, v in row.items():
+            if v not in (None, "") and str(v).strip():
+                self.filled[k] += 1
+                if alive:
+                    self.filled_alive[k] += 1
+
+        if alive:
+            self.alive += 1
+        if PLATFORM_COLUMN in row:
+            p = (row.get(PLATFORM_COLUMN) or "").strip() or "(unknown)"
+            self.platforms[p] += 1
+            if alive:
+                self.platforms_alive[p] += 1
+
+    def flush(self):
+        """
+        El CSV acaba de hacer flush: los contadores reflejan todo lo escrito.
+        """
+        self.csv_bytes = self.csv_path.stat().st_size
+        if time.time() - self._last_dump >= DUMP_INTERVAL:
+            self.dump()
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "columns": self.fieldnames,
+            "filled": dict(self.filled),
+            "filled_alive": dict(self.filled_alive),
+            "alive": self.alive,
+            "platforms": dict(self.platforms.most_common()),
+            "platforms_alive": dict(self.platforms_alive.most_common()),
+            "csv_bytes": self.csv_bytes,
+            "updated": time.time(),
+        }
+
+    def dump(self):
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.as_dict(), ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+        self._last_dump = time.time()
+
+    def close(self):
+        if self.csv_path.exists():
+            self.csv_bytes = self.csv_path.stat().st_size
+        self.dump()
+
+
+def read_summary(csv_path: Path) -> dict | None:
+    """
+    Resumen actual de una salida, incluidas las partes de workers en curso.
+    """
+    paths = [summary_path(csv_path)]
+    paths += sorted(csv_path.parent.glob(f"{csv_path.stem}.part*.summary.json"))
+
+    out = None
+    for p in paths:
+        data = load_summary(p)
+        if data is None:
+            continue
+        if out is None:
+            out = _empty()
+            out["filled"], out["filled_alive"] = Counter(), Counter()
+            out["platforms"], out["platforms_alive"] = Counter(), Counter()
+        out["rows"] += data["rows"]
+        out["columns"] = out["columns"] or data.get("columns") or []
+        out["alive"] += data["alive"]
+        out["filled"].update(data["filled"])
+        out["filled_alive"].update(data.get("filled_alive") or {})
+        out["platforms"].update(data["platforms"])
+        out["platforms_alive"].update(data["platforms_alive"])
+        out["updated"] = max(out["updated"] or 0, data.get("updated") or 0)
+
+    if out is not None:
+        for k in ("filled", "filled_alive", "platforms", "platforms_alive"):
+            out[k] = dict(out[k].most_common())
+        del out["csv_bytes"]
+    return out
+
+
+def print_summary(csv_path: Path):
+    s = read_summary(csv_path)
+    print(f"\n📊 RESUMEN ({csv_path.name})")
+    if s is None:
+        print("- No hay output aún.")
+        return
+    print(f"- Filas: {s['rows']}")
+    for k, v in s["filled"].items():
+        print(f"- {k} (no vacíos): {v}")
+
+    # con columna alive, como el resumen de siempre: contactos sólo de las vivas
+    # y plataformas de las vivas y del total
+    has_alive = ALIVE_COLUMN in s["columns"] or s["alive"]
+    if not has_alive:
+        if s["platforms"]:
+            print("\n🧩 Plataformas:")
+            for k, v in s["platforms"].items():
+                print(f"  - {k}: {v}")
+        return
+
+    print(f"- Alive: {s['alive']}")
+    for col, label in ALIVE_SCOPED:
+        if col in s["columns"] or col in s["filled"]:
+            print(f"- {label} (solo alive): {s['filled_alive'].get(col, 0)}")
+    if PLATFORM_COLUMN in s["columns"] or s["platforms"]:
+        print("\n🧩 Plataformas (solo alive):")
+        for k, v in s["platforms_alive"].items():
+            print(f"  - {k}: {v}")
+        print("\n🧩 Plataformas (total):")
+        for k, v in s["platforms"].items():
+            print(f"  - {k}: {v}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for arg in sys.argv[1:]:
+        print_summary(Path(arg))
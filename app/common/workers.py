@@ -0,0 +1,186 @@
+import csv
+import multiprocessing
+import sys
+import zlib
+from pathlib import Path
+
+from common.budget import EXIT_CODE, BudgetExhausted, report_exhausted
+from common.output import StageOutput
+from common.summary import summary_path
+
+
+def partition_of(key: str, workers: int) -> int:
+    """
+    Partición estable (no depende de PYTHONHASHSEED) para un host/clave.
+    """
+    return zlib.crc32((key or "").encode("utf-8")) % workers
+
+
+def owns_row(spec: dict, row: dict, kwargs) -> bool:
+    """
+    En modo --workers cada proceso sólo se queda con las filas cuyo host
+    cae en su partición. Sin workers, todas las filas son nuestras.
+    """
+    workers = kwargs.get("workers")
+    if not workers or workers <= 1:
+        return True
+    return partition_of(spec["host"](row), workers) == kwargs.get("worker", 0)
+
+
+def worker_output(out_path: Path, kwargs) -> Path:
+    """
+    Cada worker escribe en su propio fichero parcial:
+      website.csv -> website.part0.csv
+    """
+    workers = kwargs.get("workers")
+    if not workers or workers <= 1:
+        return out_path
+    return out_path.with_name(f"{out_path.stem}.part{kwargs.get('worker', 0)}{out_path.suffix}")
+
+
+class _PrefixedStdout:
+    """
+    Prefija cada línea con [wN] para poder seguir los logs entrelazados.
+    """
+
+    def __init__(self, stream, prefix: str):
+        self._stream = stream
+        self._prefix = prefix
+        self._at_line_start = True
+
+    def write(self, s: str) -> int:
+        for chunk in s.splitlines(keepends=True):
+            if self._at_line_start:
+                self._stream.write(self._prefix)
+            self._stream.write(chunk)
+            self._at_line_start = chunk.endswith("\n")
+        return len(s)
+
+    def flush(self):
+        self._stream.flush()
+
+
+def _worker_main(module_path: str, kwargs: dict):
+    import importlib
+
+    from common import metrics
+
+    sys.stdout = _PrefixedStdout(sys.stdout, f"[w{kwargs['worker']}] ")
+
+    dump = None
+    if kwargs.get("metrics_dir"):
+        dump = metrics.start_snapshots(Path(kwargs["metrics_dir"]) / f"w{kwargs['worker']}.json")
+
+    module = importlib.import_module(module_path)
+    try:
+        if kwargs.get("profile"):
+            from common.profiling import profile_run
+
+            profile_run(module.run, f"{kwargs.get('entity')}-w{kwargs['worker']}", **kwargs)
+        else:
+            module.run(**kwargs)
+    except BudgetExhausted as e:
+        report_exhausted(e, kwargs)
+        sys.exit(EXIT_CODE)
+    finally:
+        if dump:
+            dump()
+
+
+def _input_order(spec: dict, input_csv: Path) -> dict[str, int]:
+    order = {}
+    if not input_csv.exists():
+        return order
+    with input_csv.open(newline="", encoding="utf-8") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            k = spec["key"](row)
+            if k and k not in order:
+                order[k] = i
+    return order
+
+
+def merge_parts(spec: dict, input_csv: Path, out_path: Path, workers: int, kwargs: dict | None = None) -> int:
+    """
+    Vuelca los website.partN.csv en el CSV normal, en el orden del input
+    (determinista independientemente de qué worker acabó antes).
+    Devuelve el número de filas añadidas.
+    """
+    order = _input_order(spec, input_csv)
+    fieldnames = None
+    rows = []
+    parts = []
+
+    for w in range(workers):
+        p = worker_output(out_path, {"workers": workers, "worker": w})
+        if not p.exists():
+            continue
+        parts.append(p)
+        with p.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fieldnames = fieldnames or reader.fieldnames
+            for j, row in enumerate(reader):
+                pos = order.get(spec["key"](row), len(order))
+                rows.append((pos, w, j, row))
+
+    if not parts:
+        return 0
+
+    rows.sort(key=lambda t: t[:3])
+
+    # salidas derivadas (--columnar...) se generan aquí, no en los workers
+    with StageOutput(out_path, fieldnames, {**(kwargs or {}), "merged": True}) as out:
+        out.writerows(row for *_, row in rows)
+
+    for p in parts:
+        p.unlink()
+        summary_path(p).unlink(missing_ok=True)
+
+    return len(rows)
+
+
+def run_parallel(module_path: str, module, workers: int, **kwargs) -> int:
+    """
+    Lanza N procesos con la misma etapa, cada uno con su partición de hosts,
+    y al terminar fusiona las salidas parciales.
+    Devuelve 0 si todos terminaron, 1 si alguno falló y budget.EXIT_CODE si
+    alguno se quedó sin presupuesto (common.budget).
+    """
+    spec = module.PARALLEL
+    out_path = Path(kwargs["out_dir"]) / spec["output"]
+    input_csv = Path("/data") / kwargs["customer"] / kwargs["base"] / spec["input"]
+
+    if kwargs.get("metrics_dir"):
+        # snapshots de una ejecución anterior no deben sumar
+        for old in Path(kwargs["metrics_dir"]).glob("w*.json"):
+            old.unlink()
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = []
+    for i in range(workers):
+        p = ctx.Process(
+            target=_worker_main,
+            args=(module_path, {**kwargs, "workers": workers, "worker": i}),
+            name=f"w{i}",
+        )
+        p.start()
+        procs.append(p)
+
+    code = 0
+    for p in procs:
+        p.join()
+        if p.exitcode == EXIT_CODE:
+            print(f"⏳ Worker {p.name} se quedó sin presupuesto")
+            code = code or EXIT_CODE
+        elif p.exitcode != 0:
+            print(f"❌ Worker {p.name} terminó con código {p.exitcode}")
+            code = 1
+
+    # Aunque falle un worker, sus filas ya escritas son válidas: se fusionan igual
+    merged = merge_parts(spec, input_csv, out_path, workers, kwargs)
+    print(f"🔀 Fusionadas {merged} filas de {workers} workers en {out_path}")
+
+    summary = spec.get("summary")
+    if summary:
+        summary(out_path)
+
+    return code
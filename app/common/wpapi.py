@@ -0,0 +1,109 @@
+"""
+Atajo por la API REST de WordPress (run.py ... --wp-api).
+
+amisando.es y comunicare.es son WordPress: si exponen /wp-json/wp/v2/, el
+contenido ya renderizado de 100 posts viene en una sola petición JSON, en vez
+de una petición HTML (con toda la plantilla) por ficha o por ciudad:
+
+  rendered = prefetch_rendered(session, urls)   # url -> content.rendered
+  html = rendered.get(url)                      # None: no está, se hace el GET de siempre
+
+Sólo se pide lo necesario (_fields=link,content) y sólo se guarda el contenido
+de las URLs pedidas. Los extractores de cada etapa se aplican igual sobre ese
+contenido; si la API no existe o no trae lo que buscan, la etapa lee el HTML.
+"""
+
+from urllib.parse import urlparse
+
+import requests
+
+API_PATH = "/wp-json/wp/v2/"
+PER_PAGE = 100
+KINDS = ("posts", "pages")
+
+
+def _link_key(url: str) -> str:
+    p = urlparse((url or "").strip())
+    host = p.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return host + p.path.rstrip("/")
+
+
+def detect_api(session, site: str) -> str | None:
+    """
+    URL base de wp/v2 si el sitio la expone, o None.
+    """
+    root = site.rstrip("/")
+    try:
+        r = session.get(root + "/wp-json/", timeout=30)
+        if r.status_code >= 400:
+            return None
+        data = r.json()
+    except (requests.exceptions.RequestException, ValueError):
+        return None
+    if not isinstance(data, dict) or "wp/v2" not in (data.get("namespaces") or []):
+        return None
+    return root + API_PATH
+
+
+def iter_posts(session, api: str, kind: str = "posts", fields: tuple[str, ...] = ("link", "content"), **params):
+    """
+    Todos los elementos de /wp/v2/<kind>, de PER_PAGE en PER_PAGE.
+    """
+    page = 1
+    while True:
+        r = session.get(
+            api + kind,
+            params={"per_page": PER_PAGE, "page": page, "_fields": ",".join(fields), **params},
+            timeout=30,
+        )
+        # pasada la última página WordPress responde 400 (rest_post_invalid_page_number)
+        if r.status_code == 400 and page > 1:
+            return
+        r.raise_for_status()
+        items = r.json()
+        if not items:
+            return
+        yield from items
+
+        total_pages = int(r.headers.get("X-WP-TotalPages") or 0)
+        if (total_pages and page >= total_pages) or len(items) < PER_PAGE:
+            return
+        page += 1
+
+
+def prefetch_rendered(session, urls) -> dict[str, str]:
+    """
+    url -> content.rendered de las URLs pedidas que estén en la API.
+    Vacío si el sitio no tiene API (la etapa sigue por HTML).
+    """
+    wanted = {}
+    for u in urls:
+        if u:
+            wanted.setdefault(_link_key(u), u)
+    if not wanted:
+        return {}
+
+    first = urlparse(next(iter(wanted.values())))
+    api = detect_api(session, f"{first.scheme}://{first.netloc}")
+    if api is None:
+        print("↪️ API REST de WordPress no disponible: se sigue por HTML")
+        return {}
+
+    found = {}
+    for kind in KINDS:
+        try:
+            for post in iter_posts(session, api, kind):
+                if len(found) == len(wanted):
+                    break
+                url = wanted.get(_link_key(post.get("link")))
+                if url and url not in found:
+                    found[url] = ((post.get("content") or {}).get("rendered")) or ""
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"⚠️ API REST ({kind}): {e}")
+        if len(found) == len(wanted):
+            break
+
+    print(f"⚡ API REST: {len(found)}/{len(wanted)} páginas obtenidas por JSON ({api})")
+    return found
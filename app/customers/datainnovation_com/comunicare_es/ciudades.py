@@ -1,9 +1,11 @@
 # ./run.sh datainnovation_com comunicare_es ciudades
 
-import csv
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
 
 DEFAULT_URL = "https://www.comunicare.es/mejores-agencias-publicidad-espana/"
 
@@ -19,8 +21,9 @@ HEADERS = {
 
 PREFIX = "Agencias de publicidad en "
 
+@timer("extract")
 def extract_city_links_from_content(html: str):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     rows = []
 
     # Buscamos h3 de Gutenberg (wp-block-heading) que contengan un <a>
@@ -67,7 +70,7 @@ def run(out_dir: str, **kwargs):
     if html_file:
         html = Path(html_file).read_text(encoding="utf-8", errors="ignore")
     else:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = new_session(HEADERS, kwargs).get(url, timeout=30)
         r.raise_for_status()
         html = r.text
 
@@ -77,9 +80,9 @@ def run(out_dir: str, **kwargs):
     out_dir_path.mkdir(parents=True, exist_ok=True)
     out_path = out_dir_path / "ciudades.csv"
 
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["ciudad", "url"])
-        w.writeheader()
-        w.writerows(cities)
+    # journal + rename atómico: un corte nunca deja ciudades.csv a medias
+    with SectionJournal(out_path, ["ciudad", "url"], kwargs) as out:
+        out.writerows(cities)
+        out.commit()
 
     print(f"✅ Guardado {len(cities)} ciudades en {out_path}")
@@ -1,11 +1,13 @@
 # ./run.sh datainnovation_com comunicare_es empresas
 import csv
-import time
 from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
-import requests
-from bs4 import BeautifulSoup
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
+from common.wpapi import prefetch_rendered
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -37,8 +39,9 @@ def _is_probably_company_heading(text: str) -> bool:
             return False
     return True
 
+@timer("extract")
 def _extract_companies_from_city(html: str, city_url: str):
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     rows = []
 
     for h3 in soup.select("h3.wp-block-heading"):
@@ -101,54 +104,67 @@ def run(out_dir: str, **kwargs):
     if not ciudades_csv.exists():
         raise FileNotFoundError(f"No existe el input: {ciudades_csv}")
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
-
-    rows = []
-    seen_global = set()
-
-    with ciudades_csv.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ciudad = (row.get("ciudad") or "").strip()
-            ciudad_url = (row.get("url") or "").strip()
-            if not ciudad or not ciudad_url:
-                continue
-
-            print(f"\n▶ {ciudad}: {ciudad_url}")
-
-            r = session.get(ciudad_url, timeout=30)
-            r.raise_for_status()
-
-            companies = _extract_companies_from_city(r.text, ciudad_url)
-            print(f"  - encontradas {len(companies)} empresas")
-
-            added = 0
-            for c in companies:
-                key = (ciudad, c["web"])
-                if key in seen_global:
-                    continue
-                seen_global.add(key)
-
-                rows.append({
-                    "ciudad": ciudad,
-                    "ciudad_url": ciudad_url,
-                    "empresa": c["empresa"],
-                    "anchor": c["anchor"],
-                    "web": c["web"],
-                })
-                added += 1
-
-            print(f"  +{added} nuevas (total: {len(rows)})")
-            time.sleep(0.6)
+    session = new_session(HEADERS, kwargs)
 
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / "empresas.csv"
 
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["ciudad", "ciudad_url", "empresa", "anchor", "web"])
-        w.writeheader()
-        w.writerows(rows)
+    # cada ciudad va a disco al terminarla; empresas.csv se sustituye al final
+    with SectionJournal(out_path, ["ciudad", "ciudad_url", "empresa", "anchor", "web"], kwargs) as out:
+        seen_global = {(r["ciudad"], r["web"]) for r in out.rows()}
+
+        # --wp-api: el contenido de las ciudades pendientes por la API REST, 100 por petición
+        prefetched = {}
+        if kwargs.get("wp_api"):
+            with ciudades_csv.open(newline="", encoding="utf-8") as f:
+                pending = [(r.get("url") or "").strip() for r in csv.DictReader(f)]
+            prefetched = prefetch_rendered(session, [u for u in pending if not out.done(u)])
+
+        with ciudades_csv.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                ciudad = (row.get("ciudad") or "").strip()
+                ciudad_url = (row.get("url") or "").strip()
+                if not ciudad or not ciudad_url:
+                    continue
+                if out.done(ciudad_url):
+                    continue
 
-    print(f"\n✅ Guardadas {len(rows)} empresas en {out_path}")
+                print(f"\n▶ {ciudad}: {ciudad_url}")
+
+                companies = []
+                if ciudad_url in prefetched:
+                    companies = _extract_companies_from_city(prefetched.pop(ciudad_url), ciudad_url)
+                # sin API o sin empresas en su contenido: el HTML de siempre
+                from_html = not companies
+                if from_html:
+                    r = session.get(ciudad_url, timeout=30)
+                    r.raise_for_status()
+                    companies = _extract_companies_from_city(r.text, ciudad_url)
+                print(f"  - encontradas {len(companies)} empresas" + ("" if from_html else " (API REST)"))
+
+                added = 0
+                for c in companies:
+                    key = (ciudad, c["web"])
+                    if key in seen_global:
+                        continue
+                    seen_global.add(key)
+
+                    out.writerow({
+                        "ciudad": ciudad,
+                        "ciudad_url": ciudad_url,
+                        "empresa": c["empresa"],
+                        "anchor": c["anchor"],
+                        "web": c["web"],
+                    })
+                    added += 1
+
+                print(f"  +{added} nuevas (total: {len(seen_global)})")
+                out.complete(ciudad_url)
+                if from_html:
+                    session.pause(0.6)
+
+        out.commit()
+
+    print(f"\n✅ Guardadas {len(seen_global)} empresas en {out_path}")
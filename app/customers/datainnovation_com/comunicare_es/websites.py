@@ -8,6 +8,14 @@ from urllib.parse import urljoin, urlparse
 
 import requests
 
+from common.domains import DomainCache
+from common.freshness import due_for_recrawl
+from common.http import new_session
+from common.metrics import cache_hit, record_lead, report_lead_times, timer, track_queue
+from common.output import StageOutput
+from common.priority import open_input
+from common.workers import owns_row, worker_output
+
 
 MAX_ITEMS = None  # pon 10 para test; None para todo
 
@@ -75,6 +83,7 @@ def _is_valid_email(email: str) -> bool:
     return True
 
 
+@timer("extract")
 def _pick_best_email(html: str, domain: str) -> str:
     emails = sorted(set(EMAIL_RE.findall(html)))
     emails = [e for e in emails if _is_valid_email(e)]
@@ -125,6 +134,7 @@ def _format_es_phone(norm: str) -> str:
     return norm
 
 
+@timer("extract")
 def _pick_best_phone(html: str) -> str:
     matches = PHONE_RE.findall(html)
     if not matches:
@@ -235,6 +245,35 @@ def _load_already_processed(output_csv: Path) -> set[str]:
     return processed
 
 
+def _row_key(row: dict) -> str:
+    return _ensure_url(row.get("web") or "")
+
+
+def _row_host(row: dict) -> str:
+    return _domain_from_url(row.get("web") or "")
+
+
+# --workers: se particiona por dominio de la web, así cada host queda en un worker
+PARALLEL = {
+    "input": "empresas.csv",
+    "output": "website.csv",
+    "key": _row_key,
+    "host": _row_host,
+}
+
+# python -m common.analytics: cobertura y rendimiento por ciudad
+ANALYTICS = {
+    "output": "website.csv",
+    "website": "web",
+    "groups": ["ciudad"],
+}
+
+# --prioritize: valor de cada web pendiente según su ciudad y su TLD (common.priority)
+PRIORITY = {
+    "group": "ciudad_url",
+}
+
+
 def run(out_dir: str, **kwargs):
     """
     Input:
@@ -265,26 +304,33 @@ def run(out_dir: str, **kwargs):
     if processed:
         print(f"↩️ Reanudando: {len(processed)} webs ya estaban en {out_path}")
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    write_path = worker_output(out_path, kwargs)
+    if write_path != out_path:
+        processed |= _load_already_processed(write_path)
+
+    # --recrawl: los registros vencidos se vuelven a procesar
+    processed -= due_for_recrawl(out_path, kwargs)
 
-    write_header = not out_path.exists() or out_path.stat().st_size == 0
-    f_out = out_path.open("a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(
-        f_out,
-        fieldnames=["ciudad", "ciudad_url", "empresa", "web", "email", "telefono"],
+    session = new_session(HEADERS, kwargs)
+    # --domain-cache: webs ya visitadas desde cualquier base
+    domains = DomainCache(kwargs)
+
+    out = StageOutput(
+        write_path,
+        ["ciudad", "ciudad_url", "empresa", "web", "email", "telefono"],
+        kwargs,
     )
-    if write_header:
-        writer.writeheader()
 
     written = 0
     considered = 0
+    # ⏩ reanudar: directo a la primera fila del input sin terminar (common.cursor);
+    # con --prioritize, las pendientes de más a menos valor (common.priority)
+    cursor = open_input(empresas_csv, out_path, kwargs, done=processed)
+    queue = track_queue(kwargs, empresas_csv, done=cursor.row)
 
     try:
-        with empresas_csv.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
+        with cursor:
+            for row in cursor:
                 if MAX_ITEMS is not None and considered >= MAX_ITEMS:
                     break
 
@@ -296,16 +342,25 @@ def run(out_dir: str, **kwargs):
                 if not web:
                     continue
 
+                if not owns_row(PARALLEL, row, kwargs):
+                    continue
+                queue.dec()
+
                 considered += 1
 
-                if web in processed:
+                if cache_hit("resume", web in processed):
                     continue
 
                 print(f"▶ {empresa} | {ciudad} | {web}")
 
-                email, telefono = _fetch_contact_data(session, web, timeout=timeout)
+                cached = domains.get(web)
+                if cached and cached["email"] and cached["telefono"]:
+                    email, telefono = cached["email"], cached["telefono"]
+                else:
+                    email, telefono = _fetch_contact_data(session, web, timeout=timeout)
+                    domains.put(web, email=email, telefono=telefono)
 
-                writer.writerow(
+                out.writerow(
                     {
                         "ciudad": ciudad,
                         "ciudad_url": ciudad_url,
@@ -315,12 +370,14 @@ def run(out_dir: str, **kwargs):
                         "telefono": telefono,
                     }
                 )
-                f_out.flush()
+                record_lead(kwargs, email=email, telefono=telefono, website=web)
 
                 processed.add(web)
                 written += 1
 
     finally:
-        f_out.close()
+        out.close()
+        domains.close()
 
-    print(f"✅ Añadidas {written} filas nuevas en {out_path}")
+    print(f"✅ Añadidas {written} filas nuevas en {write_path}")
+    report_lead_times(kwargs)
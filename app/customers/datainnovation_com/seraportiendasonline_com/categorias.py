@@ -1,11 +1,12 @@
 # ./run.sh datainnovation_com seraportiendasonline_com categorias
 
-import csv
 from pathlib import Path
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
 
 DEFAULT_URL = "http://www.seraportiendasonline.com/"
 
@@ -29,8 +30,9 @@ def _is_real_http_url(href: str) -> bool:
     return href.startswith("http://") or href.startswith("https://") or href.startswith("/")
 
 
+@timer("extract")
 def extract_category_links(html: str, base_url: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     rows = []
 
     container = soup.select_one("div.categorySideHolder")
@@ -75,7 +77,7 @@ def run(out_dir: str, **kwargs):
         html = Path(html_file).read_text(encoding="utf-8", errors="ignore")
         base_url = url
     else:
-        r = requests.get(url, headers=HEADERS, timeout=30)
+        r = new_session(HEADERS, kwargs).get(url, timeout=30)
         r.raise_for_status()
         html = r.text
         base_url = url
@@ -86,9 +88,9 @@ def run(out_dir: str, **kwargs):
     out_dir_path.mkdir(parents=True, exist_ok=True)
     out_path = out_dir_path / "categorias.csv"
 
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["categoria", "url"])
-        w.writeheader()
-        w.writerows(cats)
+    # journal + rename atómico: un corte nunca deja categorias.csv a medias
+    with SectionJournal(out_path, ["categoria", "url"], kwargs) as out:
+        out.writerows(cats)
+        out.commit()
 
     print(f"✅ Guardadas {len(cats)} categorías en {out_path}")
@@ -1,12 +1,14 @@
 # ./run.sh datainnovation_com seraportiendasonline_es empresas
 
 import csv
-import time
 from pathlib import Path
 from urllib.parse import urljoin, urlparse, parse_qs
 
-import requests
-from bs4 import BeautifulSoup
+from common.html import parse_html
+from common.http import new_session
+from common.metrics import timer
+from common.output import StageOutput
+from common.pagination import EarlyStop, incremental_patience, mark_full_walk
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -37,6 +39,18 @@ def _load_processed_pages(output_csv: Path) -> set[tuple[str, int]]:
     return done
 
 
+def _load_known_fichas(output_csv: Path) -> set[str]:
+    known = set()
+    if not output_csv.exists():
+        return known
+
+    with output_csv.open(newline="", encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            if r.get("ficha_url"):
+                known.add(r["ficha_url"])
+    return known
+
+
 def _get_page_number(url: str, default: int = 1) -> int:
     """
     Extrae np= de la URL. Si no existe, página 1.
@@ -48,8 +62,9 @@ def _get_page_number(url: str, default: int = 1) -> int:
         return default
 
 
+@timer("extract")
 def _extract_items(html: str, base_url: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     items = []
 
     for block in soup.select("div.productListItem"):
@@ -68,8 +83,9 @@ def _extract_items(html: str, base_url: str) -> list[dict]:
     return items
 
 
+@timer("extract")
 def _find_next_page(html: str, base_url: str) -> str:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     for a in soup.select("a[href]"):
         if a.get_text(strip=True).lower() == "siguiente":
             return urljoin(base_url, a["href"].strip())
@@ -90,18 +106,23 @@ def run(out_dir: str, **kwargs):
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / "empresas.csv"
 
-    processed_pages = _load_processed_pages(out_path)
-    if processed_pages:
-        print(f"↩️ Reanudando: {len(processed_pages)} páginas ya procesadas")
-
-    session = requests.Session()
-    session.headers.update(HEADERS)
-
-    write_header = not out_path.exists() or out_path.stat().st_size == 0
-    f_out = out_path.open("a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(
-        f_out,
-        fieldnames=[
+    # --incremental: cada subcategoría se recorre desde la página 1 y se corta
+    # tras K páginas sin fichas nuevas; si no, se reanuda por página
+    patience = incremental_patience(out_path, kwargs)
+    if patience:
+        processed_pages = set()
+        known = _load_known_fichas(out_path)
+    else:
+        processed_pages = _load_processed_pages(out_path)
+        known = set()
+        if processed_pages:
+            print(f"↩️ Reanudando: {len(processed_pages)} páginas ya procesadas")
+
+    session = new_session(HEADERS, kwargs)
+
+    out = StageOutput(
+        out_path,
+        [
             "categoria",
             "subcategoria",
             "subcategoria_url",
@@ -110,9 +131,8 @@ def run(out_dir: str, **kwargs):
             "imagen",
             "ficha_url",
         ],
+        kwargs,
     )
-    if write_header:
-        writer.writeheader()
 
     try:
         with subcats_csv.open(newline="", encoding="utf-8") as f:
@@ -128,6 +148,7 @@ def run(out_dir: str, **kwargs):
                 print(f"\n▶ Subcategoría: {categoria} / {subcategoria}")
 
                 next_url = subcat_url
+                stop = EarlyStop(known, patience)
 
                 while next_url:
                     page = _get_page_number(next_url, default=1)
@@ -145,9 +166,13 @@ def run(out_dir: str, **kwargs):
                     r.raise_for_status()
 
                     items = _extract_items(r.text, subcat_url)
+                    if patience:
+                        new = set(stop.page([it["ficha_url"] for it in items]))
+                        items = [it for it in items if it["ficha_url"] in new]
 
-                    for it in items:
-                        writer.writerow({
+                    # la página entera de golpe: el resume es por página
+                    out.writerows(
+                        {
                             "categoria": categoria,
                             "subcategoria": subcategoria,
                             "subcategoria_url": subcat_url,
@@ -155,15 +180,22 @@ def run(out_dir: str, **kwargs):
                             "empresa": it["empresa"],
                             "imagen": it["imagen"],
                             "ficha_url": it["ficha_url"],
-                        })
-
-                    f_out.flush()
+                        }
+                        for it in items
+                    )
                     processed_pages.add((subcat_url, page))
 
+                    if stop.done:
+                        print(f"  ⏹️ {stop.quiet_pages} páginas sin fichas nuevas, fin incremental")
+                        break
+
                     next_url = _find_next_page(r.text, subcat_url)
-                    time.sleep(SLEEP)
+                    session.pause(SLEEP)
 
     finally:
-        f_out.close()
+        out.close()
+
+    if patience is None:
+        mark_full_walk(out_path)
 
     print(f"\n✅ Scraping de empresas finalizado: {out_path}")
@@ -1,12 +1,13 @@
 # ./run.sh datainnovation_com seraportiendasonline_es subcategorias
 import csv
 import re
-import time
 from pathlib import Path
 from urllib.parse import urljoin
 
-import requests
-from bs4 import BeautifulSoup
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -39,8 +40,9 @@ def _parse_name_and_count(text: str) -> tuple[str, int]:
     )
 
 
+@timer("extract")
 def _extract_subcategories(html: str, category_url: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     rows = []
 
     for block in soup.select("div.catitemHolder2"):
@@ -98,65 +100,66 @@ def run(out_dir: str, **kwargs):
     if not categorias_csv.exists():
         raise FileNotFoundError(f"No existe el input: {categorias_csv}")
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    session = new_session(HEADERS, kwargs)
 
-    rows = []
-    seen_global = set()
-
-    with categorias_csv.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            categoria = (row.get("categoria") or "").strip()
-            categoria_url = (row.get("url") or "").strip()
-            if not categoria or not categoria_url:
-                continue
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / "subcategorias.csv"
+
+    # cada categoría va a disco al terminarla; subcategorias.csv se sustituye al final
+    with SectionJournal(
+        out_path,
+        [
+            "categoria",
+            "categoria_url",
+            "subcategoria",
+            "subcategoria_url",
+            "empresas_count",
+            "subcat_id",
+        ],
+        kwargs,
+    ) as out:
+        seen_global = {(r["categoria_url"], r["subcategoria_url"]) for r in out.rows()}
+
+        with categorias_csv.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                categoria = (row.get("categoria") or "").strip()
+                categoria_url = (row.get("url") or "").strip()
+                if not categoria or not categoria_url:
+                    continue
+                if out.done(categoria_url):
+                    continue
 
-            print(f"\n▶ {categoria}: {categoria_url}")
+                print(f"\n▶ {categoria}: {categoria_url}")
 
-            r = session.get(categoria_url, timeout=30)
-            r.raise_for_status()
+                r = session.get(categoria_url, timeout=30)
+                r.raise_for_status()
 
-            subs = _extract_subcategories(r.text, categoria_url)
-            print(f"  - encontradas {len(subs)} subcategorías")
+                subs = _extract_subcategories(r.text, categoria_url)
+                print(f"  - encontradas {len(subs)} subcategorías")
 
-            added = 0
-            for s in subs:
-                key = (categoria_url, s["subcategoria_url"])
-                if key in seen_global:
-                    continue
-                seen_global.add(key)
+                added = 0
+                for s in subs:
+                    key = (categoria_url, s["subcategoria_url"])
+                    if key in seen_global:
+                        continue
+                    seen_global.add(key)
 
-                rows.append({
-                    "categoria": categoria,
-                    "categoria_url": categoria_url,
-                    "subcategoria": s["subcategoria"],
-                    "subcategoria_url": s["subcategoria_url"],
-                    "empresas_count": s["empresas_count"],
-                    "subcat_id": s["subcat_id"],
-                })
-                added += 1
+                    out.writerow({
+                        "categoria": categoria,
+                        "categoria_url": categoria_url,
+                        "subcategoria": s["subcategoria"],
+                        "subcategoria_url": s["subcategoria_url"],
+                        "empresas_count": s["empresas_count"],
+                        "subcat_id": s["subcat_id"],
+                    })
+                    added += 1
 
-            print(f"  +{added} nuevas (total: {len(rows)})")
-            time.sleep(0.6)
+                print(f"  +{added} nuevas (total: {len(seen_global)})")
+                out.complete(categoria_url)
+                session.pause(0.6)
 
-    out_dir = Path(out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / "subcategorias.csv"
+        out.commit()
 
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=[
-                "categoria",
-                "categoria_url",
-                "subcategoria",
-                "subcategoria_url",
-                "empresas_count",
-                "subcat_id",
-            ],
-        )
-        w.writeheader()
-        w.writerows(rows)
-
-    print(f"\n✅ Guardadas {len(rows)} subcategorías en {out_path}")
+    print(f"\n✅ Guardadas {len(seen_global)} subcategorías en {out_path}")
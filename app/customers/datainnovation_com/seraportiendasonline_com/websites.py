@@ -3,14 +3,22 @@
 import csv
 import os
 import re
-import time
-import unicodedata
-from collections import Counter
 from pathlib import Path
 from urllib.parse import urlparse
 
 import requests
-from bs4 import BeautifulSoup
+
+from common.domains import DomainCache
+from common.fingerprint import fingerprint, format_technologies
+from common.freshness import due_for_recrawl
+from common.html import parse_html
+from common.http import new_session
+from common.metrics import cache_hit, record_lead, report_lead_times, timer, track_queue
+from common.names import NameIndex, normalize_empresa
+from common.output import StageOutput
+from common.priority import open_input
+from common.summary import print_summary
+from common.workers import owns_row, worker_output
 
 
 # =========================
@@ -19,7 +27,7 @@ from bs4 import BeautifulSoup
 MAX_ITEMS = None        # 10 para test; None para todo
 SLEEP = 0.35
 
-OUT_FIELDS = ["empresa", "website", "platform", "is_alive", "email", "telefono", "ficha_url"]
+OUT_FIELDS = ["empresa", "website", "platform", "is_alive", "email", "telefono", "ficha_url", "technologies"]
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -61,9 +69,9 @@ FREE_EMAIL_DOMAINS = {
     "gmail.com", "hotmail.com", "outlook.com", "live.com", "yahoo.com", "icloud.com",
 }
 
-SHOPIFY_RE = re.compile(r"(cdn\.shopify\.com|shopifyassets\.com|myshopify\.com)", re.I)
-WP_RE = re.compile(r"(wp-content/|wp-includes/|wp-json|xmlrpc\.php)", re.I)
-PRESTA_RE = re.compile(r"(prestashop|/modules/|/themes/|controller=)", re.I)
+# columna platform: la primera de estas que detecte common.fingerprint
+# (el detalle completo, con confianza, va en technologies)
+PLATFORMS = ("shopify", "wordpress", "prestashop")
 
 PARKING_RE = re.compile(
     r"(domain (is )?for sale|comprar dominio|this domain is for sale|sedo|dan\.com|afternic|parking|parked domain)",
@@ -120,27 +128,14 @@ def _domain_from_url(url: str) -> str:
     return host[4:] if host.startswith("www.") else host
 
 
-def normalize_empresa(name: str) -> str:
-    s = (name or "").strip().lower()
-    if not s:
-        return ""
-    s = unicodedata.normalize("NFKD", s)
-    s = "".join(ch for ch in s if not unicodedata.combining(ch))
-    s = s.replace("™", "").replace("®", "")
-    s = re.sub(r"\s+", " ", s)
-    s = s.strip(' "\'')
-    return s
-
-
-def detect_platform(html: str) -> str:
-    h = html or ""
-    if SHOPIFY_RE.search(h):
-        return "shopify"
-    if WP_RE.search(h):
-        return "wordpress"
-    if PRESTA_RE.search(h):
-        return "prestashop"
-    return ""
+@timer("extract")
+def detect_technologies(html: str, headers=None) -> dict[str, int]:
+    return fingerprint(html, headers)
+
+
+def detect_platform(html: str, technologies: dict[str, int] | None = None) -> str:
+    found = detect_technologies(html) if technologies is None else technologies
+    return next((p for p in PLATFORMS if p in found), "")
 
 
 def _is_valid_email(email: str) -> bool:
@@ -154,6 +149,7 @@ def _is_valid_email(email: str) -> bool:
     return True
 
 
+@timer("extract")
 def _pick_email_strict(html: str, domain: str) -> str:
     if not domain:
         return ""
@@ -167,6 +163,7 @@ def _pick_email_strict(html: str, domain: str) -> str:
     return ""
 
 
+@timer("extract")
 def _pick_email_fallback(html: str) -> str:
     emails = sorted(set(EMAIL_RE.findall(html or "")))
     emails = [e for e in emails if _is_valid_email(e)]
@@ -190,6 +187,7 @@ def _normalize_phone(raw: str) -> str:
     return raw
 
 
+@timer("extract")
 def _pick_best_phone(text: str) -> str:
     matches = PHONE_RE.findall(text or "")
     if not matches:
@@ -197,24 +195,28 @@ def _pick_best_phone(text: str) -> str:
     return _normalize_phone(matches[0])
 
 
-def check_alive(session: requests.Session, website: str, timeout) -> tuple[int, str]:
+def check_alive(session: requests.Session, website: str, timeout) -> tuple[int, str, dict]:
+    """
+    (is_alive, html de la portada, cabeceras de la respuesta)
+    """
     website = _safe_website(website)
     if not website:
-        return 0, ""
+        return 0, "", {}
     try:
         r = session.get(website, timeout=timeout, allow_redirects=True)
         if r.status_code >= 400:
-            return 0, ""
+            return 0, "", {}
         html = r.text or ""
         if html and PARKING_RE.search(html):
-            return 0, html
-        return 1, html
+            return 0, html, r.headers
+        return 1, html, r.headers
     except requests.exceptions.RequestException:
-        return 0, ""
+        return 0, "", {}
 
 
+@timer("extract")
 def _extract_from_ficha(html: str) -> tuple[str, str]:
-    soup = BeautifulSoup(html or "", "html.parser")
+    soup = parse_html(html)
 
     website = ""
     telefono = ""
@@ -261,66 +263,41 @@ def _load_processed_empresas(output_csv: Path) -> set[str]:
 
 def _print_summary(csv_path: Path):
     """
-    Resumen final:
-      - empresas (filas)
-      - websites no vacíos
-      - alive
-      - teléfonos de alive
-      - emails de alive
-      - plataformas (alive) y contadores
+    Resumen final: sale del resumen incremental (websites.summary.json),
+    sin releer el CSV. Desglose por categoría: python -m common.analytics
     """
-    if not csv_path.exists() or csv_path.stat().st_size == 0:
-        print("\n📊 RESUMEN\n- No hay output aún.")
-        return
-
-    total = 0
-    websites = 0
-    alive = 0
-    alive_phone = 0
-    alive_email = 0
-
-    plat_all = Counter()
-    plat_alive = Counter()
-
-    with csv_path.open("r", encoding="utf-8", newline="") as f:
-        dr = csv.DictReader(f)
-        for row in dr:
-            total += 1
-
-            w = (row.get("website") or "").strip()
-            if w:
-                websites += 1
+    print_summary(csv_path)
 
-            p = (row.get("platform") or "").strip() or "(unknown)"
-            plat_all[p] += 1
 
-            is_alive = (row.get("is_alive") or "").strip()
-            is_alive = 1 if is_alive in ("1", "true", "True") else 0
+def _row_key(row: dict) -> str:
+    return normalize_empresa(row.get("empresa") or "")
 
-            if is_alive:
-                alive += 1
-                plat_alive[p] += 1
 
-                if (row.get("telefono") or "").strip():
-                    alive_phone += 1
-                if (row.get("email") or "").strip():
-                    alive_email += 1
-
-    print("\n📊 RESUMEN")
-    print(f"- Empresas (filas): {total}")
-    print(f"- Websites (no vacíos): {websites}")
-    print(f"- Alive: {alive}")
-    print(f"- Teléfonos (solo alive): {alive_phone}")
-    print(f"- Emails (solo alive): {alive_email}")
+# --workers: se particiona por empresa (la clave DISTINCT), así una misma
+# empresa con varias fichas nunca acaba en dos workers.
+PARALLEL = {
+    "input": "empresas.csv",
+    "output": "websites.csv",
+    "key": _row_key,
+    "host": _row_key,
+    "summary": _print_summary,
+}
 
-    # Plataformas
-    print("\n🧩 Plataformas (solo alive):")
-    for k, v in plat_alive.most_common():
-        print(f"  - {k}: {v}")
+# python -m common.analytics: cobertura y rendimiento por categoría
+ANALYTICS = {
+    "output": "websites.csv",
+    "website": "website",
+    "alive": "is_alive",
+    "platform": "platform",
+    "join": [("empresas.csv", "ficha_url", "ficha_url", ["categoria", "subcategoria"])],
+    "groups": ["categoria", "subcategoria"],
+}
 
-    print("\n🧩 Plataformas (total):")
-    for k, v in plat_all.most_common():
-        print(f"  - {k}: {v}")
+# --prioritize: valor de cada ficha pendiente según su subcategoría (common.priority)
+PRIORITY = {
+    "group": "subcategoria_url",
+    "count": ("subcategorias.csv", "subcategoria_url", "empresas_count"),
+}
 
 
 # =========================
@@ -347,23 +324,35 @@ def run(out_dir: str, **kwargs):
     if processed:
         print(f"↩️ Breakpoint: {len(processed)} empresas ya estaban en {out_path}")
 
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    write_path = worker_output(out_path, kwargs)
+    if write_path != out_path:
+        processed |= _load_processed_empresas(write_path)
+
+    # --recrawl: los registros vencidos se vuelven a procesar
+    processed -= due_for_recrawl(out_path, kwargs)
+
+    session = new_session(HEADERS, kwargs)
+    # --domain-cache: webs ya visitadas desde cualquier base
+    domains = DomainCache(kwargs)
 
-    write_header = not out_path.exists() or out_path.stat().st_size == 0
-    f_out = out_path.open("a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(f_out, fieldnames=OUT_FIELDS)
-    if write_header:
-        writer.writeheader()
+    out = StageOutput(write_path, OUT_FIELDS, kwargs)
 
     seen_empresas = set(processed)
+    # --fuzzy-dedup: también fuera las casi iguales ("Adriels" / "Adriels Moda S.L.")
+    names = NameIndex() if kwargs.get("fuzzy_dedup") else None
+    if names is not None:
+        for k in seen_empresas:
+            names.add(k, k)
     considered = 0
     written = 0
+    # ⏩ reanudar: directo a la primera fila del input sin terminar (common.cursor);
+    # con --prioritize, las pendientes de más a menos valor (common.priority)
+    cursor = open_input(empresas_csv, out_path, kwargs, done=processed)
+    queue = track_queue(kwargs, empresas_csv, done=cursor.row)
 
     try:
-        with empresas_csv.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
+        with cursor:
+            for row in cursor:
                 if MAX_ITEMS is not None and considered >= MAX_ITEMS:
                     break
 
@@ -377,8 +366,17 @@ def run(out_dir: str, **kwargs):
                     continue
 
                 # DISTINCT por empresa
-                if key in seen_empresas:
+                if cache_hit("resume", key in seen_empresas):
+                    continue
+
+                if not owns_row(PARALLEL, row, kwargs):
                     continue
+                if names is not None:
+                    similar = names.query(key)
+                    if cache_hit("fuzzy", bool(similar)):
+                        print(f"≈ {empresa}: casi igual a {similar[0][0]!r}, se salta")
+                        continue
+                queue.dec()
 
                 considered += 1
                 print(f"▶ {empresa} | {ficha_url}")
@@ -388,6 +386,7 @@ def run(out_dir: str, **kwargs):
                 platform = ""
                 is_alive = 0
                 email = ""
+                technologies = ""
 
                 # 1) ficha seraportiendasonline
                 try:
@@ -395,7 +394,7 @@ def run(out_dir: str, **kwargs):
                     r.raise_for_status()
                     website, telefono = _extract_from_ficha(r.text)
                 except requests.exceptions.RequestException:
-                    writer.writerow({
+                    out.writerow({
                         "empresa": empresa,
                         "website": "",
                         "platform": "",
@@ -403,24 +402,42 @@ def run(out_dir: str, **kwargs):
                         "email": "",
                         "telefono": "",
                         "ficha_url": ficha_url,
+                        "technologies": "",
                     })
-                    f_out.flush()
+                    record_lead(kwargs)
                     seen_empresas.add(key)
+                    if names is not None:
+                        names.add(key, key)
                     written += 1
-                    time.sleep(SLEEP)
+                    session.pause(SLEEP)
                     continue
 
-                # 2) web real
-                if website:
-                    is_alive, html_home = check_alive(session, website, timeout=timeout)
+                # 2) web real (o lo que ya se sabe de su dominio)
+                cached = domains.get(website) if website else None
+                if cached and cached["is_alive"] == 0:
+                    # caída en la última comprobación: no se vuelve a esperar su timeout
+                    pass
+                elif cached and cached["is_alive"] == 1 and cached["email"] and cached["technologies"]:
+                    # sin tecnologías en la caché se visita la web: la columna no se deja vacía
+                    is_alive, platform, email = 1, cached["platform"] or "", cached["email"]
+                    technologies = cached["technologies"]
+                    if not telefono:
+                        telefono = cached["telefono"] or ""
+                elif website:
+                    is_alive, html_home, headers_home = check_alive(session, website, timeout=timeout)
                     if html_home:
-                        platform = detect_platform(html_home)
+                        # una sola pasada: todas las tecnologías, y de ahí la plataforma
+                        found = detect_technologies(html_home, headers_home)
+                        platform = detect_platform(html_home, found)
+                        technologies = format_technologies(found)
                         domain = _domain_from_url(website)
                         email = _pick_email_strict(html_home, domain) or _pick_email_fallback(html_home)
                         if not telefono:
                             telefono = _pick_best_phone(html_home) or ""
+                    domains.put(website, is_alive=is_alive, platform=platform, email=email, telefono=telefono,
+                                technologies=technologies)
 
-                writer.writerow({
+                out.writerow({
                     "empresa": empresa,
                     "website": website,
                     "platform": platform,
@@ -428,17 +445,23 @@ def run(out_dir: str, **kwargs):
                     "email": email,
                     "telefono": telefono,
                     "ficha_url": ficha_url,
+                    "technologies": technologies,
                 })
-                f_out.flush()
+                record_lead(kwargs, email=email, telefono=telefono, website=website, is_alive=is_alive)
 
                 seen_empresas.add(key)
+                if names is not None:
+                    names.add(key, key)
                 written += 1
-                time.sleep(SLEEP)
+                session.pause(SLEEP)
 
     finally:
-        f_out.close()
+        out.close()
+        domains.close()
 
-    print(f"✅ Añadidas {written} filas nuevas en {out_path}")
+    print(f"✅ Añadidas {written} filas nuevas en {write_path}")
+    report_lead_times(kwargs)
 
-    # 🔥 RESUMEN FINAL
-    _print_summary(out_path)
+    # 🔥 RESUMEN FINAL (con --workers lo imprime run.py tras fusionar)
+    if write_path == out_path:
+        _print_summary(out_path)
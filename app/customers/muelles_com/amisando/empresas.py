@@ -1,12 +1,24 @@
 import csv
-import time
+import re
 from pathlib import Path
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
-import requests
 from bs4 import BeautifulSoup
 
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
+from common.pagination import EarlyStop, incremental_patience, mark_full_walk
+from common.sitemap import iter_sitemap_urls
 
+OUT_FIELDS = ["provincia_url", "empresa_url", "lastmod"]
+
+# --sitemap: sitemaps de posts de Yoast (post-sitemap*.xml) o del core (wp-sitemap-posts-post-*.xml)
+SITEMAP_FOLLOW = r"post-sitemap|wp-sitemap-posts-post"
+
+
+@timer("extract")
 def _extract_empresa_urls(soup: BeautifulSoup) -> list[str]:
     urls = []
     for art in soup.select("section.content-area article.article-loop"):
@@ -16,6 +28,7 @@ def _extract_empresa_urls(soup: BeautifulSoup) -> list[str]:
     return urls
 
 
+@timer("extract")
 def _find_next_page(soup: BeautifulSoup, current_url: str) -> str | None:
     """
     Paginación detectada:
@@ -44,6 +57,73 @@ def _find_next_page(soup: BeautifulSoup, current_url: str) -> str | None:
     return None
 
 
+def _load_previous_rows(output_csv: Path) -> list[dict]:
+    if not output_csv.exists():
+        return []
+    with output_csv.open(newline="", encoding="utf-8") as f:
+        return [
+            {
+                "provincia_url": r.get("provincia_url") or "",
+                "empresa_url": r.get("empresa_url") or "",
+                "lastmod": r.get("lastmod") or "",
+            }
+            for r in csv.DictReader(f)
+            if r.get("empresa_url")
+        ]
+
+
+def _discover_from_sitemap(session, provincias_csv: Path, previous: list[dict], failed: list):
+    """
+    Todas las fichas de empresa desde los sitemaps del sitio, sin paginar provincias.
+    El sitemap no dice la provincia: se conserva la de la ejecución anterior si la hay.
+    failed: se le añaden los sitemaps que no se han podido leer
+    """
+    with provincias_csv.open(newline="", encoding="utf-8") as f:
+        provincia_urls = {(p.get("url") or "").strip() for p in csv.DictReader(f)} - {""}
+    if not provincia_urls:
+        return
+
+    first = urlparse(next(iter(provincia_urls)))
+    site = f"{first.scheme}://{first.netloc}"
+    # fichas = posts de primer nivel: https://amisando.es/<slug>/
+    pattern = rf"^{re.escape(site)}/[^/?#]+/$"
+    provincia_of = {r["empresa_url"]: r["provincia_url"] for r in previous}
+
+    print(f"\n▶ Sitemaps de {site}")
+    seen = set()
+    new = 0
+    for url, lastmod in iter_sitemap_urls(session, site, follow=SITEMAP_FOLLOW, pattern=pattern, failed=failed):
+        if url in provincia_urls or url in seen:
+            continue
+        seen.add(url)
+        new += url not in provincia_of
+        yield {"provincia_url": provincia_of.get(url, ""), "empresa_url": url, "lastmod": lastmod}
+
+    print(f"  {len(seen)} fichas en el sitemap ({new} nuevas)")
+
+
+def _run_sitemap(session, provincias_csv: Path, out_path: Path, kwargs: dict) -> bool:
+    """
+    --sitemap: sustituye empresas.csv por lo que digan los sitemaps, sólo si se
+    han leído todos y traen fichas. Si no, False y empresas.csv sin tocar.
+    """
+    failed = []
+    n = 0
+    with SectionJournal(out_path, OUT_FIELDS, kwargs) as out:
+        for row in _discover_from_sitemap(session, provincias_csv, _load_previous_rows(out_path), failed):
+            out.writerow(row)
+            n += 1
+        if failed or not n:
+            why = f"{len(failed)} sitemaps sin leer" if failed else "ninguna ficha en los sitemaps"
+            print(f"⚠️ --sitemap: {why}, no se sustituye {out_path.name}")
+            return False
+        out.commit()
+    # el sitemap es el listado completo: cuenta como pasada completa
+    mark_full_walk(out_path)
+    print(f"\n✅ Guardadas {n} empresas en {out_path}")
+    return True
+
+
 def run(out_dir: str, **kwargs):
     """
     kwargs requeridos:
@@ -54,7 +134,11 @@ def run(out_dir: str, **kwargs):
       /data/<customer>/<base>/provincias.csv   (columnas: provincia,url)
 
     Output:
-      <out_dir>/empresas.csv  (columnas: provincia_url,empresa_url)
+      <out_dir>/empresas.csv  (columnas: provincia_url,empresa_url,lastmod)
+
+    Con --sitemap las fichas salen de los sitemaps XML del sitio en vez de
+    paginar cada provincia (lastmod sólo se rellena en este modo). Si no hay
+    sitemap o alguno falla, se pagina el listado HTML como sin --sitemap.
     """
 
     customer = kwargs.get("customer")
@@ -67,76 +151,104 @@ def run(out_dir: str, **kwargs):
     if not provincias_csv.exists():
         raise FileNotFoundError(f"No existe el input: {provincias_csv}")
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0"})
-
-    seen = set()
-    rows = []
-
-    with provincias_csv.open(newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for prov in reader:
-            provincia_url = (prov.get("url") or "").strip()
-            if not provincia_url:
-                continue
-
-            print(f"\n▶ Provincia: {provincia_url}")
-
-            page_url = provincia_url
-            page_num = 1
-            max_pages = 200  # seguridad anti-loops
-
-            while page_url and page_num <= max_pages:
-                print(f"  - Página {page_num}: {page_url}")
-
-                r = session.get(page_url, timeout=30)
-                r.raise_for_status()
-                soup = BeautifulSoup(r.text, "html.parser")
-
-                empresa_urls = _extract_empresa_urls(soup)
-
-                # Si no hay resultados, cortamos
-                if not empresa_urls:
-                    print("    (sin resultados, fin)")
-                    break
-
-                added = 0
-                for u in empresa_urls:
-                    if u not in seen:
-                        seen.add(u)
-                        rows.append({"provincia_url": provincia_url, "empresa_url": u})
-                        added += 1
-
-                print(f"    +{added} nuevas (total: {len(rows)})")
-
-                next_page = _find_next_page(soup, page_url)
-
-                # Caso sin paginación o fin de paginación
-                if not next_page:
-                    print("    (no hay más páginas)")
-                    break
-
-                # Anti-loop
-                if next_page == page_url:
-                    print("    (next == current, cortando)")
-                    break
-
-                page_url = next_page
-                page_num += 1
-
-                # Pequeño delay
-                time.sleep(0.6)
-
-            if page_num > max_pages:
-                print(f"    (alcanzado max_pages={max_pages}, cortando por seguridad)")
-
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
     out_path = out_dir / "empresas.csv"
 
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["provincia_url", "empresa_url"])
-        w.writeheader()
-        w.writerows(rows)
-
-    print(f"\n✅ Guardadas {len(rows)} empresas en {out_path}")
+    session = new_session({"User-Agent": "Mozilla/5.0"}, kwargs)
+
+    if kwargs.get("sitemap"):
+        if _run_sitemap(session, provincias_csv, out_path, kwargs):
+            return
+        print("↪️ Se recorre el listado HTML de cada provincia")
+
+    # --incremental: se corta cada provincia tras K páginas sin empresas nuevas
+    patience = incremental_patience(out_path, kwargs)
+    previous = _load_previous_rows(out_path) if patience else []
+    known = {r["empresa_url"] for r in previous}
+
+    # cada provincia va a disco al terminarla; empresas.csv se sustituye al final
+    with SectionJournal(out_path, OUT_FIELDS, kwargs) as out:
+        seen = {r["empresa_url"] for r in out.rows()}
+
+        with provincias_csv.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for prov in reader:
+                provincia_url = (prov.get("url") or "").strip()
+                if not provincia_url:
+                    continue
+                if out.done(provincia_url):
+                    continue
+
+                print(f"\n▶ Provincia: {provincia_url}")
+
+                page_url = provincia_url
+                page_num = 1
+                max_pages = 200  # seguridad anti-loops
+                stop = EarlyStop(known, patience)
+
+                while page_url and page_num <= max_pages:
+                    print(f"  - Página {page_num}: {page_url}")
+
+                    r = session.get(page_url, timeout=30)
+                    r.raise_for_status()
+                    soup = parse_html(r.text)
+
+                    empresa_urls = _extract_empresa_urls(soup)
+
+                    # Si no hay resultados, cortamos
+                    if not empresa_urls:
+                        print("    (sin resultados, fin)")
+                        break
+
+                    added = 0
+                    for u in empresa_urls:
+                        if u not in seen:
+                            seen.add(u)
+                            out.writerow({"provincia_url": provincia_url, "empresa_url": u, "lastmod": ""})
+                            added += 1
+
+                    print(f"    +{added} nuevas (total: {len(seen)})")
+
+                    stop.page(empresa_urls)
+                    if stop.done:
+                        print(f"    ({stop.quiet_pages} páginas sin empresas desconocidas, fin incremental)")
+                        break
+
+                    next_page = _find_next_page(soup, page_url)
+
+                    # Caso sin paginación o fin de paginación
+                    if not next_page:
+                        print("    (no hay más páginas)")
+                        break
+
+                    # Anti-loop
+                    if next_page == page_url:
+                        print("    (next == current, cortando)")
+                        break
+
+                    page_url = next_page
+                    page_num += 1
+
+                    # Pequeño delay
+                    session.pause(0.6)
+
+                if page_num > max_pages:
+                    print(f"    (alcanzado max_pages={max_pages}, cortando por seguridad)")
+                out.complete(provincia_url)
+
+        # en incremental lo no recorrido se conserva; sólo una pasada completa ve las bajas
+        kept = 0
+        for r in previous:
+            if r["empresa_url"] not in seen:
+                out.writerow(r)
+                kept += 1
+        total = len(seen) + kept
+        out.commit()
+
+    if patience is None:
+        mark_full_walk(out_path)
+
+    print(f"\n✅ Guardadas {total} empresas en {out_path}")
+    if kept:
+        print(f"   ({kept} conservadas de páginas no recorridas)")
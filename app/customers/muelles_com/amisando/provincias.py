@@ -1,28 +1,31 @@
-import csv
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+
+from common.html import parse_html
+from common.http import new_session
+from common.journal import SectionJournal
+from common.metrics import timer
 
 def run(out_dir: str, **kwargs):
     url = "https://amisando.es/empresas-para-el-control-de-plagas-en-espana-por-provincia/"
     headers = {"User-Agent": "Mozilla/5.0"}
 
-    r = requests.get(url, headers=headers, timeout=30)
+    r = new_session(headers, kwargs).get(url, timeout=30)
     r.raise_for_status()
 
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = parse_html(r.text)
 
     rows = []
-    for a in soup.select("article a"):
-        nombre = a.get_text(strip=True)
-        link = a.get("href")
-        if nombre and link:
-            rows.append({"provincia": nombre, "url": link})
+    with timer("extract"):
+        for a in soup.select("article a"):
+            nombre = a.get_text(strip=True)
+            link = a.get("href")
+            if nombre and link:
+                rows.append({"provincia": nombre, "url": link})
 
     out_path = Path(out_dir) / "provincias.csv"
-    with out_path.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=["provincia", "url"])
-        w.writeheader()
-        w.writerows(rows)
+    # journal + rename atómico: un corte nunca deja provincias.csv a medias
+    with SectionJournal(out_path, ["provincia", "url"], kwargs) as out:
+        out.writerows(rows)
+        out.commit()
 
     print(f"✅ Guardado {len(rows)} filas en {out_path}")
\ No newline at end of file
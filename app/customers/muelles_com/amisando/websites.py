@@ -5,7 +5,17 @@ from pathlib import Path
 from urllib.parse import urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+
+from common.budget import BudgetExhausted
+from common.domains import DomainCache
+from common.freshness import due_for_recrawl
+from common.html import parse_html
+from common.http import new_session
+from common.metrics import cache_hit, record_lead, report_lead_times, timer, track_queue
+from common.output import StageOutput
+from common.priority import open_input
+from common.workers import owns_row, worker_output
+from common.wpapi import prefetch_rendered
 
 
 MAX_ITEMS = None #10  # pon None si quieres procesar todo
@@ -35,8 +45,9 @@ def _domain_from_url(url: str) -> str:
     return host
 
 
+@timer("extract")
 def _extract_fields_from_ficha(html: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
+    soup = parse_html(html)
     ficha = soup.select_one("#ficha")
     if not ficha:
         return {"direccion": "", "telefono": "", "paginaweb": ""}
@@ -76,6 +87,7 @@ def _extract_fields_from_ficha(html: str) -> dict:
     return {"direccion": direccion, "telefono": telefono, "paginaweb": paginaweb}
 
 
+@timer("extract")
 def _pick_best_email(html: str, domain: str) -> str:
     emails = sorted(set(EMAIL_RE.findall(html)))
     if not emails:
@@ -113,12 +125,44 @@ def _fetch_email(session: requests.Session, base_url: str) -> str:
             if email:
                 return email
 
+        except BudgetExhausted:
+            raise
         except Exception:
             continue
 
     return ""
 
 
+def _fetch_email_cached(domains: DomainCache, session: requests.Session, base_url: str) -> str:
+    if not base_url:
+        return ""
+    cached = domains.get(base_url)
+    if cached and cached["email"]:
+        return cached["email"]
+    email = _fetch_email(session, base_url)
+    domains.put(base_url, email=email)
+    return email
+
+
+def _ficha_from_api(prefetched: dict, empresa_url: str) -> dict | None:
+    rendered = prefetched.pop(empresa_url, None)
+    if not rendered:
+        return None
+    ficha = _extract_fields_from_ficha(rendered)
+    # si el contenido de la API no trae la ficha se lee el HTML
+    return ficha if any(ficha.values()) else None
+
+
+def _pending_fichas(empresas_csv: Path, processed: set[str], kwargs: dict) -> list[str]:
+    with empresas_csv.open(newline="", encoding="utf-8") as f:
+        return [
+            u for row in csv.DictReader(f)
+            if (u := (row.get("empresa_url") or "").strip())
+            and u not in processed
+            and owns_row(PARALLEL, row, kwargs)
+        ]
+
+
 def _load_already_processed(output_csv: Path) -> set[str]:
     """
     Lee el CSV de salida si existe y devuelve set de empresa_url ya procesadas.
@@ -141,6 +185,33 @@ def _load_already_processed(output_csv: Path) -> set[str]:
     return processed
 
 
+def _row_key(row: dict) -> str:
+    return (row.get("empresa_url") or "").strip()
+
+
+# --workers: todas las fichas están en amisando.es y la web de la empresa no se
+# conoce hasta leer la ficha, así que se particiona por la propia ficha.
+PARALLEL = {
+    "input": "empresas.csv",
+    "output": "website.csv",
+    "key": _row_key,
+    "host": _row_key,
+}
+
+# python -m common.analytics: cobertura y rendimiento por provincia
+ANALYTICS = {
+    "output": "website.csv",
+    "website": "paginaweb",
+    "join": [("provincias.csv", "provincia_url", "url", ["provincia"])],
+    "groups": ["provincia"],
+}
+
+# --prioritize: valor de cada ficha pendiente según su provincia (common.priority)
+PRIORITY = {
+    "group": "provincia_url",
+}
+
+
 def run(out_dir: str, **kwargs):
     customer = kwargs.get("customer")
     base = kwargs.get("base")
@@ -160,15 +231,26 @@ def run(out_dir: str, **kwargs):
     if processed:
         print(f"↩️ Reanudando: {len(processed)} empresas ya estaban en {out_path}")
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    write_path = worker_output(out_path, kwargs)
+    if write_path != out_path:
+        processed |= _load_already_processed(write_path)
+
+    # --recrawl: los registros vencidos se vuelven a procesar
+    processed -= due_for_recrawl(out_path, kwargs)
+
+    session = new_session({"User-Agent": "Mozilla/5.0"}, kwargs)
+    # --domain-cache: webs ya visitadas desde cualquier base
+    domains = DomainCache(kwargs)
+
+    # --wp-api: el contenido de las fichas pendientes por la API REST, 100 por petición
+    prefetched = {}
+    if kwargs.get("wp_api"):
+        prefetched = prefetch_rendered(session, _pending_fichas(empresas_csv, processed, kwargs))
 
     # ✅ Abrir salida en modo append; si no existe, escribir cabecera
-    write_header = not out_path.exists() or out_path.stat().st_size == 0
-    f_out = out_path.open("a", newline="", encoding="utf-8")
-    writer = csv.DictWriter(
-        f_out,
-        fieldnames=[
+    out = StageOutput(
+        write_path,
+        [
             "direccion",
             "telefono",
             "paginaweb",
@@ -176,18 +258,19 @@ def run(out_dir: str, **kwargs):
             "provincia_url",
             "empresa_url",  # ✅ último, como pediste
         ],
+        kwargs,
     )
-    if write_header:
-        writer.writeheader()
 
     written = 0
     considered = 0
+    # ⏩ reanudar: directo a la primera fila del input sin terminar (common.cursor);
+    # con --prioritize, las pendientes de más a menos valor (common.priority)
+    cursor = open_input(empresas_csv, out_path, kwargs, done=processed)
+    queue = track_queue(kwargs, empresas_csv, done=cursor.row)
 
     try:
-        with empresas_csv.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-
-            for row in reader:
+        with cursor:
+            for row in cursor:
                 if MAX_ITEMS is not None and considered >= MAX_ITEMS:
                     break
 
@@ -197,29 +280,41 @@ def run(out_dir: str, **kwargs):
                 if not empresa_url:
                     continue
 
+                if not owns_row(PARALLEL, row, kwargs):
+                    continue
+                queue.dec()
+
                 considered += 1
 
                 # ✅ Skip si ya está procesada
-                if empresa_url in processed:
+                if cache_hit("resume", empresa_url in processed):
                     continue
 
                 print(f"▶ Procesando: {provincia_url},{empresa_url}")
 
-                try:
-                    r = session.get(empresa_url, timeout=30)
-                    r.raise_for_status()
-                except Exception as e:
-                    print(f"  ❌ Error cargando ficha: {e}")
-                    # aun así volcamos fila vacía para marcar que se intentó (opcional)
-                    ficha = {"direccion": "", "telefono": "", "paginaweb": ""}
-                    paginaweb_url = ""
-                    email = ""
-                else:
-                    ficha = _extract_fields_from_ficha(r.text)
+                ficha = _ficha_from_api(prefetched, empresa_url)
+                if ficha is not None:
                     paginaweb_url = _ensure_url(ficha["paginaweb"])
-                    email = _fetch_email(session, paginaweb_url) if paginaweb_url else ""
-
-                writer.writerow(
+                    email = _fetch_email_cached(domains, session, paginaweb_url)
+                else:
+                    try:
+                        r = session.get(empresa_url, timeout=30)
+                        r.raise_for_status()
+                    except BudgetExhausted:
+                        raise
+                    except Exception as e:
+                        print(f"  ❌ Error cargando ficha: {e}")
+                        # aun así volcamos fila vacía para marcar que se intentó (opcional)
+                        ficha = {"direccion": "", "telefono": "", "paginaweb": ""}
+                        paginaweb_url = ""
+                        email = ""
+                    else:
+                        ficha = _extract_fields_from_ficha(r.text)
+                        paginaweb_url = _ensure_url(ficha["paginaweb"])
+                        email = _fetch_email_cached(domains, session, paginaweb_url)
+
+                # ✅ importante: persiste en disco cada fila
+                out.writerow(
                     {
                         "direccion": ficha["direccion"],
                         "telefono": ficha["telefono"],
@@ -229,12 +324,14 @@ def run(out_dir: str, **kwargs):
                         "empresa_url": empresa_url,
                     }
                 )
-                f_out.flush()  # ✅ importante: persiste en disco cada fila
+                record_lead(kwargs, email=email, telefono=ficha["telefono"], website=paginaweb_url)
 
                 processed.add(empresa_url)
                 written += 1
 
     finally:
-        f_out.close()
+        out.close()
+        domains.close()
 
-    print(f"✅ Añadidas {written} filas nuevas en {out_path}")
+    print(f"✅ Añadidas {written} filas nuevas en {write_path}")
+    report_lead_times(kwargs)
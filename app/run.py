@@ -1,10 +1,22 @@
 import yaml
 from dotenv import load_dotenv
 import argparse
+import os
 import sys
 import importlib
 from pathlib import Path
 
+from common import metrics
+from common.archive import default_dir, publish_reextract, reextract_dir
+from common.budget import EXIT_CODE, BudgetExhausted, parse_deadline, parse_size, report_exhausted
+from common.delta import export_module_delta
+from common.egress import parse_egress
+from common.freshness import compact_module_output
+from common.pagination import DEFAULT_PATIENCE
+from common.priority import parse_weights
+from common.profiling import profile_run
+from common.workers import run_parallel
+
 if __name__ == "__main__":
 
     load_dotenv()
@@ -13,10 +25,58 @@ if __name__ == "__main__":
     parser.add_argument('customer', action = "store")
     parser.add_argument('base', action = "store")
     parser.add_argument('entity', action = "store")
+    parser.add_argument('--workers', type = int, default = 1,
+                        help = 'Procesos en paralelo (particiona el input por host)')
+    parser.add_argument('--metrics-port', type = int, default = None,
+                        help = 'Expone /metrics (Prometheus) en este puerto')
+    parser.add_argument('--profile', action = "store_true",
+                        help = 'Perfila la ejecución (informe en <out_dir>/profile/)')
+    parser.add_argument('--record', default = None,
+                        help = 'Graba todas las peticiones/respuestas en este directorio')
+    parser.add_argument('--replay', default = None,
+                        help = 'URL de un servidor de replay (python -m common.replay) al que apuntar la etapa')
+    parser.add_argument('--columnar', action = "store_true",
+                        help = 'Escribe también un dataset Parquet junto a cada CSV (<salida>.parquet/)')
+    parser.add_argument('--recrawl', action = "store_true",
+                        help = 'Vuelve a procesar los registros cuya información ha caducado (ver common/freshness.py)')
+    parser.add_argument('--recrawl-budget', type = int, default = None,
+                        help = 'Con --recrawl: máximo (>= 1) de registros a re-verificar en esta ejecución')
+    parser.add_argument('--incremental', type = int, nargs = '?', const = DEFAULT_PATIENCE, default = None,
+                        help = 'Listados: corta cada sección tras K (>= 1) páginas sin URLs nuevas (ver common/pagination.py)')
+    parser.add_argument('--sitemap', action = "store_true",
+                        help = 'Listados WordPress: descubre las fichas por los sitemaps XML (ver common/sitemap.py)')
+    parser.add_argument('--wp-api', action = "store_true",
+                        help = 'Fuentes WordPress: lee el contenido por la API REST si existe (ver common/wpapi.py)')
+    parser.add_argument('--fuzzy-dedup', action = "store_true",
+                        help = 'websites seraportiendas: salta también las empresas de nombre casi igual a una ya procesada (ver common/names.py)')
+    parser.add_argument('--domain-cache', action = "store_true",
+                        help = 'websites: reutiliza lo ya visto de cada dominio en cualquier base (ver common/domains.py)')
+    parser.add_argument('--prioritize', nargs = '?', const = '', default = None,
+                        help = 'websites: procesa las filas pendientes de más a menos valor esperado, pesos opcionales "count=1,yield=2" (ver common/priority.py)')
+    parser.add_argument('--delta', action = "store_true",
+                        help = 'Al terminar, exporta altas/cambios/bajas respecto a la ejecución anterior (<out_dir>/delta/)')
+    parser.add_argument('--archive', nargs = '?', const = '', default = None,
+                        help = 'Archiva cada página descargada en WARC (por defecto <out_dir>/.warc, ver common/archive.py)')
+    parser.add_argument('--reextract', action = "store_true",
+                        help = 'Re-ejecuta la etapa sobre las páginas archivadas (--archive), sin red, y sustituye su salida')
+    parser.add_argument('--deadline', default = None,
+                        help = 'Hora límite: duración (45m, 2h) u hora (06:30); al llegar, la etapa se corta limpiamente (ver common/budget.py)')
+    parser.add_argument('--max-requests', type = int, default = None,
+                        help = 'Máximo de peticiones HTTP en esta ejecución')
+    parser.add_argument('--max-bytes', default = None,
+                        help = 'Máximo de bytes descargados en esta ejecución (500M, 2G...)')
+    parser.add_argument('--max-per-host', type = int, default = None,
+                        help = 'Máximo de peticiones a un mismo host en esta ejecución')
+    parser.add_argument('--egress', default = None,
+                        help = 'Pool de salidas: fichero o lista "http://proxy:3128,source:10.0.0.2" (ver common/egress.py)')
 
-    customer = parser.parse_args().customer
-    base = parser.parse_args().base
-    entity = parser.parse_args().entity
+    args = parser.parse_args()
+    customer = args.customer
+    base = args.base
+    entity = args.entity
+    workers = args.workers
+    metrics_port = args.metrics_port
+    profile = args.profile
 
 
     print(customer, base, entity)
@@ -38,6 +98,121 @@ if __name__ == "__main__":
         print(f"❌ El módulo {module_path} no tiene una función run()")
         sys.exit(1)
 
+    opts = {}
+    if metrics_port:
+        metrics_dir = out_dir / ".metrics" if workers > 1 else None
+        metrics.serve(metrics_port, snapshot_dir=metrics_dir)
+        if metrics_dir:
+            opts["metrics_dir"] = str(metrics_dir)
+    if profile:
+        opts["profile"] = True
+    if args.record:
+        opts["record"] = args.record
+    if args.replay:
+        opts["replay"] = args.replay
+    if args.columnar:
+        opts["columnar"] = True
+    if args.recrawl_budget is not None:
+        if not args.recrawl:
+            print("❌ --recrawl-budget: sólo tiene sentido con --recrawl")
+            sys.exit(1)
+        if args.recrawl_budget < 1:
+            print("❌ --recrawl-budget: debe ser 1 o más")
+            sys.exit(1)
+    if args.recrawl:
+        opts["recrawl"] = True
+        if args.recrawl_budget:
+            opts["recrawl_budget"] = args.recrawl_budget
+    if args.incremental is not None:
+        if args.incremental < 1:
+            print("❌ --incremental: K debe ser 1 o más (sin --incremental se recorre todo)")
+            sys.exit(1)
+        opts["incremental_pages"] = args.incremental
+    if args.sitemap:
+        opts["sitemap"] = True
+    if args.wp_api:
+        opts["wp_api"] = True
+    if args.fuzzy_dedup:
+        opts["fuzzy_dedup"] = True
+    if args.domain_cache:
+        opts["domain_cache"] = True
+    try:
+        if args.deadline:
+            opts["deadline"] = parse_deadline(args.deadline)
+        if args.max_bytes:
+            opts["max_bytes"] = parse_size(args.max_bytes)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if args.egress:
+        try:
+            parse_egress(args.egress)
+        except (OSError, ValueError) as e:
+            print(f"❌ --egress: {e}")
+            sys.exit(1)
+        opts["egress"] = args.egress
+    if args.max_requests is not None:
+        opts["max_requests"] = args.max_requests
+    if args.max_per_host is not None:
+        opts["max_per_host"] = args.max_per_host
+    if args.prioritize is not None:
+        try:
+            parse_weights(args.prioritize)
+        except ValueError as e:
+            print(f"❌ --prioritize: {e}")
+            sys.exit(1)
+        opts["prioritize"] = args.prioritize
+
+    # --reextract: la etapa escribe desde cero en un directorio aparte, leyendo del
+    # archivo; su salida sólo sustituye a la normal si termina bien
+    run_dir = out_dir
+    if args.reextract:
+        opts["reextract"] = args.archive or str(default_dir(out_dir))
+        opts.pop("record", None)
+        opts.pop("replay", None)
+        run_dir = reextract_dir(out_dir, entity)
+        if workers == 1 and hasattr(module, "PARALLEL"):
+            workers = os.cpu_count() or 1
+        print(f"📦 Re-extracción desde {opts['reextract']} en {run_dir}")
+    elif args.archive is not None:
+        opts["archive"] = args.archive or str(default_dir(out_dir))
+
+    if workers > 1:
+        if not hasattr(module, "PARALLEL"):
+            print(f"❌ El módulo {module_path} no soporta --workers")
+            sys.exit(1)
+
+        print(f"▶ Ejecutando {module_path}.run() con {workers} workers")
+        code = run_parallel(module_path, module, workers,
+                            out_dir=str(run_dir), customer=customer, base=base, entity=entity, **opts)
+        if code not in (0, EXIT_CODE):
+            # algún worker falló: la fusión está incompleta, no se compacta ni se exporta
+            sys.exit(code)
+        if args.reextract and code == 0:
+            print(f"📦 Salidas re-extraídas: {', '.join(publish_reextract(run_dir, out_dir))}")
+        if args.recrawl:
+            compact_module_output(module, out_dir)
+        if args.delta:
+            export_module_delta(module, out_dir)
+        sys.exit(code)
+
     print(f"▶ Ejecutando {module_path}.run()")
     print(f"▶ Ejecutando {module_path}.run(out_dir=...)")
-    module.run(out_dir=str(out_dir), customer=customer, base=base, entity=entity)
\ No newline at end of file
+    code = 0
+    try:
+        if profile:
+            profile_run(module.run, entity, out_dir=str(run_dir), customer=customer, base=base, entity=entity, **opts)
+        else:
+            module.run(out_dir=str(run_dir), customer=customer, base=base, entity=entity, **opts)
+    except BudgetExhausted as e:
+        # la etapa ya ha cerrado su salida y su punto de control al salir
+        report_exhausted(e, {"entity": entity})
+        code = EXIT_CODE
+    if args.reextract and code == 0:
+        print(f"📦 Salidas re-extraídas: {', '.join(publish_reextract(run_dir, out_dir))}")
+
+    if args.recrawl:
+        compact_module_output(module, out_dir)
+    if args.delta:
+        export_module_delta(module, out_dir)
+    sys.exit(code)